@@ -0,0 +1,411 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (c) 2022 Salvador E. Tropea
+# Copyright (c) 2022 Instituto Nacional de Tecnología Industrial
+# License: GPL-3.0
+# Project: KiBot (formerly KiPlot)
+"""
+Benchmark suite for the hot spots of KiBot.
+Uses synthetic designs created by gen_design.py, so the scale can be adjusted.
+Each case is measured ROUNDS times (after a warm-up call) and the statistics are stored in a JSON file.
+The JSON contains the commit, so results from different revisions can be compared using --compare.
+The cases that need the KiBot plugins (BoM, filters) are skipped if pcbnew isn't available.
+Usage: benchmarks.py [-o JSON] [-c BASE_JSON] [-k CASE] [-r ROUNDS] [-s SHEETS] [-n SYMBOLS] [-f FIELDS] [-V VARIANTS]
+Example:
+  benchmarks.py -o base.json
+  (change the code)
+  benchmarks.py -o new.json -c base.json
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+from datetime import datetime
+from tempfile import TemporaryDirectory
+from timeit import repeat
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+# Initializes the logger, as KiBot does
+from kibot.__main__ import logger  # noqa: E402
+from kibot.gs import GS  # noqa: E402
+from kibot.kicad.config import KiConf  # noqa: E402
+from kibot.kicad.v5_sch import Schematic  # noqa: E402
+from kibot.kicad.v6_sch import SchematicV6  # noqa: E402
+from kibot.kicad.sexpdata import load  # noqa: E402
+from gen_design import generate  # noqa: E402
+
+FORMAT_VERSION = 1
+# A configuration using variants, filters and a BoM with the extra fields
+CONFIG = """
+kibot:
+  version: 1
+
+filters:
+  - name: 'only_coded'
+    type: generic
+    exclude_empty_val: true
+    exclude_any:
+      - column: 'manf#'
+        regex: '^$'
+      - column: 'Value'
+        regex: '^0R$'
+
+variants:
+  - name: 'V0'
+    type: kibom
+    variant: V0
+
+outputs:
+  - name: 'bench_bom'
+    type: bom
+    options:
+      variant: V0
+      columns: [Row, Description, Part, References, Value, Footprint, Quantity Per PCB, Status, Datasheet, {fields}]
+      group_fields: ['Part', 'Value', 'Footprint', 'manf#']
+      # Configure all the formats, not just CSV
+      csv:
+        quote_all: true
+      html:
+        datasheet_as_link: 'Datasheet'
+        digikey_link: 'digikey#'
+      xlsx:
+        datasheet_as_link: 'Datasheet'
+        digikey_link: 'digikey#'
+"""
+BENCHMARKS = []
+
+
+def benchmark(needs_plugins=False):
+    """ Registers a case.
+        The decorated function does the setup and returns the function to measure. """
+    def decorator(func):
+        BENCHMARKS.append((func.__name__, func, needs_plugins))
+        return func
+    return decorator
+
+
+class Context(object):
+    """ The designs and the objects shared by the cases """
+    def __init__(self, dir, args):
+        super().__init__()
+        self.dir = dir
+        self.args = args
+        self.v5 = generate(os.path.join(dir, 'v5'), 5, args.sheets, args.symbols, args.fields, args.variants)
+        self.v6 = generate(os.path.join(dir, 'v6'), 6, args.sheets, args.symbols, args.fields, args.variants)
+        self._bom = None
+
+    def load_sch(self, ki6=True):
+        """ Sets the global schematic, as KiBot does for the outputs """
+        GS.kicad_version_n = 6000000 if ki6 else 5001009
+        GS.set_sch((self.v6 if ki6 else self.v5)['sch'])
+        GS.sch = SchematicV6() if ki6 else Schematic()
+        GS.sch.load(GS.sch_file, GS.sch_basename)
+        if not ki6:
+            GS.sch.load_libs(GS.sch_file)
+        GS.sch_title = None
+        GS.load_sch_title_block()
+        return GS.sch
+
+    def bom(self):
+        """ A configured BoM output, the list of components and the groups """
+        if self._bom is None:
+            from kibot.kiplot import load_actions
+            from kibot.config_reader import CfgYamlReader
+            from kibot.registrable import RegOutput
+            from kibot.bom.bom import group_components
+            # The plug-ins need to know the KiCad version
+            self.load_sch()
+            load_actions()
+            fname = os.path.join(self.dir, 'bench.kibot.yaml')
+            fields = ', '.join("'{}'".format(f) for f in self.v6['design'].field_names)
+            with open(fname, 'wt') as f:
+                f.write(CONFIG.format(fields=fields))
+            with open(fname) as f:
+                CfgYamlReader().read(f)
+            out = RegOutput.get_output('bench_bom')
+            out.config(None)
+            cfg = out.options
+            # Generate the BoM once, this applies the filters and variant and fills the data used by the writers
+            cfg.run(os.path.join(self.dir, 'bom.csv'))
+            comps = GS.sch.get_components()
+            groups = group_components(cfg, comps)
+            self._bom = (cfg, comps, groups)
+        return self._bom
+
+
+@benchmark()
+def sexpdata_sch(ctx):
+    """ Parse a KiCad 6 schematic using the S-Expression parser """
+    fname = ctx.v6['sch']
+
+    def run():
+        with open(fname) as f:
+            load(f)
+    return run
+
+
+@benchmark()
+def sexpdata_pcb(ctx):
+    """ Parse a KiCad 6 PCB using the S-Expression parser """
+    fname = ctx.v6['pcb']
+
+    def run():
+        with open(fname) as f:
+            load(f)
+    return run
+
+
+@benchmark()
+def sch_v6_load(ctx):
+    """ Load a KiCad 6 hierarchical schematic (SchematicV6.load) """
+    GS.kicad_version_n = 6000000
+    fname = ctx.v6['sch']
+
+    def run():
+        SchematicV6().load(fname, 'synth')
+    return run
+
+
+@benchmark()
+def sch_v5_load(ctx):
+    """ Load a KiCad 5 hierarchical schematic (Schematic.load) """
+    GS.kicad_version_n = 5001009
+    fname = ctx.v5['sch']
+
+    def run():
+        Schematic().load(fname, 'synth')
+    return run
+
+
+@benchmark()
+def sch_v5_load_libs(ctx):
+    """ Load the symbol libraries for a KiCad 5 schematic (Schematic.load_libs) """
+    GS.kicad_version_n = 5001009
+    fname = ctx.v5['sch']
+    sch = Schematic()
+    sch.load(fname, 'synth')
+    # KiConf is initialized only once, measure the libs
+    KiConf.init(fname)
+
+    def run():
+        sch.load_libs(fname)
+    return run
+
+
+@benchmark()
+def expand_filename(ctx):
+    """ Expand the output name for each component (Optionable.expand_filename_both) """
+    from kibot.optionable import Optionable
+
+    class FakeOutput(object):
+        output_id = 'bench'
+        _expand_id = 'bom'
+        _expand_ext = 'csv'
+        variant = None
+
+        def __init__(self):
+            self._parent = self
+
+        def _find_variant(self):
+            return ''
+
+        def _find_variant_name(self):
+            return ''
+
+    sch = ctx.load_sch()
+    GS.n = datetime.now()
+    obj = FakeOutput()
+    names = ['%f-%i%I%v_{}_{}.%x'.format(c.ref, c.value) for c in sch.get_components()]
+
+    def run():
+        for name in names:
+            Optionable.expand_filename_both(obj, name, is_sch=True)
+    return run
+
+
+@benchmark(needs_plugins=True)
+def generic_filter(ctx):
+    """ Apply a `generic` filter to all the components (Generic.filter) """
+    from kibot.registrable import RegOutput
+    ctx.bom()
+    flt = RegOutput.get_filter('only_coded')
+    comps = GS.sch.get_components()
+
+    def run():
+        for c in comps:
+            flt.filter(c)
+    return run
+
+
+@benchmark(needs_plugins=True)
+def group_components(ctx):
+    """ Group the components for the BoM (group_components) """
+    from kibot.bom.bom import group_components
+    cfg, comps, _ = ctx.bom()
+
+    def run():
+        group_components(cfg, comps)
+    return run
+
+
+def _bom_writer(ctx, ext):
+    from kibot.bom.bom_writer import write_bom
+    cfg, _, groups = ctx.bom()
+    fname = os.path.join(ctx.dir, 'bom.'+ext)
+
+    def run():
+        write_bom(fname, ext, groups, cfg.columns, cfg)
+    return run
+
+
+@benchmark(needs_plugins=True)
+def bom_csv(ctx):
+    """ Write the BoM in CSV format """
+    return _bom_writer(ctx, 'csv')
+
+
+@benchmark(needs_plugins=True)
+def bom_html(ctx):
+    """ Write the BoM in HTML format """
+    return _bom_writer(ctx, 'html')
+
+
+@benchmark(needs_plugins=True)
+def bom_xml(ctx):
+    """ Write the BoM in XML format """
+    return _bom_writer(ctx, 'xml')
+
+
+@benchmark(needs_plugins=True)
+def bom_xlsx(ctx):
+    """ Write the BoM in XLSX format """
+    from kibot.bom.xlsx_writer import XLSX_SUPPORT
+    if not XLSX_SUPPORT:
+        return None
+    return _bom_writer(ctx, 'xlsx')
+
+
+def has_pcbnew():
+    try:
+        import pcbnew  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def get_commit():
+    try:
+        res = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT_DIR, stdout=subprocess.PIPE,
+                             stderr=subprocess.DEVNULL, universal_newlines=True)
+        if res.returncode:
+            return None
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT_DIR,
+                               stdout=subprocess.PIPE, universal_newlines=True).stdout != ''
+        return {'id': res.stdout.strip(), 'dirty': dirty}
+    except OSError:
+        return None
+
+
+def get_stats(times):
+    return {'min': min(times), 'max': max(times), 'mean': statistics.mean(times), 'median': statistics.median(times),
+            'stddev': statistics.stdev(times) if len(times) > 1 else 0, 'rounds': len(times)}
+
+
+def run_benchmarks(args):
+    has_plugins = has_pcbnew()
+    results = []
+    with TemporaryDirectory() as dir:
+        ctx = Context(dir, args)
+        for name, func, needs_plugins in BENCHMARKS:
+            if args.keyword and not any(k in name for k in args.keyword):
+                continue
+            if needs_plugins and not has_plugins:
+                print('{:20s} skipped (no pcbnew)'.format(name))
+                continue
+            run = func(ctx)
+            if run is None:
+                print('{:20s} skipped (missing dependency)'.format(name))
+                continue
+            # Warm-up, also fills the internal caches
+            run()
+            stats = get_stats(repeat(run, number=1, repeat=args.rounds))
+            print('{:20s} {:9.3f} ms (min {:.3f} ms, stddev {:.3f} ms)'.
+                  format(name, stats['mean']*1e3, stats['min']*1e3, stats['stddev']*1e3))
+            results.append({'name': name, 'doc': func.__doc__.strip(), 'stats': stats})
+    return results
+
+
+def compare(results, base_file, threshold):
+    """ Prints the ratio against the base results. Returns the number of regressions. """
+    with open(base_file, 'rt') as f:
+        base = json.load(f)
+    base_commit = (base.get('commit_info') or {}).get('id', 'unknown')
+    print('\nComparing against {} ({})'.format(base_file, base_commit[:12]))
+    if base['params'] != results['params']:
+        print('Warning: different parameters {} vs {}'.format(base['params'], results['params']))
+    base_stats = {b['name']: b['stats'] for b in base['benchmarks']}
+    regressions = 0
+    for b in results['benchmarks']:
+        old = base_stats.get(b['name'])
+        if old is None:
+            continue
+        # The minimum is less affected by the noise
+        ratio = b['stats']['min']/old['min']
+        mark = ''
+        if ratio > threshold:
+            mark = ' SLOWER'
+            regressions += 1
+        elif ratio < 1/threshold:
+            mark = ' faster'
+        print('{:20s} {:9.3f} -> {:9.3f} ms  x{:.2f}{}'.format(b['name'], old['min']*1e3, b['stats']['min']*1e3,
+                                                               ratio, mark))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='KiBot benchmarks using synthetic designs')
+    parser.add_argument('-o', '--output', help='JSON file for the results')
+    parser.add_argument('-c', '--compare', help='JSON file with results to compare')
+    parser.add_argument('-t', '--threshold', type=float, default=1.1, help='Ratio to consider a regression [%(default)s]')
+    parser.add_argument('-k', '--keyword', action='append', help='Run only the cases containing this text')
+    parser.add_argument('-r', '--rounds', type=int, default=5, help='Measurements for each case [%(default)s]')
+    parser.add_argument('-s', '--sheets', type=int, default=4, help='Number of sub-sheets [%(default)s]')
+    parser.add_argument('-n', '--symbols', type=int, default=250, help='Symbols for each sheet [%(default)s]')
+    parser.add_argument('-f', '--fields', type=int, default=6, help='Extra fields for each symbol [%(default)s]')
+    parser.add_argument('-V', '--variants', type=int, default=3, help='Number of variants [%(default)s]')
+    parser.add_argument('-l', '--list', action='store_true', help='List the available cases')
+    args = parser.parse_args()
+    if args.list:
+        for name, func, needs_plugins in BENCHMARKS:
+            print('{:20s} {}{}'.format(name, func.__doc__.strip(), ' (needs pcbnew)' if needs_plugins else ''))
+        return 0
+    # The synthetic designs generate a lot of expected warnings (missing KiCad libs, field conflicts, etc.)
+    logger.setLevel(logging.ERROR)
+    GS.debug_level = 0
+    GS.kibot_version = 'benchmark'
+    GS.global_date_format = '%Y-%m-%d'
+    GS.global_time_format = '%H-%M-%S'
+    results = {'version': FORMAT_VERSION,
+               'datetime': datetime.now().isoformat(),
+               'commit_info': get_commit(),
+               'machine_info': {'python': platform.python_version(), 'implementation': platform.python_implementation(),
+                                'system': platform.system(), 'release': platform.release(),
+                                'machine': platform.machine(), 'cpu_count': os.cpu_count()},
+               'params': {'sheets': args.sheets, 'symbols': args.symbols, 'fields': args.fields,
+                          'variants': args.variants, 'rounds': args.rounds}}
+    results['benchmarks'] = run_benchmarks(args)
+    if args.output:
+        with open(args.output, 'wt') as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        return 1 if compare(results, args.compare, args.threshold) else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (c) 2022 Salvador E. Tropea
+# Copyright (c) 2022 Instituto Nacional de Tecnología Industrial
+# License: GPL-3.0
+# Project: KiBot (formerly KiPlot)
+"""
+Startup benchmark for the configuration loading (CfgYamlReader.load_yaml).
+Creates a configuration importing IMPORTS files, each one containing OUTPUTS outputs.
+Then measures the time to parse all the files using:
+- The pure Python YAML loader
+- The C YAML loader (libyaml), if available
+- The results cache (second run)
+Usage: config_load.py [IMPORTS] [OUTPUTS]
+"""
+import os
+import sys
+from tempfile import TemporaryDirectory
+from timeit import timeit
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, ROOT_DIR)
+from kibot.gs import GS  # noqa: E402
+import kibot.config_reader as config_reader  # noqa: E402
+from kibot.cache import store_data  # noqa: E402
+
+OUTPUT = """
+  - name: 'gerbers_{n}'
+    comment: "Gerbers for the board house {n}"
+    type: gerber
+    dir: gerbers_{n}
+    options:
+      exclude_edge_layer: true
+      exclude_pads_from_silkscreen: false
+      plot_sheet_reference: false
+      plot_footprint_refs: true
+      plot_footprint_values: true
+      force_plot_invisible_refs_vals: false
+      tent_vias: true
+      line_width: 0.1
+      subtract_mask_from_silk: false
+      use_protel_extensions: false
+      gerber_precision: 4.6
+      create_gerber_job_file: true
+      use_gerber_x2_attributes: true
+      use_gerber_net_attributes: true
+    layers:
+      - layer: F.Cu
+        suffix: F_Cu
+      - layer: B.Cu
+        suffix: B_Cu
+      - 'F.SilkS'
+      - 'B.SilkS'
+      - 'Edge.Cuts'
+
+  - name: 'bom_{n}'
+    comment: "BoM {n}"
+    type: bom
+    options:
+      format: HTML
+      columns: [Row, References, Part, Value, Footprint, Quantity Per PCB, Status, Datasheet]
+      group_fields: ['Part', 'Part Lib', 'Value', 'Footprint', 'Footprint Lib']
+      html:
+        title: 'Test for a BoM {n}'
+        logo: false
+        style: modern-blue
+"""
+
+
+def create_config(dir, imports, outputs):
+    main = os.path.join(dir, 'main.kibot.yaml')
+    with open(main, 'wt') as f:
+        f.write("kibot:\n  version: 1\n\nimport:\n")
+        for i in range(imports):
+            fname = 'import_{}.kibot.yaml'.format(i)
+            f.write("  - {}\n".format(fname))
+            with open(os.path.join(dir, fname), 'wt') as fi:
+                fi.write("kibot:\n  version: 1\n\noutputs:")
+                for n in range(outputs):
+                    fi.write(OUTPUT.format(n=str(i)+'_'+str(n)))
+    return [main]+[os.path.join(dir, 'import_{}.kibot.yaml'.format(i)) for i in range(imports)]
+
+
+def load_all(files, store=False):
+    reader = config_reader.CfgYamlReader()
+    for fname in files:
+        with open(fname) as f:
+            reader.load_yaml(f)
+    if store:
+        # KiBot stores the entries after parsing the globals
+        for key, data in reader.to_cache:
+            store_data('config', key, data)
+
+
+def main():
+    imports = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    outputs = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    GS.kibot_version = 'benchmark'
+    with TemporaryDirectory() as dir:
+        files = create_config(dir, imports, outputs)
+        size = sum(os.path.getsize(f) for f in files)
+        print('{} files, {} outputs, {} KiB'.format(len(files), imports*outputs*2, size//1024))
+        # The cache is empty until we store the entries
+        GS.global_use_cache = True
+        GS.global_cache_dir = GS.global_from_cli['cache_dir'] = os.path.join(dir, 'cache')
+        loaders = [('Python', config_reader.yaml.SafeLoader)]
+        if hasattr(config_reader.yaml, 'CSafeLoader'):
+            loaders.append(('C (libyaml)', config_reader.yaml.CSafeLoader))
+        for name, loader in loaders:
+            config_reader.YAMLLoader = loader
+            t = timeit(lambda: load_all(files), number=1)
+            print('{} loader: {:.3f} s'.format(name, t))
+        # Now fill the cache and use it
+        load_all(files, store=True)
+        t = timeit(lambda: load_all(files), number=1)
+        print('Cached: {:.3f} s'.format(t))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (c) 2022 Salvador E. Tropea
+# Copyright (c) 2022 Instituto Nacional de Tecnología Industrial
+# License: GPL-3.0
+# Project: KiBot (formerly KiPlot)
+"""
+Microbenchmark for the file name expansion (Optionable.expand_filename_both).
+Emulates the calls done by:
+- The `download_datasheets` output: one different name for each component.
+- The `compress` output: the same out_dir and output patterns, expanded over and over.
+Usage: expand_filename.py [SCHEMATIC] [REPETITIONS]
+Compare the results using different revisions of the code.
+"""
+import os
+import sys
+from datetime import datetime
+from timeit import timeit
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, ROOT_DIR)
+from kibot.gs import GS  # noqa: E402
+from kibot.optionable import Optionable  # noqa: E402
+from kibot.kicad.v5_sch import Schematic  # noqa: E402
+
+SCH = os.path.join(ROOT_DIR, 'tests', 'board_samples', 'kicad_5', 'bom.sch')
+
+
+class FakeOutput(object):
+    """ What the expansion needs from the output and its options """
+    output_id = 'bench'
+
+    def __init__(self):
+        self._expand_id = 'compress'
+        self._expand_ext = 'zip'
+        self._parent = self
+        self.variant = None
+
+    def _find_variant(self):
+        return ''
+
+    def _find_variant_name(self):
+        return ''
+
+
+def main():
+    sch_file = sys.argv[1] if len(sys.argv) > 1 else SCH
+    reps = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    GS.set_sch(sch_file)
+    GS.sch = Schematic()
+    GS.sch.load(GS.sch_file, GS.sch_basename)
+    GS.global_date_format = '%Y-%m-%d'
+    GS.global_time_format = '%H-%M-%S'
+    GS.n = datetime.now()
+    GS.out_dir = '%f-%D/%sr'
+    obj = FakeOutput()
+    comps = GS.sch.get_components()
+    # Datasheets: the fields are already replaced, so each name is different
+    names = ['{}_{}_{}.pdf'.format(c.value, c.footprint, c.ref) for c in comps]
+
+    def datasheets():
+        for name in names:
+            Optionable.expand_filename_sch(obj, name)
+
+    def compress():
+        for _ in names:
+            Optionable.expand_filename_sch(obj, GS.out_dir)
+            Optionable.expand_filename_sch(obj, GS.def_global_output)
+
+    for name, func, n in (('datasheets', datasheets, len(names)), ('compress', compress, 2*len(names))):
+        t = timeit(func, number=reps)
+        print('{}: {} expansions in {:.3f} s ({:.2f} us/expansion)'.format(name, n*reps, t, t/(n*reps)*1e6))
+
+
+if __name__ == '__main__':
+    main()
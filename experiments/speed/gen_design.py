@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright (c) 2022 Salvador E. Tropea
+# Copyright (c) 2022 Instituto Nacional de Tecnología Industrial
+# License: GPL-3.0
+# Project: KiBot (formerly KiPlot)
+"""
+Synthetic KiCad designs for the benchmarks.
+Creates a hierarchical schematic and its PCB, for KiCad 5 or 6, at a configurable scale:
+- SHEETS sub-sheets, each one using a different file (0 means a flat design)
+- SYMBOLS resistors and capacitors on each sheet
+- FIELDS extra fields for each symbol (manufacturer, distributor codes, etc.)
+- VARIANTS KiBoM style variants (V0, V1, ...) used in the `Config` field
+The designs are generated from a fixed seed, so they are the same for each run.
+Usage: gen_design.py [-k 5|6] [-s SHEETS] [-n SYMBOLS] [-f FIELDS] [-V VARIANTS] DIR
+"""
+import argparse
+import os
+import random
+import uuid
+
+R_VALUES = ('10k', '4k7', '1k', '100', '47k', '1M', '2k2', '330', '10k 1%', '0R')
+C_VALUES = ('100nF', '10uF', '1uF', '22pF', '4.7nF', '100n', '0.1uF')
+FOOTPRINTS = {'R': 'Resistor_SMD:R_0805_2012Metric', 'C': 'Capacitor_SMD:C_0603_1608Metric'}
+FIELD_NAMES = ('manf#', 'manf', 'digikey#', 'mouser#', 'lcsc#', 'Tolerance', 'Voltage', 'Power')
+PROJECT = 'synth'
+LIB = 'synth'
+
+V5_LIB = """EESchema-LIBRARY Version 2.4
+#encoding utf-8
+#
+# R
+#
+DEF R R 0 0 N Y 1 F N
+F0 "R" 80 0 50 V V C CNN
+F1 "R" 0 0 50 V V C CNN
+F2 "" -70 0 50 V I C CNN
+F3 "" 0 0 50 H I C CNN
+$FPLIST
+ R_*
+$ENDFPLIST
+DRAW
+S -40 -100 40 100 0 1 10 N
+X ~ 1 0 150 50 D 50 50 1 1 P
+X ~ 2 0 -150 50 U 50 50 1 1 P
+ENDDRAW
+ENDDEF
+#
+# C
+#
+DEF C C 0 10 N Y 1 F N
+F0 "C" 25 100 50 H V L CNN
+F1 "C" 25 -100 50 H V L CNN
+F2 "" 38 -150 50 H I C CNN
+F3 "" 0 0 50 H I C CNN
+$FPLIST
+ C_*
+$ENDFPLIST
+DRAW
+P 2 0 1 20 -80 -30 80 -30 N
+P 2 0 1 20 -80 30 80 30 N
+X ~ 1 0 150 110 D 50 50 1 1 P
+X ~ 2 0 -150 110 U 50 50 1 1 P
+ENDDRAW
+ENDDEF
+#
+#End Library
+"""
+
+V5_SCH_HEAD = """EESchema Schematic File Version 4
+EELAYER 30 0
+EELAYER END
+$Descr A4 11693 8268
+encoding utf-8
+Sheet {} {}
+Title "Synthetic design"
+Date "2022-01-01"
+Rev "1"
+Comp "KiBot"
+Comment1 ""
+Comment2 ""
+Comment3 ""
+Comment4 ""
+$EndDescr
+"""
+
+V6_LIB_SYMBOLS = """  (lib_symbols
+    (symbol "{lib}:C" (pin_numbers hide) (pin_names (offset 0.254)) (in_bom yes) (on_board yes)
+      (property "Reference" "C" (id 0) (at 0.635 2.54 0)
+        (effects (font (size 1.27 1.27)) (justify left))
+      )
+      (property "Value" "C" (id 1) (at 0.635 -2.54 0)
+        (effects (font (size 1.27 1.27)) (justify left))
+      )
+      (property "Footprint" "" (id 2) (at 0.9652 -3.81 0)
+        (effects (font (size 1.27 1.27)) hide)
+      )
+      (property "Datasheet" "~" (id 3) (at 0 0 0)
+        (effects (font (size 1.27 1.27)) hide)
+      )
+      (symbol "C_0_1"
+        (polyline
+          (pts
+            (xy -2.032 -0.762)
+            (xy 2.032 -0.762)
+          )
+          (stroke (width 0.508) (type default) (color 0 0 0 0))
+          (fill (type none))
+        )
+        (polyline
+          (pts
+            (xy -2.032 0.762)
+            (xy 2.032 0.762)
+          )
+          (stroke (width 0.508) (type default) (color 0 0 0 0))
+          (fill (type none))
+        )
+      )
+      (symbol "C_1_1"
+        (pin passive line (at 0 3.81 270) (length 2.794)
+          (name "~" (effects (font (size 1.27 1.27))))
+          (number "1" (effects (font (size 1.27 1.27))))
+        )
+        (pin passive line (at 0 -3.81 90) (length 2.794)
+          (name "~" (effects (font (size 1.27 1.27))))
+          (number "2" (effects (font (size 1.27 1.27))))
+        )
+      )
+    )
+    (symbol "{lib}:R" (pin_numbers hide) (pin_names (offset 0)) (in_bom yes) (on_board yes)
+      (property "Reference" "R" (id 0) (at 2.032 0 90)
+        (effects (font (size 1.27 1.27)))
+      )
+      (property "Value" "R" (id 1) (at 0 0 90)
+        (effects (font (size 1.27 1.27)))
+      )
+      (property "Footprint" "" (id 2) (at -1.778 0 90)
+        (effects (font (size 1.27 1.27)) hide)
+      )
+      (property "Datasheet" "~" (id 3) (at 0 0 0)
+        (effects (font (size 1.27 1.27)) hide)
+      )
+      (symbol "R_0_1"
+        (rectangle (start -1.016 -2.54) (end 1.016 2.54)
+          (stroke (width 0.254) (type default) (color 0 0 0 0))
+          (fill (type none))
+        )
+      )
+      (symbol "R_1_1"
+        (pin passive line (at 0 3.81 270) (length 1.27)
+          (name "~" (effects (font (size 1.27 1.27))))
+          (number "1" (effects (font (size 1.27 1.27))))
+        )
+        (pin passive line (at 0 -3.81 90) (length 1.27)
+          (name "~" (effects (font (size 1.27 1.27))))
+          (number "2" (effects (font (size 1.27 1.27))))
+        )
+      )
+    )
+  )
+"""
+
+PCB_LAYERS = ((0, 'F.Cu', 'signal'), (31, 'B.Cu', 'signal'), (34, 'B.Paste', 'user'), (35, 'F.Paste', 'user'),
+              (36, 'B.SilkS', 'user'), (37, 'F.SilkS', 'user'), (38, 'B.Mask', 'user'), (39, 'F.Mask', 'user'),
+              (44, 'Edge.Cuts', 'user'), (46, 'B.CrtYd', 'user'), (47, 'F.CrtYd', 'user'), (48, 'B.Fab', 'user'),
+              (49, 'F.Fab', 'user'))
+
+
+class Symbol(object):
+    """ A component of the synthetic design """
+    def __init__(self, ref, value, fields, sheet, x, y, ts, uid):
+        super().__init__()
+        self.ref = ref
+        self.prefix = ref[0]
+        self.value = value
+        self.footprint = FOOTPRINTS[self.prefix]
+        # List of (name, value)
+        self.fields = fields
+        # Index of the sheet, -1 for the root
+        self.sheet = sheet
+        self.x = x
+        self.y = y
+        # KiCad 5 time stamp and KiCad 6 UUID
+        self.ts = ts
+        self.uuid = uid
+
+
+class Design(object):
+    """ The components and sheets of a synthetic design """
+    def __init__(self, sheets=4, symbols=100, fields=4, variants=2, seed=1):
+        super().__init__()
+        self.rnd = random.Random(seed)
+        self.ts = 0x5F000000
+        self.n_sheets = sheets
+        self.sheet_ts = [self.new_ts() for _ in range(sheets)]
+        self.sheet_uuid = [self.new_uuid() for _ in range(sheets)]
+        self.field_names = [FIELD_NAMES[n] if n < len(FIELD_NAMES) else 'Extra{}'.format(n) for n in range(fields)]
+        self.variants = ['V{}'.format(n) for n in range(variants)]
+        self.symbols = []
+        refs = {'R': 0, 'C': 0}
+        for sheet in range(sheets) if sheets else [-1]:
+            for n in range(symbols):
+                prefix = 'R' if self.rnd.random() < 0.6 else 'C'
+                refs[prefix] += 1
+                value = self.rnd.choice(R_VALUES if prefix == 'R' else C_VALUES)
+                fields = [(name, self.field_value(name, prefix, value)) for name in self.field_names]
+                if self.variants:
+                    config = ','.join('-'+v for v in self.variants if self.rnd.random() < 0.2)
+                    fields.append(('Config', config))
+                x = 1000+(n % 20)*400
+                y = 1000+(n//20)*300
+                self.symbols.append(Symbol(prefix+str(refs[prefix]), value, fields, sheet, x, y, self.new_ts(),
+                                           self.new_uuid()))
+
+    def new_ts(self):
+        self.ts += 1
+        return '{:08X}'.format(self.ts)
+
+    def new_uuid(self):
+        return str(uuid.UUID(int=self.rnd.getrandbits(128)))
+
+    def field_value(self, name, prefix, value):
+        # Some fields are empty, like in real designs
+        if self.rnd.random() < 0.2:
+            return ''
+        if name[-1] == '#':
+            return '{}-{}-{:04d}'.format(name[:-1].upper(), prefix, self.rnd.randrange(10000))
+        return value+' '+name
+
+    def sheet_symbols(self, sheet):
+        return [s for s in self.symbols if s.sheet == sheet]
+
+    def sheet_file(self, sheet, ext):
+        return PROJECT+ext if sheet < 0 else 'sub_{}{}'.format(sheet, ext)
+
+
+def _q(text):
+    """ Quoted string """
+    return '"{}"'.format(text.replace('\\', '\\\\').replace('"', '\\"'))
+
+
+def write_v5_sheet(d, sheet, fname):
+    with open(fname, 'wt') as f:
+        f.write(V5_SCH_HEAD.format(sheet+2, d.n_sheets+1))
+        if sheet < 0:
+            for n, ts in enumerate(d.sheet_ts):
+                f.write('$Sheet\nS {} 7000 1000 500 \nU {}\n'.format(1000+n*1200, ts))
+                f.write('F0 "Sheet {}" 50\nF1 "{}" 50\n$EndSheet\n'.format(n, d.sheet_file(n, '.sch')))
+        for s in d.sheet_symbols(sheet):
+            f.write('$Comp\nL {}:{} {}\nU 1 1 {}\nP {} {}\n'.format(LIB, s.prefix, s.ref, s.ts, s.x, s.y))
+            f.write('F 0 "{}" H {} {} 50  0000 C CNN\n'.format(s.ref, s.x, s.y-100))
+            f.write('F 1 "{}" H {} {} 50  0000 C CNN\n'.format(s.value, s.x, s.y+100))
+            f.write('F 2 "{}" H {} {} 50  0001 C CNN\n'.format(s.footprint, s.x, s.y))
+            f.write('F 3 "~" H {} {} 50  0001 C CNN\n'.format(s.x, s.y))
+            for n, (name, value) in enumerate(s.fields):
+                f.write('F {} "{}" H {} {} 50  0001 C CNN "{}"\n'.format(n+4, value, s.x, s.y, name))
+            f.write('\t1    {} {}\n\t1    0    0    -1  \n$EndComp\n'.format(s.x, s.y))
+        f.write('$EndSCHEMATC\n')
+
+
+def write_v6_sheet(d, sheet, fname):
+    with open(fname, 'wt') as f:
+        f.write('(kicad_sch (version 20211123) (generator eeschema)\n\n')
+        f.write('  (uuid {})\n\n  (paper "A4")\n\n'.format(d.sheet_uuid[sheet] if sheet >= 0 else d.new_uuid()))
+        f.write('  (title_block\n    (title "Synthetic design")\n    (date "2022-01-01")\n    (rev "1")\n'
+                '    (company "KiBot")\n  )\n\n')
+        f.write(V6_LIB_SYMBOLS.format(lib=LIB))
+        for s in d.sheet_symbols(sheet):
+            x = s.x*0.0254
+            y = s.y*0.0254
+            f.write('\n  (symbol (lib_id "{}:{}") (at {:.2f} {:.2f} 0) (unit 1)\n'.format(LIB, s.prefix, x, y))
+            f.write('    (in_bom yes) (on_board yes)\n    (uuid {})\n'.format(s.uuid))
+            fields = [('Reference', s.ref), ('Value', s.value), ('Footprint', s.footprint), ('Datasheet', '~')]
+            for n, (name, value) in enumerate(fields+s.fields):
+                f.write('    (property {} {} (id {}) (at {:.2f} {:.2f} 0)'.format(_q(name), _q(value), n, x, y))
+                f.write(')\n' if n < 2 else '\n      (effects (font (size 1.27 1.27)) hide)\n    )\n')
+            f.write('    (pin "1" (uuid {}))\n    (pin "2" (uuid {}))\n  )\n'.format(d.new_uuid(), d.new_uuid()))
+        if sheet < 0:
+            for n, sheet_uuid in enumerate(d.sheet_uuid):
+                x = 25.4+n*30.48
+                f.write('\n  (sheet (at {:.2f} 177.8) (size 25.4 12.7)\n'.format(x))
+                f.write('    (stroke (width 0) (type solid) (color 0 0 0 0))\n')
+                f.write('    (fill (color 0 0 0 0.0000))\n    (uuid {})\n'.format(sheet_uuid))
+                f.write('    (property "Sheet name" "Sheet {}" (id 0) (at {:.2f} 177.0 0)\n'.format(n, x))
+                f.write('      (effects (font (size 1.27 1.27)) (justify left bottom))\n    )\n')
+                f.write('    (property "Sheet file" "{}" (id 1) (at {:.2f} 191.0 0)\n'.
+                        format(d.sheet_file(n, '.kicad_sch'), x))
+                f.write('      (effects (font (size 1.27 1.27)) (justify left top))\n    )\n  )\n')
+            f.write('\n  (sheet_instances\n    (path "/" (page "1"))\n')
+            for n, sheet_uuid in enumerate(d.sheet_uuid):
+                f.write('    (path "/{}/" (page "{}"))\n'.format(sheet_uuid, n+2))
+            f.write('  )\n\n  (symbol_instances\n')
+            for s in d.symbols:
+                path = '/'+(d.sheet_uuid[s.sheet]+'/' if s.sheet >= 0 else '')+s.uuid
+                f.write('    (path "{}"\n      (reference "{}") (unit 1) (value {}) (footprint "{}")\n    )\n'.
+                        format(path, s.ref, _q(s.value), s.footprint))
+            f.write('  )\n')
+        f.write(')\n')
+
+
+def write_pcb(d, fname, ki6):
+    """ A board with a footprint for each symbol, connected in a chain """
+    q = _q if ki6 else (lambda x: x)
+    with open(fname, 'wt') as f:
+        if ki6:
+            f.write('(kicad_pcb (version 20211014) (generator pcbnew)\n\n  (general\n    (thickness 1.6)\n  )\n\n')
+            f.write('  (paper "A4")\n  (layers\n')
+        else:
+            f.write('(kicad_pcb (version 20171130) (host pcbnew 5.1.9)\n\n  (general\n    (thickness 1.6)\n  )\n\n')
+            f.write('  (page A4)\n  (layers\n')
+        for n, name, kind in PCB_LAYERS:
+            f.write('    ({} {} {})\n'.format(n, q(name), kind))
+        f.write('  )\n\n  (net 0 "")\n')
+        n_nets = len(d.symbols)+1
+        for n in range(1, n_nets+1):
+            f.write('  (net {} {})\n'.format(n, q('N'+str(n))))
+        for n, s in enumerate(d.symbols):
+            x = s.x*0.0254
+            y = s.y*0.0254+(s.sheet+1)*80
+            lib, name = s.footprint.split(':')
+            if ki6:
+                f.write('\n  (footprint {} (layer "F.Cu")\n    (tedit 0) (tstamp {})\n'.format(_q(s.footprint), s.uuid))
+                f.write('    (at {:.2f} {:.2f})\n'.format(x, y))
+                path = '/'+(d.sheet_uuid[s.sheet]+'/' if s.sheet >= 0 else '')+s.uuid
+                f.write('    (property "Sheetfile" "{}")\n'.format(d.sheet_file(s.sheet, '.kicad_sch')))
+            else:
+                f.write('\n  (module {} (layer F.Cu) (tedit 0) (tstamp {})\n'.format(s.footprint, s.ts))
+                f.write('    (at {:.2f} {:.2f})\n'.format(x, y))
+                path = '/'+(d.sheet_ts[s.sheet]+'/' if s.sheet >= 0 else '')+s.ts
+            f.write('    (path {})\n    (attr smd)\n'.format(path))
+            for kind, text, layer, dy in (('reference', s.ref, 'F.SilkS', -1.65), ('value', s.value, 'F.Fab', 1.65)):
+                f.write('    (fp_text {} {} (at 0 {}) (layer {})\n'.format(kind, q(text), dy, q(layer)))
+                f.write('      (effects (font (size 1 1) (thickness 0.15)))\n    )\n')
+            for pad in (1, 2):
+                net = n+pad
+                f.write('    (pad {} smd rect (at {} 0) (size 1 1.4) (layers {} {} {}) (net {} {}))\n'.
+                        format(q(str(pad)), -1 if pad == 1 else 1, q('F.Cu'), q('F.Paste'), q('F.Mask'), net,
+                               q('N'+str(net))))
+            f.write('  )\n')
+        for start, end in (('0 0', '300 0'), ('300 0', '300 300'), ('300 300', '0 300'), ('0 300', '0 0')):
+            f.write('\n  (gr_line (start {}) (end {}) (layer {}) (width 0.05))'.format(start, end, q('Edge.Cuts')))
+        f.write('\n\n)\n')
+
+
+def generate(dest_dir, kicad=6, sheets=4, symbols=100, fields=4, variants=2, seed=1):
+    """ Creates a synthetic design in `dest_dir`.
+        Returns a dict with the name of the schematic (`sch`), PCB (`pcb`) and the `design` object. """
+    os.makedirs(dest_dir, exist_ok=True)
+    d = Design(sheets, symbols, fields, variants, seed)
+    if kicad == 5:
+        ext = '.sch'
+        with open(os.path.join(dest_dir, LIB+'.lib'), 'wt') as f:
+            f.write(V5_LIB)
+        with open(os.path.join(dest_dir, 'sym-lib-table'), 'wt') as f:
+            f.write('(sym_lib_table\n  (lib (name {0})(type Legacy)(uri ${{KIPRJMOD}}/{0}.lib)(options "")(descr ""))\n)\n'.
+                    format(LIB))
+        write_sheet = write_v5_sheet
+    else:
+        ext = '.kicad_sch'
+        write_sheet = write_v6_sheet
+    for sheet in range(sheets):
+        write_sheet(d, sheet, os.path.join(dest_dir, d.sheet_file(sheet, ext)))
+    sch = os.path.join(dest_dir, PROJECT+ext)
+    write_sheet(d, -1, sch)
+    pcb = os.path.join(dest_dir, PROJECT+'.kicad_pcb')
+    write_pcb(d, pcb, kicad == 6)
+    return {'sch': sch, 'pcb': pcb, 'design': d}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Synthetic KiCad designs for the benchmarks')
+    parser.add_argument('dir', help='Destination directory')
+    parser.add_argument('-k', '--kicad', type=int, choices=(5, 6), default=6, help='KiCad version')
+    parser.add_argument('-s', '--sheets', type=int, default=4, help='Number of sub-sheets')
+    parser.add_argument('-n', '--symbols', type=int, default=100, help='Symbols for each sheet')
+    parser.add_argument('-f', '--fields', type=int, default=4, help='Extra fields for each symbol')
+    parser.add_argument('-V', '--variants', type=int, default=2, help='Number of variants')
+    parser.add_argument('--seed', type=int, default=1, help='Random seed')
+    args = parser.parse_args()
+    res = generate(args.dir, args.kicad, args.sheets, args.symbols, args.fields, args.variants, args.seed)
+    print('{}: {} symbols'.format(res['sch'], len(res['design'].symbols)))
+    print(res['pcb'])
+
+
+if __name__ == '__main__':
+    main()
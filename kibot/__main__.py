@@ -9,7 +9,7 @@
 
 Usage:
   kibot [-b BOARD] [-e SCHEMA] [-c CONFIG] [-d OUT_DIR] [-s PRE]
-         [-q | -v...] [-i] [-C] [-m MKFILE] [-g DEF]... [TARGET...]
+         [-q | -v...] [-L JSON] [-i] [-C] [-m MKFILE] [-g DEF]... [TARGET...]
   kibot [-v...] [-b BOARD] [-e SCHEMA] [-c PLOT_CONFIG] --list
   kibot [-v...] [-b BOARD] [-d OUT_DIR] [-p | -P] --example
   kibot [-v...] --help-filters
@@ -38,6 +38,7 @@ Options:
   --help-preflights                List supported preflights and details
   -i, --invert-sel                 Generate the outputs not listed as targets
   -l, --list                       List available outputs (in the config file)
+  -L JSON, --log-json JSON         Also log warnings and errors to this file (JSON lines)
   -m MKFILE, --makefile MKFILE     Generate a Makefile (no targets created)
   -p, --copy-options               Copy plot options from the PCB file
   -P, --copy-and-expand            As -p but expand the list of layers
@@ -313,6 +314,9 @@ def main():
     log.set_verbosity(logger, args.verbose, args.quiet)
     GS.debug_enabled = logger.getEffectiveLevel() <= DEBUG
     GS.debug_level = args.verbose
+    # Structured log for CI tools
+    if args.log_json:
+        log.set_json_log(args.log_json)
     # Now we have the debug level set we can check (and optionally inform) KiCad info
     detect_kicad()
 
@@ -359,16 +363,10 @@ def main():
 
     # Read the config file
     cr = CfgYamlReader()
-    outputs = None
-    try:
-        # The Python way ...
-        with gzip.open(plot_config) as cf_file:
-            outputs = cr.read(cf_file)
-    except OSError:
-        pass
-    if outputs is None:
-        with open(plot_config) as cf_file:
-            outputs = cr.read(cf_file)
+    with open(plot_config, 'rb') as f:
+        compressed = f.read(2) == b'\x1f\x8b'
+    with gzip.open(plot_config) if compressed else open(plot_config) as cf_file:
+        outputs = cr.read(cf_file)
 
     # Is just list the available targets?
     if args.list:
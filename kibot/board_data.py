@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2022 Salvador E. Tropea
+# Copyright (c) 2022 Instituto Nacional de Tecnología Industrial
+# License: GPL-3.0
+# Project: KiBot (formerly KiPlot)
+"""
+Plain Python copy of the PCB data used by various outputs.
+Each call to a KiCad method goes through SWIG, for big PCBs this is slow.
+Here we collect the footprints, pads, tracks and vias in one pass and share the result during the run.
+The data reflects the PCB as loaded, changes applied by the outputs (and undone) aren't tracked.
+The numeric data is also stored in arrays, so we can process it in bulk.
+If NumPy is installed we use it, otherwise we use plain Python.
+NumPy is imported the first time we need it, importing it takes time and most runs don't use this module.
+"""
+from array import array
+from .gs import GS
+from . import log
+np = None
+# None until we try to import NumPy
+no_numpy = None
+
+logger = log.get_logger()
+INF = float('inf')
+
+
+def has_numpy():
+    """ Imports NumPy the first time, returns False if it isn't available """
+    global np, no_numpy
+    if no_numpy is None:
+        try:
+            import numpy
+            np = numpy
+            no_numpy = False
+        except ImportError:
+            no_numpy = True
+    return not no_numpy
+
+
+def minimum(values, default=INF):
+    """ Minimum of the values, `default` if empty """
+    if not len(values):
+        return default
+    if not has_numpy():
+        return min(values)
+    return np.min(values).item()
+
+
+def histogram(values):
+    """ Dict with the number of times each value is used """
+    if not has_numpy():
+        res = {}
+        for v in values:
+            res[v] = res.get(v, 0) + 1
+        return res
+    if not len(values):
+        return {}
+    vals, counts = np.unique(np.asarray(values), return_counts=True)
+    return dict(zip(vals.tolist(), counts.tolist()))
+
+
+def histogram_pairs(a, b):
+    """ Dict with the number of times each (a, b) pair is used """
+    if not has_numpy():
+        return histogram(list(zip(a, b)))
+    if not len(a):
+        return {}
+    vals, counts = np.unique(np.column_stack((np.asarray(a), np.asarray(b))), axis=0, return_counts=True)
+    return {tuple(v): c for v, c in zip(vals.tolist(), counts.tolist())}
+
+
+def scale(values, offset=0, factor=1):
+    """ (v-offset)*factor for each value """
+    if not has_numpy():
+        return [(v-offset)*factor for v in values]
+    return ((np.asarray(values)-offset)*factor).tolist()
+
+
+def int_scale(values, mul, div):
+    """ v*mul//div for each value, using integers """
+    if not has_numpy():
+        return [v*mul//div for v in values]
+    return ((np.asarray(values, dtype=np.int64)*mul)//div).tolist()
+
+
+def reflect(values, keep, top):
+    """ v if keep else top-v for each value """
+    if not has_numpy():
+        return [v if k else top-v for v, k in zip(values, keep)]
+    values = np.asarray(values, dtype=np.int64)
+    return np.where(np.asarray(keep, dtype=bool), values, top-values).tolist()
+
+
+def drill_stats(drill_x, drill_y, size_x, size_y):
+    """ Statistics for the drilled pads:
+        - Minimum drill
+        - Round drills histogram
+        - Oval drills histogram (indexed by (small, big) size)
+        - Minimum slot (small size of the oval drills)
+        - Minimum annular ring (not 0) """
+    if not has_numpy():
+        pad_drill = oar = INF
+        oval_s = []
+        oval_b = []
+        rounds = []
+        for dx, dy, sx, sy in zip(drill_x, drill_y, size_x, size_y):
+            if not dx:
+                continue
+            pad_drill = min(dx, dy, pad_drill)
+            if dx == dy:
+                rounds.append(dx)
+            else:
+                oval_s.append(min(dx, dy))
+                oval_b.append(max(dx, dy))
+            oar_t = min(sx-dx, sy-dy)
+            if oar_t:
+                oar = min(oar, oar_t)
+        return pad_drill, histogram(rounds), histogram_pairs(oval_s, oval_b), minimum(oval_s), oar
+    dx = np.asarray(drill_x, dtype=np.int64)
+    dy = np.asarray(drill_y, dtype=np.int64)
+    drilled = dx != 0
+    dx = dx[drilled]
+    dy = dy[drilled]
+    sx = np.asarray(size_x, dtype=np.int64)[drilled]
+    sy = np.asarray(size_y, dtype=np.int64)[drilled]
+    pad_drill = min(minimum(dx), minimum(dy))
+    is_round = dx == dy
+    oval = ~is_round
+    small = np.minimum(dx[oval], dy[oval])
+    oar = np.minimum(sx-dx, sy-dy)
+    return (pad_drill, histogram(dx[is_round]), histogram_pairs(small, np.maximum(dx[oval], dy[oval])), minimum(small),
+            minimum(oar[oar != 0]))
+
+
+class PadData(object):
+    """ Pad information """
+    __slots__ = ('name', 'x', 'y', 'net', 'bottom', 'drill_x', 'drill_y', 'size_x', 'size_y')
+
+    def __init__(self, pad):
+        super().__init__()
+        self.name = pad.GetName()
+        pos = pad.GetPosition()
+        self.x = pos.x
+        self.y = pos.y
+        self.net = pad.GetNetCode()
+        self.bottom = pad.IsFlipped()
+        dr = pad.GetDrillSize()
+        self.drill_x = dr.x
+        self.drill_y = dr.y
+        size = pad.GetSize()
+        self.size_x = size.x
+        self.size_y = size.y
+
+
+class FootprintData(object):
+    """ Footprint information """
+    __slots__ = ('ref', 'value', 'footprint', 'layer', 'bottom', 'rot', 'attrs', 'center_x', 'center_y', 'bbox', 'pads')
+
+    def __init__(self, m):
+        super().__init__()
+        self.ref = m.GetReference()
+        self.value = m.GetValue()
+        self.footprint = str(m.GetFPID().GetLibItemName())  # pcbnew.UTF8 type
+        self.layer = m.GetLayer()
+        self.bottom = m.IsFlipped()
+        self.rot = m.GetOrientationDegrees()
+        self.attrs = m.GetAttributes()
+        center = m.GetCenter() if GS.ki5() else m.GetPosition()
+        self.center_x = center.x
+        self.center_y = center.y
+        bbox = m.GetBoundingBox()
+        self.bbox = (bbox.GetLeft(), bbox.GetTop(), bbox.GetRight(), bbox.GetBottom())
+        self.pads = [PadData(p) for p in m.Pads()]
+
+
+class BoardData(object):
+    """ The footprints, track widths and vias (drill and width) of a PCB.
+        The footprint centers and the size of all the pads are also available as arrays. """
+    _cache = None
+
+    def __init__(self, board):
+        super().__init__()
+        self.board = board
+        self.footprints = [FootprintData(m) for m in GS.get_modules_board(board)]
+        self.center_x = array('q', (m.center_x for m in self.footprints))
+        self.center_y = array('q', (m.center_y for m in self.footprints))
+        pads = [p for m in self.footprints for p in m.pads]
+        self.pad_drill_x = array('q', (p.drill_x for p in pads))
+        self.pad_drill_y = array('q', (p.drill_y for p in pads))
+        self.pad_size_x = array('q', (p.size_x for p in pads))
+        self.pad_size_y = array('q', (p.size_y for p in pads))
+        self.track_widths = array('q')
+        self.via_drills = array('q')
+        self.via_widths = array('q')
+        track_type = 'TRACK' if GS.ki5() else 'PCB_TRACK'
+        via_type = 'VIA' if GS.ki5() else 'PCB_VIA'
+        for t in board.GetTracks():
+            tclass = t.GetClass()
+            if tclass == track_type:
+                self.track_widths.append(t.GetWidth())
+            elif tclass == via_type:
+                via = t.Cast()
+                self.via_drills.append(via.GetDrill())
+                self.via_widths.append(via.GetWidth())
+        logger.debug('Collected data for {} footprints, {} tracks and {} vias'.
+                     format(len(self.footprints), len(self.track_widths), len(self.via_drills)))
+
+    @staticmethod
+    def get(board=None):
+        """ Returns the data for the board, by default the current PCB.
+            The data is collected only once for each board. """
+        if board is None:
+            board = GS.board
+        data = BoardData._cache
+        if data is None or data.board is not board:
+            data = BoardData._cache = BoardData(board)
+        return data
@@ -10,8 +10,6 @@ XLSX Writer: Generates an XLSX BoM file.
 """
 import io
 import pprint
-import os.path as op
-import sys
 from textwrap import wrap
 from base64 import b64decode
 from .columnlist import ColumnList
@@ -19,6 +17,7 @@ from .kibot_logo import KIBOT_LOGO
 from .. import log
 from ..misc import W_NOKICOST, W_UNKDIST
 from ..__main__ import __version__
+from ..kicost_support import KICOST_SUPPORT
 try:
     from xlsxwriter import Workbook
     XLSX_SUPPORT = True
@@ -28,29 +27,13 @@ except ModuleNotFoundError:
     class Workbook():
         pass
 # KiCost support
-try:
-    # Give priority to submodules
-    rel_path = '../../submodules/KiCost/'
-    if op.isfile(op.join(op.dirname(__file__), rel_path+'kicost/__init__.py')):
-        rel_path = op.abspath(op.join(op.dirname(__file__), rel_path))
-        if rel_path not in sys.path:
-            sys.path.insert(0, rel_path)
-    # Init the logger first
-    logger = log.get_logger()
-    from kicost.global_vars import set_logger
-    set_logger(logger)
+if KICOST_SUPPORT:
     from kicost import PartGroup
     from kicost.kicost import query_part_info
     from kicost.spreadsheet import create_worksheet, Spreadsheet
-    from kicost.distributors import (init_distributor_dict, set_distributors_logger, get_distributors_list,
-                                     get_dist_name_from_label, set_distributors_progress)
-    from kicost.edas import set_edas_logger
-    # Progress mechanism: use the one declared in __main__ (TQDM)
-    from kicost.__main__ import ProgressConsole
-    set_distributors_progress(ProgressConsole)
-    KICOST_SUPPORT = True
-except ModuleNotFoundError:
-    KICOST_SUPPORT = False
+    from kicost.distributors import init_distributor_dict, get_distributors_list, get_dist_name_from_label
+    from ..kicost_support import restore_spreadsheet_defaults, restore_loggers
+logger = log.get_logger()
 
 BG_GEN = "#E6FFEE"  # "#C6DFCE"
 BG_KICAD = "#FFE6B3"  # "#DFC693"
@@ -424,8 +407,9 @@ def create_kicost_sheet(workbook, groups, image_data, fmt_title, fmt_info, fmt_s
             for c in g.components:
                 logger.debug(pprint.pformat(c.__dict__))
     # Force KiCost to use our logger
-    set_distributors_logger(logger)
-    set_edas_logger(logger)
+    restore_loggers()
+    # Start from the KiCost defaults, other outputs could have changed them
+    restore_spreadsheet_defaults()
     # Start with a clean list of available distributors
     init_distributor_dict()
     # Create the projects information structure
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2022 Salvador E. Tropea
+# Copyright (c) 2022 Instituto Nacional de Tecnología Industrial
+# License: GPL-3.0
+# Project: KiBot (formerly KiPlot)
+"""
+Persistent cache for results that are expensive to compute.
+The data is stored in the `cache_dir` global option, by default `$XDG_CACHE_HOME/kibot` (`~/.cache/kibot`).
+Each entry is a file named using a hash of everything used to compute it.
+"""
+import os
+from contextlib import contextmanager
+from hashlib import sha1
+from shutil import copy2
+from tempfile import NamedTemporaryFile
+from .gs import GS
+from . import log
+
+logger = log.get_logger()
+
+
+def get_cache_dir(kind):
+    """ Directory used for the `kind` entries, None if the cache is disabled """
+    if not GS.global_use_cache:
+        return None
+    base = GS.global_cache_dir
+    if not base:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+        base = os.path.join(base, 'kibot')
+    return os.path.join(base, kind)
+
+
+def cli_use_cache():
+    """ The `use_cache` global from the command line, None if not specified """
+    val = GS.global_from_cli.get('use_cache')
+    if val is None:
+        return None
+    return val.lower() not in ('false', 'no', 'off', '0')
+
+
+@contextmanager
+def early_cache(use_cache, cache_dir):
+    """ Enables the cache using the indicated options. Used before the globals are configured """
+    old_use_cache = GS.global_use_cache
+    old_cache_dir = GS.global_cache_dir
+    GS.global_use_cache = use_cache
+    GS.global_cache_dir = cache_dir
+    try:
+        yield
+    finally:
+        GS.global_use_cache = old_use_cache
+        GS.global_cache_dir = old_cache_dir
+
+
+def hash_data(files, extra=()):
+    """ Computes a key using the content of the files and a list of extra values """
+    h = sha1()
+    h.update(GS.kibot_version.encode())
+    for e in extra:
+        h.update(b'\0'+str(e).encode())
+    for f in files:
+        h.update(b'\0'+os.path.basename(f).encode()+b'\0')
+        if os.path.isfile(f):
+            with open(f, 'rb') as fh:
+                for chunk in iter(lambda: fh.read(1 << 20), b''):
+                    h.update(chunk)
+    return h.hexdigest()
+
+
+def get_file(kind, key, dest):
+    """ Copies the cached file to `dest`. Returns False if not in the cache """
+    dir = get_cache_dir(kind)
+    if dir is None:
+        return False
+    src = os.path.join(dir, key)
+    if not os.path.isfile(src):
+        return False
+    try:
+        copy2(src, dest)
+    except OSError as e:
+        logger.debug('Failed to copy cached `{}` to `{}` ({})'.format(src, dest, e))
+        return False
+    logger.debug('Using cached `{}` for `{}`'.format(src, dest))
+    return True
+
+
+def store_file(kind, key, src):
+    """ Stores a copy of `src` in the cache """
+    dir = get_cache_dir(kind)
+    if dir is None or not os.path.isfile(src):
+        return
+    try:
+        os.makedirs(dir, exist_ok=True)
+        # Copy and then rename, so other KiBot instances never see a partial file
+        with NamedTemporaryFile(dir=dir, delete=False) as f:
+            tmp = f.name
+        copy2(src, tmp)
+        os.replace(tmp, os.path.join(dir, key))
+    except OSError as e:
+        logger.debug('Failed to cache `{}` ({})'.format(src, e))
+
+
+def get_data(kind, key):
+    """ Returns the cached data (bytes), None if not in the cache """
+    dir = get_cache_dir(kind)
+    if dir is None:
+        return None
+    src = os.path.join(dir, key)
+    try:
+        with open(src, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return None
+    logger.debug('Using cached `{}`'.format(src))
+    return data
+
+
+def store_data(kind, key, data):
+    """ Stores the data (bytes) in the cache """
+    dir = get_cache_dir(kind)
+    if dir is None:
+        return
+    try:
+        os.makedirs(dir, exist_ok=True)
+        # Write and then rename, so other KiBot instances never see a partial file
+        with NamedTemporaryFile(dir=dir, delete=False) as f:
+            f.write(data)
+            tmp = f.name
+        os.replace(tmp, os.path.join(dir, key))
+    except OSError as e:
+        logger.debug('Failed to cache `{}` ({})'.format(key, e))
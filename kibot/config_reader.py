@@ -10,8 +10,11 @@ Class to read KiBot config files
 """
 
 import os
+import json
 from sys import (exit, maxsize)
 from collections import OrderedDict
+from hashlib import sha1
+from io import StringIO, BytesIO
 
 from .error import (KiPlotConfigurationError, config_error)
 from .kiplot import (load_board)
@@ -20,6 +23,7 @@ from .misc import (NO_YAML_MODULE, EXIT_BAD_ARGS, EXAMPLE_CFG, WONT_OVERWRITE, W
 from .gs import GS
 from .registrable import RegOutput, RegVariant, RegFilter
 from .pre_base import BasePreFlight
+from .cache import early_cache, cli_use_cache, hash_data, get_data, store_data
 
 # Logger
 from . import log
@@ -32,6 +36,8 @@ except ImportError:
     log.init()
     logger.error('No yaml module for Python, install python3-yaml')
     exit(NO_YAML_MODULE)
+# Use the C implementation (libyaml) if available, is much faster
+YAMLLoader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
 
 
 class CfgYamlReader(object):
@@ -39,6 +45,8 @@ class CfgYamlReader(object):
         super().__init__()
         self.imported_globals = {}
         self.no_run_by_default = []
+        # Parsed YAML files, stored in the cache once we know the global options
+        self.to_cache = []
 
     def _check_version(self, v):
         if not isinstance(v, dict):
@@ -351,7 +359,8 @@ class CfgYamlReader(object):
             if not os.path.isfile(fn):
                 config_error("missing import file `{}`".format(fn))
             fn_rel = os.path.relpath(fn)
-            data = self.load_yaml(open(fn))
+            with open(fn) as f:
+                data = self.load_yaml(f)
             # Outputs
             self._parse_import_outputs(outs, explicit_outs, fn_rel, data)
             # Filters
@@ -362,10 +371,35 @@ class CfgYamlReader(object):
             self._parse_import_globals(globals, explicit_globals, fn_rel, data)
 
     def load_yaml(self, fstream):
+        """ Parses the YAML file. The result is cached, indexed by the file content.
+            The cache is read before the globals are configured, so only the command line can disable it. """
+        content = fstream.read()
+        key = hash_data([], ['config', 'json', yaml.__version__,
+                             sha1(content.encode() if isinstance(content, str) else content).hexdigest()])
+        with early_cache(cli_use_cache() is not False, GS.global_from_cli.get('cache_dir', None)):
+            data = get_data('config', key)
+        if data is not None:
+            try:
+                return json.loads(data.decode())
+            except ValueError:
+                logger.debug('Discarding corrupted cache entry for `{}`'.format(getattr(fstream, 'name', '<file>')))
+        # Use a named stream, so the errors report the file name
+        stream = StringIO(content) if isinstance(content, str) else BytesIO(content)
+        stream.name = getattr(fstream, 'name', '<file>')
+        loader = YAMLLoader(stream)
         try:
-            data = yaml.safe_load(fstream)
+            data = loader.get_single_data()
         except yaml.YAMLError as e:
             config_error("Error loading YAML "+str(e))
+        finally:
+            loader.dispose()
+        # We use JSON, loading it can't run code. Only cache data that survives the round trip (i.e. no dates)
+        try:
+            text = json.dumps(data)
+        except (TypeError, ValueError):
+            text = None
+        if text is not None and json.loads(text) == data:
+            self.to_cache.append((key, text.encode()))
         return data
 
     def read(self, fstream):
@@ -388,6 +422,8 @@ class CfgYamlReader(object):
         GS.global_solder_mask_color = GS.global_from_cli.get('solder_mask_color', None)
         GS.global_silk_screen_color = GS.global_from_cli.get('silk_screen_color', None)
         GS.global_pcb_finish = GS.global_from_cli.get('pcb_finish', None)
+        GS.global_cache_dir = GS.global_from_cli.get('cache_dir', None)
+        GS.global_use_cache = cli_use_cache()
         # List of outputs
         version = None
         globals_found = False
@@ -419,6 +455,9 @@ class CfgYamlReader(object):
         # If no globals defined initialize them with default values
         if not globals_found:
             self._parse_global({})
+        # Now we know if we can use the cache
+        for key, data in self.to_cache:
+            store_data('config', key, data)
         # Solve the global variant
         if GS.global_variant:
             try:
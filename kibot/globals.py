@@ -9,7 +9,8 @@ from .macros import macros, document  # noqa: F401
 from .pre_filters import FiltersOptions
 from .log import get_logger, set_filters
 from .misc import W_MUSTBEINT
-from .kicad.sexpdata import load, SExpData, sexp_iter, Symbol
+from .cache import early_cache, hash_data, get_data, store_data
+from .kicad.sexpdata import loads, dumps, SExpData, sexp_iter, Symbol, find_section
 from .kicad.v6_sch import PCBLayer
 
 
@@ -30,6 +31,12 @@ class Globals(FiltersOptions):
             """ Time to wait for KiCad in KiAuto operations """
             self.kiauto_time_out_scale = 0.0
             """ Time-out multiplier for KiAuto operations """
+            self.use_cache = True
+            """ Reuse results computed in previous runs, i.e. skip the ERC/DRC when the design passed it before.
+                The parsed configuration files are also cached, but they are read before this option is known.
+                Use `-g use_cache=false` to disable it for them """
+            self.cache_dir = ''
+            """ Directory used to store the cached results. The default is `~/.cache/kibot` """
             self.date_time_format = '%Y-%m-%d_%H-%M-%S'
             """ Format used for the PCB and schematic date when using the file timestamp. Uses the `strftime` format """
             self.date_format = '%Y-%m-%d'
@@ -133,23 +140,54 @@ class Globals(FiltersOptions):
                 thicknesses.add(ly.thickness)
                 self.copper_thickness += ' / '+str(int(ly.thickness))
 
-    def get_stack_up(self):
-        logger.debug("Looking for stack-up information in the PCB")
-        pcb = None
-        with open(GS.pcb_file, 'rt') as fh:
+    def early_cache_options(self):
+        """ The cache options, before the globals are configured.
+            The command line has priority. The values from the config aren't validated yet, so we check their type.
+            Wrong values will be reported by `config`, here we just disable the cache. """
+        use_cache = GS.global_use_cache
+        if use_cache is None:
+            use_cache = self._tree.get('use_cache', True)
+            if not isinstance(use_cache, bool):
+                use_cache = False
+        cache_dir = GS.global_cache_dir
+        if cache_dir is None:
+            cache_dir = self._tree.get('cache_dir')
+            if cache_dir is not None and not isinstance(cache_dir, str):
+                use_cache = False
+                cache_dir = None
+        return use_cache, cache_dir
+
+    def read_stack_up(self):
+        """ Returns the text for the stack-up section of the PCB, an empty string if none.
+            Only the `setup` section is parsed and the result is cached, indexed by the PCB name, time stamp and size. """
+        st = os.stat(GS.pcb_file)
+        key = hash_data([], ['stackup', os.path.abspath(GS.pcb_file), st.st_mtime_ns, st.st_size])
+        # Called before the globals are configured
+        with early_cache(*self.early_cache_options()):
+            data = get_data('stackup', key)
+            if data is not None:
+                return data.decode()
+            with open(GS.pcb_file, 'rt') as fh:
+                text = fh.read()
+            setup = find_section(text, 'setup')
             try:
-                pcb = load(fh)
+                pcb = loads(setup) if setup is not None else loads(text)
             except SExpData as e:
                 # Don't make it an error, will be detected and reported latter
                 logger.debug("- Failed to load the PCB "+str(e))
-        if pcb is None:
-            return
-        iter = sexp_iter(pcb, 'kicad_pcb/setup/stackup')
-        if iter is None:
-            return
-        sp = next(iter, None)
-        if sp is None:
+                return None
+            iter = sexp_iter(pcb, 'setup/stackup' if setup is not None else 'kicad_pcb/setup/stackup')
+            sp = next(iter, None) if iter is not None else None
+            data = dumps(sp) if sp is not None else ''
+            store_data('stackup', key, data.encode())
+            return data
+
+    def get_stack_up(self):
+        logger.debug("Looking for stack-up information in the PCB")
+        data = self.read_stack_up()
+        if not data:
             return
+        sp = loads(data)[0]
         logger.debug("- Found stack-up information")
         stackup = []
         materials = set()
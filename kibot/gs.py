@@ -80,6 +80,8 @@ class GS(object):
     solved_global_variant = None
     global_kiauto_wait_start = None
     global_kiauto_time_out_scale = None
+    global_use_cache = None
+    global_cache_dir = None
     global_opts_class = None
     global_3D_model_field = '_3D_model'
     global_date_time_format = None
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2022 Salvador E. Tropea
+# Copyright (c) 2022 Instituto Nacional de Tecnología Industrial
+# License: GPL-3.0
+# Project: KiBot (formerly KiPlot)
+"""
+In-place patching of KiCad S-Expression files.
+The file is scanned looking for the sections of interest, only these sections are parsed.
+The modified sections are serialized and spliced, the rest of the file is copied verbatim.
+"""
+import re
+from .sexpdata import loads, dumps, iter_sections, SECTION_HEAD, Symbol
+
+SECTION_NAME = re.compile(r'\([^\s()"]+\s+("(?:[^"\\]|\\.)*"|[^\s()"]+)')
+
+
+class SExpPatcher(object):
+    """ A KiCad file and the sections we replaced """
+    def __init__(self, fname):
+        super().__init__()
+        self.fname = fname
+        # newline='' keeps the original line endings
+        with open(fname, 'rt', encoding='utf-8', newline='') as f:
+            self.text = f.read()
+        # (start, end, new_text) sorted by start
+        self.patches = []
+
+    def head(self):
+        """ Name of the top level element """
+        m = SECTION_HEAD.match(self.text, len(self.text)-len(self.text.lstrip()))
+        return m.group(1) if m else None
+
+    def sections(self, names, start=0, end=None):
+        """ Start and end of the `names` sections that are children of the element starting at `start` """
+        return ((begin, finish) for _, begin, finish in iter_sections(self.text, names, pos=start, endpos=end))
+
+    def section_name(self, start):
+        """ The first argument of the section starting at `start`, i.e. the footprint name.
+            None if the section doesn't have a name """
+        m = SECTION_NAME.match(self.text, start)
+        if m is None:
+            return None
+        name = loads(m.group(1))[0]
+        return name.value() if isinstance(name, Symbol) else name
+
+    def parse(self, start, end):
+        """ Parses the section """
+        return loads(self.text[start:end])[0]
+
+    def replace(self, start, end, sexp):
+        """ Replaces the section by the `sexp` tree. Must be called in file order. """
+        # Indent it like the original section
+        line_start = self.text.rfind('\n', 0, start)+1
+        indent = self.text[line_start:start]
+        new_text = dumps(sexp)
+        if indent and not indent.strip():
+            new_text = new_text.replace('\n', '\n'+indent)
+        self.patches.append((start, end, new_text))
+
+    @property
+    def patched(self):
+        return len(self.patches) > 0
+
+    def write(self, fname=None):
+        """ Writes the patched file, by default to the original name """
+        pos = 0
+        with open(fname or self.fname, 'wt', encoding='utf-8', newline='') as f:
+            for start, end, new_text in self.patches:
+                f.write(self.text[pos:start])
+                f.write(new_text)
+                pos = end
+            f.write(self.text[pos:])
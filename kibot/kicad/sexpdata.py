@@ -331,6 +331,65 @@ def dumps(obj, **kwds):
     return tosexp(obj, **kwds)
 
 
+class SExpWriter(object):
+    """
+    Incremental writer for a top level S-expression list.
+
+    Each element is converted and written to `filelike` as soon as it is
+    added, so the whole list never needs to be in memory. The result is
+    the same you get using :func:`dumps` on the complete list.
+
+    >>> import io
+    >>> fp = io.StringIO()
+    >>> w = SExpWriter(fp)
+    >>> w.append(Symbol('a'))
+    >>> w.extend([[Symbol('b'), 1], Sep()])
+    >>> w.close()
+    >>> print(fp.getvalue())
+    (a (b 1)
+    )
+
+    """
+
+    def __init__(self, filelike, **kwds):
+        self._f = filelike
+        self._kwds = kwds
+        self._first = True
+        # Trailing spaces not yet written, they could be removed
+        self._pending = ''
+        self._last = '('
+        filelike.write('(')
+
+    def append(self, obj):
+        v = tosexp(obj, indent=1, **self._kwds)
+        if self._first:
+            self._first = False
+        else:
+            # Separate by spaces
+            self._pending += ' '
+        if v[0] == '\n':
+            # Avoid spaces at the end of lines
+            self._pending = ''
+        stripped = v.rstrip(' ')
+        if stripped:
+            self._f.write(self._pending + stripped)
+            self._last = stripped[-1]
+            self._pending = v[len(stripped):]
+        else:
+            self._pending += v
+
+    def extend(self, objs):
+        for obj in objs:
+            self.append(obj)
+
+    def close(self):
+        pending = self._pending
+        # Same as tosexp: avoid indenting the closing bracket
+        if len(pending) >= 2 or (pending and self._last == '\n'):
+            pending = pending[:-1]
+        self._f.write(pending + ')')
+
+
 def car(obj):
     """
     Alias of ``obj[0]``.
@@ -727,3 +786,36 @@ def sexp_iter(vect, path):
         vect = next(iter, None)
         if vect is None:
             return None
+
+
+SECTION_TOKENS = re.compile(r'"(?:[^"\\]|\\.)*"|[()]')
+SECTION_HEAD = re.compile(r'\(([^\s()"]+)')
+
+
+def iter_sections(text, names, depth=2, pos=0, endpos=None):
+    """ Iterates over the sections named `names` found at `depth` (1 is the top level element).
+        Yields the name and the start/end of the section text.
+        Only the parenthesis and strings are scanned, nothing is parsed. """
+    level = 0
+    begin = name = None
+    for m in SECTION_TOKENS.finditer(text, pos, len(text) if endpos is None else endpos):
+        if m.group(0) == '(':
+            level += 1
+            if level == depth:
+                head = SECTION_HEAD.match(text, m.start())
+                if head and head.group(1) in names:
+                    begin = m.start()
+                    name = head.group(1)
+        elif m.group(0) == ')':
+            if level == depth and begin is not None:
+                yield name, begin, m.end()
+                begin = None
+            level -= 1
+
+
+def find_section(text, name):
+    """ Returns the text for the `(name ...)` section that is a child of the top level element.
+        None if not found. """
+    for _, begin, end in iter_sections(text, (name,)):
+        return text[begin:end]
+    return None
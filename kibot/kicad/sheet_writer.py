@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2022 Salvador E. Tropea
+# Copyright (c) 2022 Instituto Nacional de Tecnología Industrial
+# License: GPL-3.0
+# Project: KiBot (formerly KiPlot)
+"""
+Parallel writer for the schematic sheets.
+Once the variant is applied each sheet can be serialized on its own, so big hierarchies are saved using a pool
+of worker processes.
+The workers are forked, they already have the loaded schematic and we just send them an index.
+"""
+import os
+from multiprocessing import get_context, get_all_start_methods
+from ..log import MyLogger
+from .. import log
+
+logger = log.get_logger()
+# Don't start processes for small hierarchies
+MIN_SHEETS = 4
+# The sheets we are saving, inherited by the workers
+_sheets = []
+
+
+def _save_sheet(index):
+    """ Worker: saves one sheet and returns the warnings found, the error (if any) and the text generated for an
+        unchanged sheet (KiCad 6). This text is cached by the sheet, but the worker is another process. """
+    MyLogger.start_worker_task()
+    sheet, fname, dest_dir = _sheets[index]
+    cached = getattr(sheet, 'unchanged_text', None)
+    try:
+        sheet.save_sheet(fname, dest_dir)
+    except BaseException as e:
+        # I.e. SystemExit, if it kills the worker the pool waits forever
+        return MyLogger.get_warn_state(), e, None
+    text = getattr(sheet, 'unchanged_text', None)
+    return MyLogger.get_warn_state(), None, text if cached is None else None
+
+
+def save_sheets(sheets):
+    """ Saves a list of (sheet, file name, destination dir) """
+    global _sheets
+    # The same file can be used by more than one sheet (KiCad 5), the last one wins
+    jobs = {}
+    for sheet, fname, dest_dir in sheets:
+        jobs[os.path.join(dest_dir, fname)] = (sheet, fname, dest_dir)
+    jobs = list(jobs.values())
+    workers = min(len(jobs), os.cpu_count() or 1)
+    if len(jobs) < MIN_SHEETS or workers < 2 or 'fork' not in get_all_start_methods():
+        for sheet, fname, dest_dir in jobs:
+            sheet.save_sheet(fname, dest_dir)
+        return
+    logger.debug('Saving {} sheets using {} processes'.format(len(jobs), workers))
+    _sheets = jobs
+    error = None
+    try:
+        with get_context('fork').Pool(workers) as pool:
+            for (sheet, _, _), (state, e, text) in zip(jobs, pool.map(_save_sheet, range(len(jobs)))):
+                MyLogger.merge_warn_state(state)
+                if error is None:
+                    error = e
+                if text is not None:
+                    # Keep it for the next variant
+                    sheet.unchanged_text = text
+    finally:
+        _sheets = []
+    if error is not None:
+        raise error
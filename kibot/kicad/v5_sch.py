@@ -11,12 +11,14 @@ Currently oriented to collect the components for the BoM.
 # Encapsulate file/line
 import re
 import os
+from io import StringIO
 from xml.etree.ElementTree import Element, SubElement, tostring
 from xml.dom import minidom
 from datetime import datetime
 from copy import deepcopy
 from collections import OrderedDict
 from .config import KiConf, un_quote
+from .sheet_writer import save_sheets
 from ..gs import GS
 from ..misc import (W_BADPOLI, W_POLICOORDS, W_BADSQUARE, W_BADCIRCLE, W_BADARC, W_BADTEXT, W_BADPIN, W_BADCOMP, W_BADDRAW,
                     W_UNKDCM, W_UNKAR, W_ARNOPATH, W_ARNOREF, W_MISCFLD, W_EXTRASPC, W_NOLIB, W_INCPOS, W_NOANNO, W_MISSLIB,
@@ -1482,6 +1484,7 @@ class Schematic(object):
         super().__init__()
         self.dcms = {}
         self.lib_comps = {}
+        self.gen_lib_cache = {}
         self.annotation_error = False
         self.max_comments = 4
         self.netlist_version = 'D'
@@ -1725,8 +1728,11 @@ class Schematic(object):
 
     def gen_lib(self, name, cross=False):
         """ Dumps all the used components to one library.
-            This is like the KiCad cache. """
-        with open(name, 'wt') as f:
+            This is like the KiCad cache.
+            The library doesn't depend on the variant, so we generate it once and reuse the result. """
+        lib = self.gen_lib_cache.get(cross)
+        if lib is None:
+            f = StringIO()
             f.write('EESchema-LIBRARY Version 2.4\n')
             f.write('#encoding utf-8\n')
             for k, v in self.comps_data.items():
@@ -1735,8 +1741,26 @@ class Schematic(object):
                 else:
                     logger.warning(W_MISSCMP + 'Missing component `{}`'.format(k))
             f.write('#\n#End Library\n')
+            lib = self.gen_lib_cache[cross] = f.getvalue()
+        with open(name, 'wt') as f:
+            f.write(lib)
 
     def save(self, fname, dest_dir):
+        """ Saves this sheet and its sub-sheets """
+        sheets = []
+        self.collect_sheets(fname, dest_dir, sheets)
+        save_sheets(sheets)
+
+    def collect_sheets(self, fname, dest_dir, sheets):
+        """ Adds this sheet, and its sub-sheets, to the list of sheets to save """
+        sheets.append((self, fname, dest_dir))
+        for c, sch in enumerate(self.sheets):
+            # Fake file name
+            file = sch.file.replace('/', '_')
+            self.sub_sheets[c].collect_sheets(file, dest_dir, sheets)
+
+    def save_sheet(self, fname, dest_dir):
+        """ Saves this sheet, not the sub-sheets """
         fname = os.path.join(dest_dir, fname)
         with open(fname, 'wt') as f:
             f.write('EESchema Schematic File Version {}\n'.format(self.version))
@@ -1751,11 +1775,6 @@ class Schematic(object):
             for e in self.all:
                 e.write(f)
             f.write('$EndSCHEMATC\n')
-        # Save sub-sheets
-        for c, sch in enumerate(self.sheets):
-            # Fake file name
-            file = sch.file.replace('/', '_')
-            self.sub_sheets[c].save(file, dest_dir)
 
     def save_variant(self, dest_dir):
         # Currently imposible
@@ -12,12 +12,13 @@ Documentation: https://dev-docs.kicad.org/en/file-formats/sexpr-schematic/
 # Encapsulate file/line
 import os
 import re
+from io import StringIO
 from collections import OrderedDict
 from ..gs import GS
 from .. import log
 from ..misc import W_NOLIB, W_UNKFLD, W_MISSCMP
 from .v5_sch import SchError, SchematicComponent, Schematic
-from .sexpdata import load, SExpData, Symbol, dumps, Sep
+from .sexpdata import load, SExpData, Symbol, Sep, SExpWriter
 
 logger = log.get_logger()
 CROSSED_LIB = 'kibot_crossed'
@@ -967,6 +968,8 @@ class SchematicComponentV6(SchematicComponent):
         name = 'component'
         lib_id_found = False
         at_found = False
+        # The fields as they are in the file, used to detect changes when saving
+        comp.fields_ori = []
 
         # Variable list
         for i in c[1:]:
@@ -1009,6 +1012,7 @@ class SchematicComponentV6(SchematicComponent):
             # SYMBOL_PROPERTIES...
             elif i_type == 'property':
                 field = SchematicFieldV6.parse(i)
+                comp.fields_ori.append((field.name, field.value))
                 name_lc = field.name.lower()
                 # Add to the global collection
                 if name_lc not in parent.fields_lc:
@@ -1455,16 +1459,14 @@ def _add_items(items, sch, sep=False, cross=False, pre_sep=True):
     if len(items):
         if pre_sep:
             sch.append(Sep())
-        for i in items:
+        for n, i in enumerate(items):
+            if sep and n:
+                sch.append(Sep())
             if cross:
                 sch.append(i.write(cross=True))
             else:
                 sch.append(i.write())
             sch.append(Sep())
-            if sep:
-                sch.append(Sep())
-        if sep:
-            sch.pop()
 
 
 def _add_items_list(name, items, sch):
@@ -1487,6 +1489,8 @@ class SchematicV6(Schematic):
         self.max_comments = 9
         self.title_ori = self.date_ori = None
         self.netlist_version = 'E'
+        # Cached result for sheets not affected by the variants
+        self.unchanged_text = None
 
     def _fill_missing_title_block(self):
         # Fill in some missing info
@@ -1556,18 +1560,45 @@ class SchematicV6(Schematic):
             data += [_symbol('comment', [num+1, val]), Sep()]
         return [Sep(), Sep(), _symbol('title_block', data)]
 
-    def write_lib_symbols(self, cross=False):
+    def write_lib_symbols(self, cross=None):
+        """ Lib symbols, `cross` is the set of lib_ids that also need a crossed version """
         data = [Sep()]
         for s in self.lib_symbols:
             data.extend([s.write(), Sep()])
-            if cross:
-                data.extend([s.write(cross), Sep()])
+            if cross and s.lib_id in cross:
+                data.extend([s.write(True), Sep()])
         return [Sep(), Sep(), _symbol('lib_symbols', data), Sep()]
 
-    def save(self, fname, dest_dir):
+    def get_crossed_lib_ids(self):
+        """ The lib_ids used by crossed (not fitted) components in this sheet """
+        return {c.lib_id for c in self.symbols if c.included and not c.fitted}
+
+    def is_unchanged(self):
+        """ True if the variant didn't modify this sheet, so it will be saved as loaded (no crossed components and
+            the same fields we read from the file).
+            Sheets with sub-sheets are always changed, we use flat names for them. """
+        if self.sheets:
+            return False
+        for c in self.symbols:
+            if c.included and not c.fitted:
+                return False
+            if [(f.name, f.value) for f in c.fields if f.number >= 0] != c.fields_ori:
+                return False
+        return True
+
+    def collect_sheets(self, fname, dest_dir, sheets):
+        """ Adds this sheet, and its sub-sheets, to the list of sheets to save """
         cross = True
-        fname = os.path.join(dest_dir, fname)
-        sch = [Symbol('kicad_sch')]
+        sheets.append((self, fname, dest_dir))
+        for sch in self.sheets:
+            if sch.sch:
+                sch.sch.collect_sheets(sch.flat_file if cross else sch.file, dest_dir, sheets)
+
+    def write_sheet(self, f):
+        """ Writes this sheet to the `f` stream """
+        cross = True
+        sch = SExpWriter(f)
+        sch.append(Symbol('kicad_sch'))
         sch.append(_symbol('version', [self.version]))
         sch.append(_symbol('generator', [Symbol(self.generator)]))
         sch.append(Sep())
@@ -1576,7 +1607,7 @@ class SchematicV6(Schematic):
         sch.extend(self.write_paper())
         if self.title_ori is not None:
             sch.extend(self.write_title_block())
-        sch.extend(self.write_lib_symbols(cross))
+        sch.extend(self.write_lib_symbols(self.get_crossed_lib_ids()))
         # Bus aliases
         _add_items(self.bus_alias, sch)
         # Connections (aka Junctions)
@@ -1612,12 +1643,23 @@ class SchematicV6(Schematic):
         _add_items_list('sheet_instances', self.sheet_instances, sch)
         # Symbol instances
         _add_items_list('symbol_instances', self.symbol_instances, sch)
+        sch.close()
+        f.write('\n')
+
+    def save_sheet(self, fname, dest_dir):
+        """ Saves this sheet, not the sub-sheets """
+        fname = os.path.join(dest_dir, fname)
+        if self.is_unchanged():
+            # The result is the same for all the variants, generate it once
+            if self.unchanged_text is None:
+                f = StringIO()
+                self.write_sheet(f)
+                self.unchanged_text = f.getvalue()
+            with open(fname, 'wt') as f:
+                f.write(self.unchanged_text)
+            return
         with open(fname, 'wt') as f:
-            f.write(dumps(sch))
-            f.write('\n')
-        for sch in self.sheets:
-            if sch.sch:
-                sch.sch.save(sch.flat_file if cross else sch.file, dest_dir)
+            self.write_sheet(f)
 
     def save_variant(self, dest_dir):
         fname = os.path.basename(self.fname)
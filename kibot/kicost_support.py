@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2022 Salvador E. Tropea
+# Copyright (c) 2022 Instituto Nacional de Tecnología Industrial
+# License: GPL-3.0
+# Project: KiBot (formerly KiPlot)
+"""
+KiCost support.
+KiCost and its distributor modules are imported only once, here, and shared by the `kicost` output and the
+KiCost sheet of the XLSX BoMs.
+The `kicost` output runs KiCost's command line interface in-process, no need to start a new Python interpreter
+for each spreadsheet.
+Both users change the `Spreadsheet` class defaults, so we restore them before using it.
+"""
+import io
+import os.path as op
+import sys
+import traceback
+from copy import deepcopy
+from contextlib import redirect_stdout, redirect_stderr
+from . import log
+
+logger = log.get_logger()
+try:
+    # Give priority to submodules
+    rel_path = '../submodules/KiCost/'
+    if op.isfile(op.join(op.dirname(__file__), rel_path+'kicost/__init__.py')):
+        rel_path = op.abspath(op.join(op.dirname(__file__), rel_path))
+        if rel_path not in sys.path:
+            sys.path.insert(0, rel_path)
+    # Init the logger first
+    from kicost.global_vars import set_logger
+    set_logger(logger)
+    from kicost.spreadsheet import Spreadsheet
+    from kicost.distributors import set_distributors_logger, set_distributors_progress
+    from kicost.edas import set_edas_logger
+    # Progress mechanism: use the one declared in __main__ (TQDM)
+    from kicost.__main__ import ProgressConsole, main as kicost_main
+    set_distributors_progress(ProgressConsole)
+    KICOST_SUPPORT = True
+    # The class attributes used as configuration
+    SPREADSHEET_DEFAULTS = {k: deepcopy(v) for k, v in vars(Spreadsheet).items() if k.isupper()}
+except ModuleNotFoundError:
+    KICOST_SUPPORT = False
+
+
+def restore_spreadsheet_defaults():
+    """ Undo the changes to the `Spreadsheet` class attributes """
+    for k, v in SPREADSHEET_DEFAULTS.items():
+        setattr(Spreadsheet, k, deepcopy(v))
+
+
+def restore_loggers():
+    """ Force KiCost to use our logger """
+    set_logger(logger)
+    set_distributors_logger(logger)
+    set_edas_logger(logger)
+
+
+def run_kicost(args):
+    """ Runs KiCost's command line interface using the loaded modules.
+        Returns the exit code and the text printed by KiCost. """
+    restore_spreadsheet_defaults()
+    old_argv = sys.argv
+    sys.argv = ['kicost']+args
+    out = io.StringIO()
+    ret = 0
+    try:
+        with redirect_stdout(out), redirect_stderr(out):
+            kicost_main()
+    except SystemExit as e:
+        ret = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    except Exception:
+        out.write(traceback.format_exc())
+        ret = 1
+    finally:
+        sys.argv = old_argv
+        restore_loggers()
+        restore_spreadsheet_defaults()
+    return ret, out.getvalue()
@@ -19,6 +19,7 @@ from glob import glob
 from distutils.version import StrictVersion
 from importlib.util import (spec_from_file_location, module_from_spec)
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 from .gs import GS
 from .registrable import RegOutput
@@ -31,11 +32,18 @@ from .pre_base import BasePreFlight
 from .kicad.v5_sch import Schematic, SchFileError, SchError
 from .kicad.v6_sch import SchematicV6
 from .kicad.config import KiConfError
+from .sch_snapshot import SchSnapshots
+from .pcb_snapshot import PcbSnapshots
+from .netlist_snapshot import NetlistSnapshots
+from .board_data import BoardData
+from .cache import get_cache_dir, hash_data, get_data, store_data
 from . import log
 
 logger = log.get_logger()
 # Cache to avoid running external many times to check their versions
 script_versions = {}
+# Plugins found during this run, indexed by command and names
+plugin_locations = {}
 actions_loaded = False
 
 
@@ -88,26 +96,62 @@ def load_actions():
         activate.deactivate()
 
 
-def check_version(command, version):
-    global script_versions
-    if command in script_versions:
-        return
+def probe_version(command):
+    """ Runs `command --version`. Returns the version (None if unknown) and the text printed """
     cmd = [command, '--version']
     logger.debug('Running: '+str(cmd))
     result = run(cmd, stdout=PIPE, stderr=PIPE, universal_newlines=True)
     z = re.match(command + r' (\d+\.\d+\.\d+)', result.stdout, re.IGNORECASE)
     if not z:
         z = re.search(r'Version: (\d+\.\d+\.\d+)', result.stdout, re.IGNORECASE)
-    if not z:
+    return z.group(1) if z else None, result.stdout
+
+
+def get_version(command):
+    """ Returns the version of the command and the text printed to get it.
+        The versions are stored in the cache, indexed by the tool path, time stamp and size. """
+    res = script_versions.get(command)
+    if res is not None:
+        return res
+    key = None
+    fname = which(command)
+    if fname is not None and get_cache_dir('tools') is not None:
+        fname = os.path.realpath(fname)
+        st = os.stat(fname)
+        key = hash_data([], ['tool_version', fname, st.st_mtime_ns, st.st_size])
+        data = get_data('tools', key)
+        if data is not None:
+            res = script_versions[command] = (data.decode(), '')
+            return res
+    res = probe_version(command)
+    if res[0] is not None:
+        script_versions[command] = res
+        if key is not None:
+            store_data('tools', key, res[0].encode())
+    return res
+
+
+def prewarm_versions(commands):
+    """ Gets the version of the commands in parallel """
+    commands = sorted(c for c in set(commands) if c not in script_versions and which(c) is not None)
+    if not commands:
+        return
+    logger.debug('Getting the versions of: '+', '.join(commands))
+    with ThreadPoolExecutor(max_workers=len(commands)) as executor:
+        for _ in executor.map(get_version, commands):
+            pass
+
+
+def check_version(command, version):
+    ver, text = get_version(command)
+    if ver is None:
         logger.error('Unable to determine ' + command + ' version:\n' +
-                     result.stdout)
+                     text)
         exit(MISSING_TOOL)
-    res = z.groups()
-    if StrictVersion(res[0]) < StrictVersion(version):
-        logger.error('Wrong version for `'+command+'` ('+res[0]+'), must be ' +
+    if StrictVersion(ver) < StrictVersion(version):
+        logger.error('Wrong version for `'+command+'` ('+ver+'), must be ' +
                      version+' or newer.')
         exit(MISSING_TOOL)
-    script_versions[command] = res[0]
 
 
 def check_script(cmd, url, version=None):
@@ -123,8 +167,7 @@ def check_eeschema_do():
     check_script(CMD_EESCHEMA_DO, URL_EESCHEMA_DO, '1.5.4')
 
 
-def search_as_plugin(cmd, names):
-    """ If a command isn't in the path look for it in the KiCad plugins """
+def find_plugin(cmd, names):
     if which(cmd) is not None:
         return cmd
     for dir in GS.kicad_plugins_dirs:
@@ -136,6 +179,16 @@ def search_as_plugin(cmd, names):
     return cmd
 
 
+def search_as_plugin(cmd, names):
+    """ If a command isn't in the path look for it in the KiCad plugins.
+        The result is computed once for each run """
+    key = (cmd, tuple(names))
+    res = plugin_locations.get(key)
+    if res is None:
+        res = plugin_locations[key] = find_plugin(cmd, names)
+    return res
+
+
 def extract_errors(text):
     in_error = in_warning = False
     msg = ''
@@ -164,7 +217,9 @@ def extract_errors(text):
         logger.warning(W_KIAUTO+msg.rstrip())
 
 
-def exec_with_retry(cmd):
+def exec_with_retry(cmd, get_stderr=False):
+    """ Runs a KiAuto command, retrying on failure.
+        Returns the exit code, and the stderr if `get_stderr` is True """
     logger.debug('Executing: '+str(cmd))
     if GS.debug_level > 2:
         logger.debug('Command line: '+' '.join(cmd))
@@ -182,6 +237,8 @@ def exec_with_retry(cmd):
             if 'Timed out' in err:
                 logger.warning(W_TIMEOUT+'Time out detected, on slow machines or complex projects try:')
                 logger.warning(W_TIMEOUT+'`kiauto_time_out_scale` and/or `kiauto_wait_start` global options')
+            if get_stderr:
+                return ret, result.stderr
             return ret
 
 
@@ -269,15 +326,15 @@ def get_board_comps_data(comps):
         return
     load_board()
     comps_hash = {c.ref: c for c in comps}
-    for m in GS.get_modules():
-        ref = m.GetReference()
+    for m in BoardData.get().footprints:
+        ref = m.ref
         if ref not in comps_hash:
             logger.warning(W_PCBNOSCH + '`{}` component in board, but not in schematic'.format(ref))
             continue
         c = comps_hash[ref]
-        c.bottom = m.IsFlipped()
-        c.footprint_rot = m.GetOrientationDegrees()
-        attrs = m.GetAttributes()
+        c.bottom = m.bottom
+        c.footprint_rot = m.rot
+        attrs = m.attrs
         if GS.ki5():
             # KiCad 5
             if attrs == UI_SMD:
@@ -333,10 +390,10 @@ def get_output_dir(o_dir, obj, dry=False):
     return outdir
 
 
-def config_output(out, dry=False):
+def config_output(out, dry=False, for_targets=False):
     # Should we load the PCB?
     if not dry:
-        if out.is_pcb():
+        if out.is_pcb() and (not for_targets or out._targets_need_pcb):
             load_board()
         if out.is_sch():
             load_sch()
@@ -346,6 +403,17 @@ def config_output(out, dry=False):
         config_error("In section '"+out.name+"' ("+out.type+"): "+str(e))
 
 
+def get_output_targets(out, out_dir):
+    """ Returns the targets of an output, configuring it if needed.
+        Only loads the PCB if the output needs it to know the targets.
+        The targets are computed only once for each output dir. """
+    targets = out._targets_memo.get(out_dir)
+    if targets is None:
+        config_output(out, for_targets=True)
+        targets = out._targets_memo[out_dir] = out.get_targets(out_dir)
+    return list(targets)
+
+
 def run_output(out):
     GS.current_output = out.name
     try:
@@ -358,8 +426,31 @@ def run_output(out):
         config_error("In section '"+out.name+"' ("+out.type+"): "+str(e))
 
 
-def generate_outputs(outputs, target, invert, skip_pre, cli_order):
+def is_selected(out, target, invert):
+    """ True if the output must be generated when not using the CLI order """
+    return (((not target or ((out.name not in target) and invert)) and out.run_by_default) or
+            ((out.name in target) and not invert))
+
+
+def prewarm_tools(target, invert, skip_pre, cli_order):
+    """ Gets the versions of the tools needed by the preflights and outputs, in parallel """
+    tools = []
+    if skip_pre != 'all':
+        skip_list = skip_pre.split(',') if skip_pre is not None else []
+        tools.extend(t for v in BasePreFlight.get_in_use_objs() if v._enabled and v._name not in skip_list
+                     for t in v._tools)
+    if target or not invert:
+        if cli_order and not invert:
+            outs = filter(None, (RegOutput.get_output(name) for name in target))
+        else:
+            outs = filter(lambda o: is_selected(o, target, invert), RegOutput.get_outputs())
+        tools.extend(t for out in outs for t in out._tools)
+    prewarm_versions(tools)
+
+
+def _generate_outputs(outputs, target, invert, skip_pre, cli_order):
     logger.debug("Starting outputs for board {}".format(GS.pcb_file))
+    prewarm_tools(target, invert, skip_pre, cli_order)
     preflight_checks(skip_pre)
     # Chek if the preflights pulled options
     for out in RegOutput.get_prioritary_outputs():
@@ -389,8 +480,7 @@ def generate_outputs(outputs, target, invert, skip_pre, cli_order):
     else:
         # Use the declaration order
         for out in RegOutput.get_outputs():
-            if (((n == 0 or ((out.name not in target) and invert)) and out.run_by_default) or
-               ((out.name in target) and not invert)):
+            if is_selected(out, target, invert):
                 config_output(out)
                 logger.info('- '+str(out))
                 run_output(out)
@@ -398,6 +488,16 @@ def generate_outputs(outputs, target, invert, skip_pre, cli_order):
                 logger.debug('Skipping `%s` output', str(out))
 
 
+def generate_outputs(outputs, target, invert, skip_pre, cli_order):
+    try:
+        _generate_outputs(outputs, target, invert, skip_pre, cli_order)
+    finally:
+        # Remove the temporal variant schematics, PCBs and netlists
+        SchSnapshots.clean_up(force=True)
+        PcbSnapshots.clean_up(force=True)
+        NetlistSnapshots.clean_up(force=True)
+
+
 def adapt_file_name(name):
     if not name.startswith('/usr'):
         name = os.path.relpath(name)
@@ -456,7 +556,7 @@ def get_out_targets(outputs, ori_names, targets, dependencies, comments):
         for out in outputs:
             name = name2make(out.name)
             ori_names[name] = out.name
-            tg = out.get_targets(out.expand_dirname(os.path.join(GS.out_dir, out.dir)))
+            tg = get_output_targets(out, out.expand_dirname(os.path.join(GS.out_dir, out.dir)))
             if not tg:
                 continue
             targets[name] = [adapt_file_name(fn) for fn in tg]
@@ -495,9 +595,9 @@ def generate_makefile(makefile, cfg_file, outputs, kibot_sys=False):
         f.write('KIBOT_CMD=$(KIBOT) $(DEBUG) -c $(CONFIG) -e $(SCH) -b $(PCB) -d $(DEST)\n')
         f.write('LOGFILE?=kibot_error.log\n')
         f.write('\n')
-        # Configure all outputs
+        # Configure all outputs, avoid loading the PCB if the output doesn't need it
         for out in outputs:
-            config_output(out)
+            config_output(out, for_targets=True)
         # Get all targets and dependencies
         targets = OrderedDict()
         dependencies = OrderedDict()
@@ -10,7 +10,10 @@ Log module
 Handles logging initialization and formating.
 """
 import sys
+import re
+import json
 import logging
+import threading
 no_colorama = False
 try:
     from colorama import init as colorama_init, Fore, Back, Style
@@ -24,6 +27,10 @@ else:
 # Default domain, base name for the tool
 domain = 'kilog'
 filters = None
+# The filters indexed by warning number
+filters_index = {}
+# The (Wnnn) or (WCnnn) at the beginning of the warnings
+WARN_CODE = re.compile(r'\(W(C?\d+)\)\s*')
 
 
 def get_logger(name=None):
@@ -46,20 +53,70 @@ def set_domain(name):
 def set_filters(f):
     """Set the list of warning filters"""
     global filters
+    global filters_index
     filters = f
+    filters_index = {}
+    for flt in f or []:
+        filters_index.setdefault(flt.number, []).append(flt.regex)
+
+
+def split_warning(msg):
+    """ Separates the warning code from the text.
+        Returns the code (i.e. W045), its number (WC codes start at 1000) and the text.
+        The code and number are None for warnings without a code. """
+    m = WARN_CODE.match(msg)
+    if m is None:
+        return None, None, msg
+    code = m.group(1)
+    number = int(code[1:])+1000 if code[0] == 'C' else int(code)
+    return 'W'+code, number, msg[m.end():]
 
 
 class MyLogger(logging.Logger):
     warn_hash = {}
     warn_tcnt = warn_cnt = n_filtered = 0
+    # The warnings can come from more than one thread
+    warn_lock = threading.Lock()
 
     @staticmethod
     def reset_warn_hash():
         """ Clean the hash, used for testing """
         MyLogger.warn_hash = {}
 
+    @staticmethod
+    def get_warn_state():
+        """ The warnings seen and the counters.
+            A worker process can send it to the parent, to be used with `merge_warn_state` """
+        with MyLogger.warn_lock:
+            return {'hash': dict(MyLogger.warn_hash), 'total': MyLogger.warn_tcnt, 'filtered': MyLogger.n_filtered}
+
+    @staticmethod
+    def start_worker_task():
+        """ Used by forked worker processes before each task.
+            The counters are cleared and the known warnings are kept, so `get_warn_state` reports only the
+            warnings from this task. """
+        # The lock could be taken by another thread of the parent when we forked
+        MyLogger.warn_lock = threading.Lock()
+        MyLogger.warn_hash = dict.fromkeys(MyLogger.warn_hash, 0)
+        MyLogger.warn_tcnt = MyLogger.warn_cnt = MyLogger.n_filtered = 0
+
+    @staticmethod
+    def merge_warn_state(state):
+        """ Adds the warnings and counters collected by a worker process """
+        with MyLogger.warn_lock:
+            for buf, cnt in state['hash'].items():
+                if not cnt:
+                    # Already reported by the parent
+                    continue
+                if buf in MyLogger.warn_hash:
+                    MyLogger.warn_hash[buf] += cnt
+                else:
+                    MyLogger.warn_hash[buf] = cnt
+                    MyLogger.warn_cnt += 1
+            MyLogger.warn_tcnt += state['total']
+            MyLogger.n_filtered += state['filtered']
+
     def warning(self, msg, *args, **kwargs):
-        MyLogger.warn_tcnt += 1
         # Get the message applying optional C style expansions
         # No longer used:
         # if isinstance(msg, str) and len(args):
@@ -68,25 +125,21 @@ class MyLogger(logging.Logger):
         #     buf = buf.getvalue()
         # else:
         buf = str(msg)
-        # Avoid repeated warnings
-        if buf in MyLogger.warn_hash:
-            MyLogger.warn_hash[buf] += 1
-            return
-        # Apply the filters
-        if filters and buf.startswith('(W'):
-            pos_end = buf.find(')')
-            if pos_end > 0:
-                num_str = buf[2:pos_end]
-                if num_str[0] == 'C':
-                    number = int(buf[3:pos_end])+1000
-                else:
-                    number = int(num_str)
-                for f in filters:
-                    if f.number == number and f.regex.search(buf):
-                        MyLogger.n_filtered += 1
-                        return
-        MyLogger.warn_cnt += 1
-        MyLogger.warn_hash[buf] = 1
+        code, number, text = split_warning(buf)
+        with MyLogger.warn_lock:
+            MyLogger.warn_tcnt += 1
+            # Avoid repeated warnings
+            if buf in MyLogger.warn_hash:
+                MyLogger.warn_hash[buf] += 1
+                return
+            # Apply the filters
+            if number is not None and any(r.search(buf) for r in filters_index.get(number, ())):
+                MyLogger.n_filtered += 1
+                return
+            MyLogger.warn_cnt += 1
+            MyLogger.warn_hash[buf] = 1
+        # Structured data for the JSON sink
+        kwargs['extra'] = dict(kwargs.get('extra') or {}, warn_code=code, warn_number=number, warn_text=text)
         if sys.version_info.major > 3 or (sys.version_info.major == 3 and sys.version_info.minor >= 8):
             super().warning(buf, stacklevel=2, **kwargs)  # pragma: no cover (Py38)
         else:
@@ -110,6 +163,29 @@ def set_verbosity(logger, verbose, quiet):
     logger.setLevel(log_level)
 
 
+class JSONLinesHandler(logging.FileHandler):
+    """ Writes the warnings and errors to a file, one JSON object per line.
+        Intended for CI tools. """
+    def __init__(self, fname):
+        super().__init__(fname, mode='wt', encoding='utf-8')
+        self.setLevel(logging.WARNING)
+
+    def format(self, record):
+        data = {'level': record.levelname, 'time': record.created, 'message': record.getMessage(),
+                'logger': record.name, 'file': record.filename, 'line': record.lineno}
+        code = getattr(record, 'warn_code', None)
+        if code is not None:
+            data['code'] = code
+            data['number'] = record.warn_number
+            data['text'] = record.warn_text
+        return json.dumps(data)
+
+
+def set_json_log(fname):
+    """ Also log the warnings and errors to `fname`, using JSON lines """
+    get_logger().addHandler(JSONLinesHandler(fname))
+
+
 class FilterOnlyInfo(object):
     def filter(self, record):
         return record.levelno == logging.INFO
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2022 Salvador E. Tropea
+# Copyright (c) 2022 Instituto Nacional de Tecnología Industrial
+# License: GPL-3.0
+# Project: KiBot (formerly KiPlot)
+"""
+XML netlists shared by the outputs.
+Outputs using external BoM tools (i.e. KiCost) need a netlist with the variant applied.
+Here we write it once for each variant/filter/excluded fields combination and share it during the run.
+"""
+import os
+from tempfile import mkdtemp
+from shutil import rmtree
+from .gs import GS
+from .snapshot_base import Snapshot, SnapshotRegistry
+from . import log
+
+logger = log.get_logger()
+
+
+def save_netlist(fname, comps, excluded=False, fitted=True, no_field=[]):
+    """ Writes a netlist in XML format using our own writer """
+    with open(fname, 'wb') as f:
+        GS.sch.save_netlist(f, comps, excluded=excluded, fitted=fitted, no_field=no_field)
+
+
+class NetlistSnapshot(Snapshot):
+    """ A netlist stored in a temporal dir """
+    def __init__(self, key, comps, no_field):
+        super().__init__(key)
+        self.dir = mkdtemp(prefix='tmp-kibot-netlist-')
+        self.file = os.path.join(self.dir, GS.sch_basename+'.xml')
+        save_netlist(self.file, comps, no_field=no_field)
+
+    def remove(self):
+        logger.debug('Removing temporal netlist dir `{}`'.format(self.dir))
+        rmtree(self.dir)
+
+
+class NetlistSnapshots(SnapshotRegistry):
+    """ The netlists created during this run.
+        Indexed by variant, DNF filter and excluded fields. """
+    _snapshots = {}
+    _what = 'netlist'
+
+    @classmethod
+    def get(cls, options, no_field=()):
+        """ Returns the name of the netlist for the variant/filter of this output options.
+            Must be called after `VariantOptions.run`, so the variant is applied to the components. """
+        key = cls.get_key(options, tuple(sorted(no_field)))
+        snap = cls.acquire(key, lambda: NetlistSnapshot(key, options._comps, no_field))
+        # The netlist is used by an external tool, the file is kept until the end of the run
+        cls.release(snap)
+        return snap.file
@@ -20,9 +20,157 @@ def filter(v):
     return inspect.isclass(v) or not (callable(v) or isinstance(v, (dict, list)))
 
 
+# Characters removed from the expanded values
+_CL_TABLE = str.maketrans('\\/?%*:|"<>', '_'*10)
+# Characters illegal in file systems
+_SAFE_TABLE = str.maketrans('\\?%*:|"<>', '/'+'_'*8)
+# The expansion patterns: %[b|s]C1-9, %[b|s]c/d/F/f/p/r and the ones not related to the PCB/SCH
+_EXPAND_RE = compile(r'%([bs]?C[1-9]|[bs]?[cdFfpr]|[gGDTivVxI])')
+# Patterns that use data from the PCB or the SCH, according to the context
+_DEP_PATTERNS = ('%c', '%d', '%F', '%f', '%p', '%r', '%C1', '%C2', '%C3', '%C4')
+# Kind of expansion
+_EXP_GS = 0
+_EXP_DEP = 1
+_EXP_OBJ = 2
+_EXP_OBJ_CODES = 'ivVxI'
+# Patterns we can expand without loading the PCB/SCH
+_NO_TB_CODES = {'F', 'f', 'bF', 'bf', 'sF', 'sf', 'g', 'G', 'D', 'T', 'i', 'v', 'V', 'x', 'I'}
+# Compiled expansion plans, indexed by the pattern
+_MAX_PLANS = 1024
+_plans = {}
+# Values for the patterns using global data, computed once for each global state
+_gs_values = {}
+_gs_values_key = None
+# Valid options for each Optionable class, computed the first time an object of the class is configured
+_schemas = {}
+
+
 def _cl(text):
     """ Eliminates dangerous characters from the text """
-    return re.sub(r'[\\\/\?%\*:|"<>]', '_', text)
+    return text.translate(_CL_TABLE)
+
+
+class _OptionSchema(object):
+    """ What we need to validate an option, parsed from its docstring """
+    __slots__ = ('dest', 'valid', 'str_values', 'num_range')
+
+    def __init__(self, doc, dest):
+        super().__init__()
+        # The attribute we set, different for aliases
+        self.dest = dest
+        self.valid = None
+        if doc[0] == '[':
+            # Separate the valid types for this key
+            valid = doc[1:].split(']')[0].split('|')
+            # Remove the XXXX=Value
+            if '=' in valid[-1]:
+                valid[-1] = valid[-1].split('=')[0]
+            self.valid = valid
+        m = Optionable._str_values_re.search(doc)
+        self.str_values = m.group(1).split(',') if m else None
+        m = Optionable._num_range_re.search(doc)
+        self.num_range = (float(m.group(1)), float(m.group(2))) if m else None
+
+
+class _ExpansionPlan(object):
+    """ A pattern split in literal text and %X patterns """
+    __slots__ = ('parts', 'codes', 'has_dep', 'dep_tb', 'pcb_tb', 'sch_tb', 'obj_codes')
+
+    def __init__(self, name):
+        super().__init__()
+        # The patterns are stored as None and solved during `render`
+        self.parts = []
+        self.codes = []
+        self.obj_codes = set()
+        pos = 0
+        for m in _EXPAND_RE.finditer(name):
+            if m.start() > pos:
+                self.parts.append(name[pos:m.start()])
+            code = m.group(1)
+            if code[0] in _EXP_OBJ_CODES:
+                kind = _EXP_OBJ
+                self.obj_codes.add(code)
+            elif code[0] in 'bs' or code in 'gGDT':
+                kind = _EXP_GS
+            else:
+                kind = _EXP_DEP
+            self.codes.append((len(self.parts), kind, code, m.group(0)))
+            self.parts.append(None)
+            pos = m.end()
+        if pos < len(name):
+            self.parts.append(name[pos:])
+        self.has_dep = any(map(lambda x: x in name, _DEP_PATTERNS))
+        # Do we need the title blocks? The file names are known without loading the PCB/SCH
+        codes = set(c[2] for c in self.codes) - _NO_TB_CODES
+        self.dep_tb = any(c[0] in 'cdprC' for c in codes)
+        self.pcb_tb = any(c[0] == 'b' for c in codes)
+        self.sch_tb = any(c[0] == 's' for c in codes)
+
+    def render(self, dep_prefix, obj_values):
+        """ Replaces the patterns in a copy of `parts`.
+            `dep_prefix` selects the PCB (b) or SCH (s) data for the context dependent patterns.
+            Not solved patterns are kept. """
+        gs_values = _get_gs_values()
+        res = self.parts[:]
+        for index, kind, code, ori in self.codes:
+            if kind == _EXP_GS:
+                res[index] = gs_values.get(code, ori)
+            elif kind == _EXP_DEP:
+                res[index] = gs_values.get(dep_prefix+code, ori) if dep_prefix else ori
+            else:
+                res[index] = obj_values.get(code, ori)
+        return ''.join(res)
+
+
+def _get_plan(name):
+    plan = _plans.get(name)
+    if plan is None:
+        if len(_plans) >= _MAX_PLANS:
+            # Names like the datasheets are used only once
+            _plans.clear()
+        plan = _plans[name] = _ExpansionPlan(name)
+    return plan
+
+
+def _get_gs_values():
+    """ Values for the %b*, %s*, %g, %G, %D and %T patterns """
+    global _gs_values
+    global _gs_values_key
+    key = (GS.pcb_file, GS.sch_file, GS.board, GS.sch, GS.pcb_title, GS.sch_title, GS.solved_global_variant,
+           GS.global_date_format, GS.global_time_format)
+    if key == _gs_values_key:
+        return _gs_values
+    values = {}
+    if GS.pcb_file:
+        values['bF'] = GS.pcb_no_ext
+        values['bf'] = GS.pcb_basename
+    if GS.board and GS.pcb_title is not None:
+        values['bc'] = _cl(GS.pcb_comp)
+        values['bd'] = _cl(GS.pcb_date)
+        values['bp'] = _cl(GS.pcb_title)
+        values['br'] = _cl(GS.pcb_rev)
+        for num, val in enumerate(GS.pcb_com):
+            if val is not None:
+                values['bC'+str(num+1)] = _cl(val)
+    if GS.sch_file:
+        values['sF'] = GS.sch_no_ext
+        values['sf'] = GS.sch_basename
+    if GS.sch and GS.sch_title is not None:
+        values['sc'] = _cl(GS.sch_comp)
+        values['sd'] = _cl(GS.sch_date)
+        values['sp'] = _cl(GS.sch_title)
+        values['sr'] = _cl(GS.sch_rev)
+        for num, val in enumerate(GS.sch_com):
+            if val is not None:
+                values['sC'+str(num+1)] = _cl(val)
+    if GS.solved_global_variant:
+        values['g'] = GS.solved_global_variant.file_id
+        values['G'] = GS.solved_global_variant.name
+    values['D'] = GS.n.strftime(GS.global_date_format)
+    values['T'] = GS.n.strftime(GS.global_time_format)
+    _gs_values = values
+    _gs_values_key = key
+    return values
 
 
 class Optionable(object):
@@ -48,25 +196,20 @@ class Optionable(object):
             setattr(self, 'variant', GS.global_variant)
 
     @staticmethod
-    def _check_str(key, val, doc):
+    def _check_str(key, val, values):
         if not isinstance(val, str):
             raise KiPlotConfigurationError("Option `{}` must be a string".format(key))
         # If the docstring specifies the allowed values in the form [v1,v2...] enforce it
-        m = Optionable._str_values_re.search(doc)
-        if m:
-            vals = m.group(1).split(',')
-            if val not in vals:
-                raise KiPlotConfigurationError("Option `{}` must be any of {} not `{}`".format(key, vals, val))
+        if values is not None and val not in values:
+            raise KiPlotConfigurationError("Option `{}` must be any of {} not `{}`".format(key, values, val))
 
     @staticmethod
-    def _check_num(key, val, doc):
+    def _check_num(key, val, range):
         if not isinstance(val, (int, float)):
             raise KiPlotConfigurationError("Option `{}` must be a number".format(key))
         # If the docstring specifies a range in the form [from-to] enforce it
-        m = Optionable._num_range_re.search(doc)
-        if m:
-            min = float(m.group(1))
-            max = float(m.group(2))
+        if range is not None:
+            min, max = range
             if val < min or val > max:
                 raise KiPlotConfigurationError("Option `{}` outside its range [{},{}]".format(key, min, max))
 
@@ -108,25 +251,35 @@ class Optionable(object):
             return 'list({})'.format(Optionable._typeof(v[0]))
         return 'None'
 
+    def _get_schema(self):
+        """ The valid options for this class, indexed by name.
+            The docstrings are parsed only for the first object of each class. """
+        cls = type(self)
+        schema = _schemas.get(cls)
+        if schema is None:
+            schema = {}
+            for k, _ in self.get_attrs_gen():
+                doc, dest, _ = self.get_doc(k)
+                if doc is not None:
+                    schema[k] = _OptionSchema(doc, dest)
+            _schemas[cls] = schema
+        return schema
+
     def _perform_config_mapping(self):
         """ Map the options to class attributes """
-        attrs = self.get_attrs_for()
+        schema = self._get_schema()
         for k, v in self._tree.items():
             # Map known attributes and avoid mapping private ones
-            if (k[0] == '_') or (k not in attrs):
+            opt = schema.get(k)
+            if opt is None:
                 if self._unkown_is_error:
                     raise KiPlotConfigurationError("Unknown {}option `{}`".format(self._error_context, k))
                 logger.warning(W_UNKOPS + "Unknown {}option `{}`".format(self._error_context, k))
                 continue
             # Check the data type
-            cur_doc, alias, is_alias = self.get_doc(k)
-            cur_val = getattr(self, alias)
-            if cur_doc[0] == '[':
-                # Separate the valid types for this key
-                valid = cur_doc[1:].split(']')[0].split('|')
-                # Remove the XXXX=Value
-                if '=' in valid[-1]:
-                    valid[-1] = valid[-1].split('=')[0]
+            cur_val = getattr(self, opt.dest)
+            valid = opt.valid
+            if valid is not None:
                 # Get the type used by the user as a string
                 v_type = Optionable._typeof(v)
                 if v_type not in valid:
@@ -138,14 +291,13 @@ class Optionable(object):
                     else:
                         raise KiPlotConfigurationError("Option `{}` must be any of {} not `{}`".format(k, valid, v_type))
             else:
-                valid = None
                 v_type = Optionable._typeof(cur_val)
             if v_type == 'boolean':
                 Optionable._check_bool(k, v)
             elif v_type == 'number':
-                Optionable._check_num(k, v, cur_doc)
+                Optionable._check_num(k, v, opt.num_range)
             elif v_type == 'string':
-                Optionable._check_str(k, v, cur_doc)
+                Optionable._check_str(k, v, opt.str_values)
             elif isinstance(cur_val, type):
                 # A class, so we need more information i.e. "[dict|string]"
                 if valid is not None:
@@ -153,9 +305,9 @@ class Optionable(object):
                     if isinstance(v, (int, float)) and not isinstance(v, bool):
                         # Note: booleans are also instance of int
                         # Not used yet
-                        Optionable._check_num(k, v, cur_doc)  # pragma: no cover (Internal)
+                        Optionable._check_num(k, v, opt.num_range)  # pragma: no cover (Internal)
                     elif isinstance(v, str):
-                        Optionable._check_str(k, v, cur_doc)
+                        Optionable._check_str(k, v, opt.str_values)
                     elif isinstance(v, dict):
                         # Dicts are solved using Optionable classes
                         new_val = v
@@ -180,7 +332,7 @@ class Optionable(object):
                                 new_val.append(element)
                         v = new_val
             # Seems to be ok, map it
-            setattr(self, alias if is_alias else k, v)
+            setattr(self, opt.dest, v)
 
     def set_tree(self, tree):
         self._tree = tree
@@ -220,43 +372,23 @@ class Optionable(object):
             return GS.solved_global_variant.name
         return ''
 
-    def expand_filename_common(self, name, parent):
-        """ Expansions common to the PCB and Schematic """
-        # PCB expansions, explicit
-        if GS.board and '%b' in name:
-            name = name.replace('%bc', _cl(GS.pcb_comp))
-            name = name.replace('%bd', _cl(GS.pcb_date))
-            name = name.replace('%bF', GS.pcb_no_ext)
-            name = name.replace('%bf', GS.pcb_basename)
-            name = name.replace('%bp', _cl(GS.pcb_title))
-            name = name.replace('%br', _cl(GS.pcb_rev))
-            for num, val in enumerate(GS.pcb_com):
-                name = name.replace('%bC'+str(num+1), _cl(val))
-        if GS.solved_global_variant:
-            name = name.replace('%g', GS.solved_global_variant.file_id)
-            name = name.replace('%G', GS.solved_global_variant.name)
-        # Schematic expansions, explicit
-        if GS.sch and '%s' in name:
-            name = name.replace('%sc', _cl(GS.sch_comp))
-            name = name.replace('%sd', _cl(GS.sch_date))
-            name = name.replace('%sF', GS.sch_no_ext)
-            name = name.replace('%sf', GS.sch_basename)
-            name = name.replace('%sp', _cl(GS.sch_title))
-            name = name.replace('%sr', _cl(GS.sch_rev))
-            for num, val in enumerate(GS.sch_com):
-                name = name.replace('%sC'+str(num+1), _cl(val))
-        name = name.replace('%D', GS.n.strftime(GS.global_date_format))
-        name = name.replace('%T', GS.n.strftime(GS.global_time_format))
-        if self:
-            name = name.replace('%i', self._expand_id)
-            name = name.replace('%v', _cl(self._find_variant()))
-            name = name.replace('%V', _cl(self._find_variant_name()))
-            name = name.replace('%x', self._expand_ext)
+    def _get_obj_values(self, parent, codes):
+        """ Values for the %i, %v, %V, %x and %I patterns """
+        values = {}
+        if 'i' in codes:
+            values['i'] = self._expand_id
+        if 'v' in codes:
+            values['v'] = _cl(self._find_variant())
+        if 'V' in codes:
+            values['V'] = _cl(self._find_variant_name())
+        if 'x' in codes:
+            values['x'] = self._expand_ext
+        if 'I' in codes:
             replace_id = ''
             if parent and hasattr(parent, 'output_id'):
                 replace_id = _cl(parent.output_id)
-            name = name.replace('%I', replace_id)
-        return name
+            values['I'] = replace_id
+        return values
 
     def expand_filename_both(self, name, is_sch=True, make_safe=True):
         """ Expands %* values in filenames.
@@ -267,45 +399,30 @@ class Optionable(object):
         if GS.debug_level > 3:
             logger.debug('Expanding `{}` in {} context for {} parent: {}'.
                          format(name, 'SCH' if is_sch else 'PCB', self, parent))
+        plan = _get_plan(name)
         # Determine if we need to expand SCH and/or PCB related data
-        has_dep_exp = any(map(lambda x: x in name, ['%c', '%d', '%F', '%f', '%p', '%r', '%C1', '%C2', '%C3', '%C4']))
-        do_sch = is_sch and has_dep_exp
-        # logger.error(name + '  is_sch ' +str(is_sch)+"   "+ str(do_sch))
-        # raise
-        do_pcb = not is_sch and has_dep_exp
+        do_sch = is_sch and plan.has_dep
+        do_pcb = not is_sch and plan.has_dep
         # Load the needed data
-        if GS.pcb_file and (do_pcb or '%b' in name):
+        if GS.pcb_file and ((do_pcb and plan.dep_tb) or plan.pcb_tb):
             if GS.board is None:
                 GS.load_board()
             GS.load_pcb_title_block()
-        if GS.sch_file and (do_sch or '%s' in name):
+        if GS.sch_file and ((do_sch and plan.dep_tb) or plan.sch_tb):
             if GS.sch is None:
                 GS.load_sch()
             GS.load_sch_title_block()
+        dep_prefix = None
+        if do_pcb and (GS.board or GS.pcb_file):
+            dep_prefix = 'b'
+        elif do_sch and (GS.sch or GS.sch_file):
+            dep_prefix = 's'
         # This member can be called with a preflight object
-        name = Optionable.expand_filename_common(self, name, parent)
-        if GS.board and do_pcb:
-            name = name.replace('%c', _cl(GS.pcb_comp))
-            name = name.replace('%d', _cl(GS.pcb_date))
-            name = name.replace('%F', GS.pcb_no_ext)
-            name = name.replace('%f', GS.pcb_basename)
-            name = name.replace('%p', _cl(GS.pcb_title))
-            name = name.replace('%r', _cl(GS.pcb_rev))
-            for num, val in enumerate(GS.pcb_com):
-                name = name.replace('%C'+str(num+1), _cl(val))
-        if GS.sch and do_sch:
-            name = name.replace('%c', _cl(GS.sch_comp))
-            name = name.replace('%d', _cl(GS.sch_date))
-            name = name.replace('%F', GS.sch_no_ext)
-            name = name.replace('%f', GS.sch_basename)
-            name = name.replace('%p', _cl(GS.sch_title))
-            name = name.replace('%r', _cl(GS.sch_rev))
-            for num, val in enumerate(GS.sch_com):
-                name = name.replace('%C'+str(num+1), _cl(val))
+        obj_values = Optionable._get_obj_values(self, parent, plan.obj_codes) if self and plan.obj_codes else {}
+        name = plan.render(dep_prefix, obj_values)
         if make_safe:
             # sanitize the name to avoid characters illegal in file systems
-            name = name.replace('\\', '/')
-            name = re.sub(r'[?%*:|"<>]', '_', name)
+            name = name.translate(_SAFE_TABLE)
         if GS.debug_level > 3:
             logger.debug('Expanded `{}`'.format(name))
         return name
@@ -55,6 +55,12 @@ class BaseOutput(RegOutput):
         self._both_related = False
         self._unkown_is_error = True
         self._done = False
+        # Set it to False if the options are enough to know the targets, so we don't need to load the PCB
+        self._targets_need_pcb = True
+        # Targets already computed, indexed by output dir
+        self._targets_memo = {}
+        # External tools used, their versions are computed in parallel before running the outputs
+        self._tools = ()
 
     @staticmethod
     def attr2longopt(attr):
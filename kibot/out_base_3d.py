@@ -12,6 +12,7 @@ from .error import KiPlotConfigurationError
 from .misc import W_MISS3D, W_FAILDL
 from .gs import (GS)
 from .out_base import VariantOptions, BaseOutput
+from .pcb_snapshot import PcbSnapshots
 from .kicad.config import KiConf
 from .macros import macros, document  # noqa: F401
 from . import log
@@ -31,6 +32,8 @@ class Base3DOptions(VariantOptions):
             """ Base URL for the KiCad 3D models """
         # Temporal dir used to store the downloaded files
         self._tmp_dir = None
+        # Modified PCB in use
+        self._snap = None
         super().__init__()
         self._expand_id = '3D'
 
@@ -218,7 +221,7 @@ class Base3DOptions(VariantOptions):
                                 # Push it back to the module
                                 models.push_back(m3d)
 
-    def filter_components(self, dir):
+    def _filter_components(self, dir):
         self.undo_3d_models_rep = {}
         if not self._comps:
             # No variant/filter to apply
@@ -269,6 +272,34 @@ class Base3DOptions(VariantOptions):
         self.apply_variant_aspect(enable=True)
         return fname
 
+    def create_board(self, dir):
+        """ Creates the modified PCB, returns its name and the temporal files to remove """
+        self._tmp_dir = None
+        fname = self._filter_components(dir)
+        temporals = []
+        if fname != GS.pcb_file:
+            # KiCad likes to create project files ...
+            temporals.append(fname.replace('.kicad_pcb', '.*'))
+        if self._tmp_dir:
+            # The downloaded 3D models are used by the PCB
+            temporals.append(self._tmp_dir)
+            self._tmp_dir = None
+        return fname, temporals
+
+    def filter_components(self, dir):
+        """ Returns the name of a PCB with the variant applied and the missing 3D models downloaded.
+            The PCB is shared with other 3D outputs using the same options.
+            Call `remove_temporals` when you finished using it. """
+        key = PcbSnapshots.get_key(self, '3D', dir, self.download, self.kicad_3d_url, GS.global_3D_model_field)
+        self._snap = PcbSnapshots.acquire(key, lambda: self.create_board(dir))
+        return self._snap.file
+
+    def remove_temporals(self):
+        """ Release the modified PCB, will be removed at the end of the run """
+        if self._snap:
+            PcbSnapshots.release(self._snap)
+            self._snap = None
+
     def get_targets(self, out_dir):
         return [self._parent.expand_filename(out_dir, self.output)]
 
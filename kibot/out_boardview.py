@@ -9,6 +9,7 @@ import re
 from pcbnew import SHAPE_POLY_SET
 from .gs import GS
 from .optionable import BaseOptions
+from .board_data import BoardData, int_scale, reflect
 from .macros import macros, document, output_class  # noqa: F401
 from . import log
 
@@ -16,7 +17,7 @@ logger = log.get_logger()
 
 
 def skip_module(module, tp=False):
-    refdes = module.GetReference()
+    refdes = module.ref
     if refdes == "REF**":
         return True
     if tp and not refdes.startswith("TP"):
@@ -32,12 +33,20 @@ def coord(nanometers):
 
 
 def y_coord(obj, maxy, y):
-    if obj.IsFlipped():
+    if obj.bottom:
         return coord(y)
     else:
         return coord(maxy - y)
 
 
+def pads_coords(pads, maxy):
+    """ Coordinates for a list of pads, computed in bulk.
+        Same as using `coord` and `y_coord` for each pad """
+    xs = int_scale([p.x for p in pads], 5, 127000)
+    ys = int_scale(reflect([p.y for p in pads], [p.bottom for p in pads], maxy), 5, 127000)
+    return xs, ys
+
+
 def pad_sort_key(name):
     if re.match(r"^\d+$", name):
         return (0, int(name))
@@ -89,64 +98,54 @@ def convert(pcb, brd):
     brd.write("\n")
 
     # Parts
-    module_list = GS.get_modules()
-    modules = []
-    for m in module_list:
-        if not skip_module(m):
-            modules.append(m)
+    modules = [m for m in BoardData.get(pcb).footprints if not skip_module(m)]
 
     brd.write("PARTS: {count}\n".format(count=len(modules)))
     pin_at = 0
     for module in modules:
-        module_bbox = module.GetBoundingBox()
+        x1, y1, x2, y2 = module.bbox
         brd.write("{ref} {x1} {y1} {x2} {y2} {pin} {side}\n"
-                  .format(ref=module.GetReference(),
-                          x1=coord(module_bbox.GetLeft()),
-                          y1=y_coord(module, outline_maxy, module_bbox.GetTop()),
-                          x2=coord(module_bbox.GetRight()),
-                          y2=y_coord(module, outline_maxy, module_bbox.GetBottom()),
+                  .format(ref=module.ref,
+                          x1=coord(x1),
+                          y1=y_coord(module, outline_maxy, y1),
+                          x2=coord(x2),
+                          y2=y_coord(module, outline_maxy, y2),
                           pin=pin_at,
-                          side=1 + module.IsFlipped()))
-        pin_at += module.GetPadCount()
+                          side=1 + module.bottom))
+        pin_at += len(module.pads)
     brd.write("\n")
 
     # Pins
-    module_list = GS.get_modules()
     pads = []
-    for m in module_list:
-        if not skip_module(m):
-            pads_list = m.Pads()
-            for pad in sorted(pads_list, key=lambda pad: pad_sort_key(pad.GetName())):
-                pads.append(pad)
+    for m in modules:
+        pads.extend(sorted(m.pads, key=lambda pad: pad_sort_key(pad.name)))
 
     brd.write("PINS: {count}\n".format(count=len(pads)))
-    for pad in pads:
-        pad_pos = pad.GetPosition()
+    xs, ys = pads_coords(pads, outline_maxy)
+    for pad, x, y in zip(pads, xs, ys):
         brd.write("{x} {y} {net} {side}\n"
-                  .format(x=coord(pad_pos.x),
-                          y=y_coord(pad, outline_maxy, pad_pos.y),
-                          net=pad.GetNetCode(),
-                          side=1 + pad.IsFlipped()))
+                  .format(x=x,
+                          y=y,
+                          net=pad.net,
+                          side=1 + pad.bottom))
     brd.write("\n")
 
     # Nails
-    module_list = GS.get_modules()
     testpoints = []
-    for m in module_list:
+    for m in BoardData.get(pcb).footprints:
         if not skip_module(m, tp=True):
-            pads_list = m.Pads()
-            for pad in sorted(pads_list, key=lambda pad: pad_sort_key(pad.GetName())):
+            for pad in sorted(m.pads, key=lambda pad: pad_sort_key(pad.name)):
                 testpoints.append((m, pad))
 
     brd.write("NAILS: {count}\n".format(count=len(testpoints)))
-    for module, pad in testpoints:
-        pad_pos = pad.GetPosition()
+    xs, ys = pads_coords([pad for _, pad in testpoints], outline_maxy)
+    for (module, pad), x, y in zip(testpoints, xs, ys):
         brd.write("{probe} {x} {y} {net} {side}\n"
-                  .format(probe=module.GetReference()[2:],
-                          x=coord(pad_pos.x),
-                          y=y_coord(pad, outline_maxy, pad_pos.y),
-                          net=pad.GetNetCode(),
-                          side=1 + pad.IsFlipped()))
+                  .format(probe=module.ref[2:],
+                          x=x,
+                          y=y,
+                          net=pad.net,
+                          side=1 + pad.bottom))
     brd.write("\n")
 
 
@@ -159,6 +158,9 @@ class BoardViewOptions(BaseOptions):
         self._expand_id = 'boardview'
         self._expand_ext = 'brd'
 
+    def get_targets(self, out_dir):
+        return [self._parent.expand_filename(out_dir, self.output)]
+
     def run(self, output):
         with open(output, 'wt') as f:
             convert(GS.board, f)
@@ -175,3 +177,4 @@ class BoardView(BaseOutput):  # noqa: F821
         with document:
             self.options = BoardViewOptions
             """ [dict] Options for the `boardview` output """
+        self._targets_need_pcb = False
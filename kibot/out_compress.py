@@ -13,7 +13,7 @@ from zipfile import ZipFile, ZIP_STORED, ZIP_DEFLATED, ZIP_BZIP2, ZIP_LZMA
 from tarfile import open as tar_open
 from collections import OrderedDict
 from .gs import GS
-from .kiplot import config_output, get_output_dir, run_output
+from .kiplot import config_output, get_output_dir, run_output, get_output_targets
 from .misc import MISSING_TOOL, WRONG_INSTALL, W_EMPTYZIP, WRONG_ARGUMENTS, INTERNAL_ERROR
 from .optionable import Optionable, BaseOptions
 from .registrable import RegOutput
@@ -130,8 +130,7 @@ class CompressOptions(BaseOptions):
             if f.from_output:
                 out = RegOutput.get_output(f.from_output)
                 if out is not None:
-                    config_output(out)
-                    files_list = out.get_targets(get_output_dir(out.dir, out, dry=True))
+                    files_list = get_output_targets(out, get_output_dir(out.dir, out, dry=True))
                 else:
                     logger.error('Unknown output `{}` selected in {}'.format(f.from_output, self._parent))
                     exit(WRONG_ARGUMENTS)
@@ -141,6 +140,7 @@ class CompressOptions(BaseOptions):
                             # The target doesn't exist
                             if not out._done:
                                 # The output wasn't created in this run, try running it
+                                config_output(out)
                                 run_output(out)
                             if not os.path.isfile(file):
                                 # Still missing, something is wrong
@@ -197,6 +197,7 @@ class Compress(BaseOutput):  # noqa: F821
         with document:
             self.options = CompressOptions
             """ [dict] Options for the `compress` output """
+        self._targets_need_pcb = False
 
     def get_dependencies(self):
         return self.options.get_dependencies()
@@ -202,6 +202,7 @@ class IBoM(BaseOutput):  # noqa: F821
         with document:
             self.options = IBoMOptions
             """ [dict] Options for the `ibom` output """
+        self._targets_need_pcb = False
 
     def get_dependencies(self):
         return self.options.get_dependencies()
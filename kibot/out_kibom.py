@@ -421,6 +421,7 @@ class KiBoM(BaseOutput):  # noqa: F821
             self.options = KiBoMOptions
             """ [dict] Options for the `kibom` output """
         self._sch_related = True
+        self._tools = (CMD_KIBOM,)
 
     def get_dependencies(self):
         files = super().get_dependencies()
@@ -3,11 +3,8 @@
 # Copyright (c) 2021 Instituto Nacional de Tecnología Industrial
 # License: GPL-3.0
 # Project: KiBot (formerly KiPlot)
-import os
 from os.path import isfile, abspath, join, dirname
 from subprocess import check_output, STDOUT, CalledProcessError
-from tempfile import mkdtemp
-from shutil import rmtree
 from .misc import (CMD_KICOST, URL_KICOST, BOM_ERROR, DISTRIBUTORS, W_UNKDIST, ISO_CURRENCIES, W_UNKCUR, KICOST_SUBMODULE,
                    W_KICOSTFLD, W_MIXVARIANT)
 from .error import KiPlotConfigurationError
@@ -15,6 +12,8 @@ from .optionable import Optionable
 from .gs import GS
 from .kiplot import check_script
 from .out_base import VariantOptions
+from .netlist_snapshot import NetlistSnapshots
+from .kicost_support import KICOST_SUPPORT, run_kicost
 from .macros import macros, document, output_class  # noqa: F401
 from .fil_base import FieldRename
 from . import log
@@ -140,7 +139,6 @@ class KiCostOptions(VariantOptions):
 
     def run(self, name):
         super().run(name)
-        net_dir = None
         if self._comps:
             var_fields = set(['variant', 'version'])
             if self.variant and self.variant.type == 'kicost' and self.variant.variant_field not in var_fields:
@@ -149,11 +147,8 @@ class KiCostOptions(VariantOptions):
                                format(self.variant, self.variant.variant_field))
             if self.kicost_variant:
                 logger.warning(W_MIXVARIANT+'Avoid using KiCost variants and internal variants on the same output')
-            # Write a custom netlist to a temporal dir
-            net_dir = mkdtemp(prefix='tmp-kibot-kicost-')
-            netlist = os.path.join(net_dir, GS.sch_basename+'.xml')
-            with open(netlist, 'wb') as f:
-                GS.sch.save_netlist(f, self._comps, no_field=var_fields)
+            # Use a custom netlist, shared with other outputs using the same variant
+            netlist = NetlistSnapshots.get(self, var_fields)
         else:
             # Make sure the XML is there.
             # Currently we only support the XML mechanism.
@@ -162,13 +157,8 @@ class KiCostOptions(VariantOptions):
                 logger.error('Missing netlist in XML format `{}`'.format(netlist))
                 logger.error('You can generate it using the `update_xml` pre-flight')
                 exit(BOM_ERROR)
-        # Check KiCost is available
-        cmd_kicost = abspath(join(dirname(__file__), KICOST_SUBMODULE))
-        if not isfile(cmd_kicost):
-            check_script(CMD_KICOST, URL_KICOST)
-            cmd_kicost = CMD_KICOST
         # Construct the command
-        cmd = [cmd_kicost, '-w', '-o', name, '-i', netlist]
+        cmd = ['-w', '-o', name, '-i', netlist]
         # Add the rest of input files and their variants
         if self.aggregate:
             # More than one project
@@ -208,6 +198,32 @@ class KiCostOptions(VariantOptions):
             cmd.append('--translate_fields')
             cmd.extend(self.translate_fields)
         # Run the command
+        if KICOST_SUPPORT:
+            self.run_in_process(cmd)
+        else:
+            self.run_script(cmd)
+
+    @staticmethod
+    def run_in_process(args):
+        """ Use the KiCost modules we already loaded """
+        logger.debug('Running KiCost in-process: '+str(args))
+        ret, cmd_output = run_kicost(args)
+        if ret:
+            logger.error('Failed to create costs spreadsheet, error %d', ret)
+            if cmd_output:
+                logger.debug('Output from KiCost: '+cmd_output)
+            exit(BOM_ERROR)
+        logger.debug('Output from KiCost:\n'+cmd_output+'\n')
+
+    @staticmethod
+    def run_script(args):
+        """ Run the KiCost script """
+        # Check KiCost is available
+        cmd_kicost = abspath(join(dirname(__file__), KICOST_SUBMODULE))
+        if not isfile(cmd_kicost):
+            check_script(CMD_KICOST, URL_KICOST)
+            cmd_kicost = CMD_KICOST
+        cmd = [cmd_kicost]+args
         logger.debug('Running: '+str(cmd))
         try:
             cmd_output = check_output(cmd, stderr=STDOUT)
@@ -217,10 +233,6 @@ class KiCostOptions(VariantOptions):
             if e.output:
                 logger.debug('Output from command: '+e.output.decode())
             exit(BOM_ERROR)
-        finally:
-            if net_dir:
-                logger.debug('Removing temporal variant dir `{}`'.format(net_dir))
-                rmtree(net_dir)
         logger.debug('Output from command:\n'+cmd_output_dec+'\n')
 
 
@@ -4,7 +4,7 @@
 # License: GPL-3.0
 # Project: KiBot (formerly KiPlot)
 import os
-from tempfile import (NamedTemporaryFile)
+from tempfile import (NamedTemporaryFile, TemporaryFile)
 # Here we import the whole module to make monkeypatch work
 import subprocess
 import shutil
@@ -119,6 +119,39 @@ def _run_command(cmd, tmp_remap=False, tmp_style=False):
     logger.debug('Output from command:\n'+cmd_output.decode())
 
 
+def _run_pipe(cmd1, cmd2, tmp=None):
+    """ Runs `cmd1 | cmd2`, avoids an intermediate file """
+    logger.debug('Executing: {} | {}'.format(cmd1, cmd2))
+    try:
+        # The stderr of cmd1 goes to a file, a pipe could fill while we wait for cmd2
+        with TemporaryFile() as f_err:
+            p1 = subprocess.Popen(cmd1, stdout=subprocess.PIPE, stderr=f_err)
+            p2 = None
+            try:
+                p2 = subprocess.Popen(cmd2, stdin=p1.stdout, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+            finally:
+                # Allow p1 to receive a SIGPIPE if p2 exits
+                p1.stdout.close()
+                if p2 is None:
+                    # Failed to start cmd2
+                    p1.kill()
+                    p1.wait()
+            cmd_output = p2.communicate()[0]
+            ret1 = p1.wait()
+            f_err.seek(0)
+            err1 = f_err.read()
+    finally:
+        if tmp:
+            os.remove(tmp)
+    for cmd, ret, out in ((cmd1, ret1, err1), (cmd2, p2.returncode, cmd_output)):
+        if ret:
+            logger.error('Failed to run %s, error %d', cmd[0], ret)
+            if out:
+                logger.debug('Output from command: '+out.decode())
+            exit(PCBDRAW_ERR)
+    logger.debug('Output from command:\n'+cmd_output.decode())
+
+
 class PcbDrawOptions(VariantOptions):
     def __init__(self):
         with document:
@@ -304,14 +337,12 @@ class PcbDrawOptions(VariantOptions):
         # Execute and inform is successful
         _run_command(cmd, tmp_remap, tmp_style)
         if svg is not None:
-            # Manually convert the SVG to PNG
-            png = _get_tmp_name('.png')
-            _run_command([SVG2PNG, '-d', str(self.dpi), '-p', str(self.dpi), svg, '-o', png], svg)
-            cmd = [CONVERT, '-trim', png]
+            # Manually convert the SVG to PNG and then trim it, the PNG goes through a pipe
+            cmd = [CONVERT, '-trim', 'png:-']
             if self.format == 'jpg':
                 cmd += ['-quality', '85%']
             cmd.append(name)
-            _run_command(cmd, png)
+            _run_pipe([SVG2PNG, '-d', str(self.dpi), '-p', str(self.dpi), svg], cmd, svg)
 
 
 @output_class
@@ -325,6 +356,8 @@ class PcbDraw(BaseOutput):  # noqa: F821
         with document:
             self.options = PcbDrawOptions
             """ [dict] Options for the `pcbdraw` output """
+        self._targets_need_pcb = False
+        self._tools = (PCBDRAW,)
 
     def get_dependencies(self):
         files = super().get_dependencies()
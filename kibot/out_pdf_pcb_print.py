@@ -4,7 +4,7 @@
 # License: GPL-3.0
 # Project: KiBot (formerly KiPlot)
 import os
-from shutil import copy2, rmtree
+from shutil import copy2
 from tempfile import mkdtemp
 from .pre_base import BasePreFlight
 from .error import (KiPlotConfigurationError)
@@ -12,6 +12,7 @@ from .gs import (GS)
 from .kiplot import check_script, exec_with_retry, add_extra_options
 from .misc import (CMD_PCBNEW_PRINT_LAYERS, URL_PCBNEW_PRINT_LAYERS, PDF_PCB_PRINT)
 from .out_base import VariantOptions
+from .pcb_snapshot import PcbSnapshots
 from .macros import macros, document, output_class  # noqa: F401
 from .layer import Layer
 from . import log
@@ -78,8 +79,16 @@ class PDF_Pcb_PrintOptions(VariantOptions):
         return pro_copy
 
     def filter_components(self, board, force_copy):
+        """ Returns the name of a PCB with the variant applied and the snapshot used for it.
+            The PCB is shared with other outputs using the same variant, filter and title """
         if not self._comps and not force_copy:
             return GS.pcb_file, None
+        key = PcbSnapshots.get_key(self, 'pdf_pcb_print', self.hide_excluded, board.GetTitleBlock().GetTitle())
+        snap = PcbSnapshots.acquire(key, lambda: self.create_board(board))
+        return snap.file, snap
+
+    def create_board(self, board):
+        """ Creates the modified PCB, returns its name and the temporal files to remove """
         comps_hash = self.get_refs_hash()
         self.cross_modules(board, comps_hash)
         self.remove_paste_and_glue(board, comps_hash)
@@ -96,7 +105,7 @@ class PDF_Pcb_PrintOptions(VariantOptions):
         self.restore_paste_and_glue(board, comps_hash)
         if self.hide_excluded:
             self.restore_fab(board, comps_hash)
-        return fname, pcb_dir
+        return fname, [pcb_dir]
 
     def get_targets(self, out_dir):
         return [self._parent.expand_filename(out_dir, self.output)]
@@ -118,7 +127,7 @@ class PDF_Pcb_PrintOptions(VariantOptions):
         if self.mirror:
             cmd.append('--mirror')
         self.set_title(self.title)
-        board_name, board_dir = self.filter_components(GS.board, self.title != '')
+        board_name, snap = self.filter_components(GS.board, self.title != '')
         cmd.extend([board_name, os.path.dirname(output)])
         cmd, video_remove = add_extra_options(cmd)
         # Add the layers
@@ -128,10 +137,9 @@ class PDF_Pcb_PrintOptions(VariantOptions):
         # Execute it
         ret = exec_with_retry(cmd)
         self.restore_title()
-        # Remove the temporal PCB
-        if board_dir:
-            logger.debug('Removing temporal variant dir `{}`'.format(board_dir))
-            rmtree(board_dir)
+        # The temporal PCB is removed at the end of the run
+        if snap:
+            PcbSnapshots.release(snap)
         if ret:
             logger.error(CMD_PCBNEW_PRINT_LAYERS+' returned %d', ret)
             exit(PDF_PCB_PRINT)
@@ -160,6 +168,7 @@ class PDF_Pcb_Print(BaseOutput):  # noqa: F821
             self.layers = Layer
             """ [list(dict)|list(string)|string] [all,selected,copper,technical,user]
                 List of PCB layers to include in the PDF """
+        self._tools = (CMD_PCBNEW_PRINT_LAYERS,)
 
     def config(self, parent):
         super().config(parent)
@@ -14,6 +14,7 @@ from .gs import GS
 from .misc import UI_SMD, UI_VIRTUAL, MOD_THROUGH_HOLE, MOD_SMD, MOD_EXCLUDE_FROM_POS_FILES
 from .optionable import Optionable
 from .out_base import VariantOptions
+from .board_data import BoardData, scale
 from .error import KiPlotConfigurationError
 from .macros import macros, document, output_class  # noqa: F401
 from . import log
@@ -187,19 +188,19 @@ class PositionOptions(VariantOptions):
 
     @staticmethod
     def is_pure_smd_5(m):
-        return m.GetAttributes() == UI_SMD
+        return m.attrs == UI_SMD
 
     @staticmethod
     def is_pure_smd_6(m):
-        return m.GetAttributes() & (MOD_THROUGH_HOLE | MOD_SMD) == MOD_SMD  # pragma: no cover (Ki6)
+        return m.attrs & (MOD_THROUGH_HOLE | MOD_SMD) == MOD_SMD  # pragma: no cover (Ki6)
 
     @staticmethod
     def is_not_virtual_5(m):
-        return m.GetAttributes() != UI_VIRTUAL
+        return m.attrs != UI_VIRTUAL
 
     @staticmethod
     def is_not_virtual_6(m):
-        return not (m.GetAttributes() & MOD_EXCLUDE_FROM_POS_FILES)  # pragma: no cover (Ki6)
+        return not (m.attrs & MOD_EXCLUDE_FROM_POS_FILES)  # pragma: no cover (Ki6)
 
     @staticmethod
     def get_attr_tests():
@@ -230,8 +231,15 @@ class PositionOptions(VariantOptions):
         if self.use_aux_axis_as_origin:
             (x_origin, y_origin) = GS.get_aux_origin()
             logger.debug('Using auxiliar origin: x={} y={}'.format(x_origin, y_origin))
-        for m in sorted(GS.get_modules(), key=lambda c: _ref_key(c.GetReference())):
-            ref = m.GetReference()
+        data = BoardData.get()
+        footprints = data.footprints
+        # Coordinates in the selected units, relative to the origin
+        # Note: 0.0-v avoids getting -0.0 (printed as -0.0000) for things at the origin
+        xs = scale(data.center_x, x_origin, conv)
+        ys = [0.0-y for y in scale(data.center_y, y_origin, conv)]
+        for i in sorted(range(len(footprints)), key=lambda i: _ref_key(footprints[i].ref)):
+            m = footprints[i]
+            ref = m.ref
             logger.debug('P&P ref: {}'.format(ref))
             value = None
             # Apply any filter or variant data
@@ -246,16 +254,12 @@ class PositionOptions(VariantOptions):
                     is_bottom = c.bottom
                     rotation = c.footprint_rot
             if value is None:
-                value = m.GetValue()
-                footprint = str(m.GetFPID().GetLibItemName())  # pcbnew.UTF8 type
-                is_bottom = m.IsFlipped()
-                rotation = m.GetOrientationDegrees()
+                value = m.value
+                footprint = m.footprint
+                is_bottom = m.bottom
+                rotation = m.rot
             # If passed check the position options
             if (self.only_smd and is_pure_smd(m)) or (not self.only_smd and (is_not_virtual(m) or self.include_virtual)):
-                if GS.ki5():
-                    center = m.GetCenter()
-                else:
-                    center = m.GetPosition()
                 # KiCad: PLACE_FILE_EXPORTER::GenPositionData() in export_footprints_placefile.cpp
                 row = []
                 for k in self.columns:
@@ -266,12 +270,12 @@ class PositionOptions(VariantOptions):
                     elif k == 'Package':
                         row.append(quote_char+footprint+quote_char)
                     elif k == 'PosX':
-                        pos_x = (center.x - x_origin) * conv
+                        pos_x = xs[i]
                         if self.bottom_negative_x and is_bottom:
-                            pos_x = -pos_x
+                            pos_x = 0.0-pos_x
                         row.append("{:.4f}".format(pos_x))
                     elif k == 'PosY':
-                        row.append("{:.4f}".format(-(center.y - y_origin) * conv))
+                        row.append("{:.4f}".format(ys[i]))
                     elif k == 'Rot':
                         row.append("{:.4f}".format(rotation))
                     elif k == 'Side':
@@ -301,3 +305,4 @@ class Position(BaseOutput):  # noqa: F821
         with document:
             self.options = PositionOptions
             """ [dict] Options for the `position` output """
+        self._targets_need_pcb = False
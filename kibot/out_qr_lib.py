@@ -5,11 +5,11 @@
 # Project: KiBot (formerly KiPlot)
 import os
 from qrcodegen import QrCode
-from tempfile import NamedTemporaryFile
 from .gs import GS
 from .optionable import BaseOptions, Optionable
 from .error import KiPlotConfigurationError
-from .kicad.sexpdata import Symbol, dumps, Sep, load, SExpData, sexp_iter
+from .kicad.sexpdata import Symbol, dumps, Sep, SExpData, sexp_iter
+from .kicad.sexp_patch import SExpPatcher
 from .kicad.v6_sch import DrawRectangleV6, PointXY, Stroke, Fill, SchematicFieldV6, FontEffects
 from .kiplot import load_board
 from .macros import macros, document, output_class  # noqa: F401
@@ -21,7 +21,7 @@ QR_ECCS = {'low': QrCode.Ecc.LOW,
            'high': QrCode.Ecc.HIGH}
 logger = log.get_logger()
 TO_SEPARATE = set(['kicad_pcb', 'general', 'title_block', 'layers', 'setup', 'pcbplotparams', 'net_class', 'module',
-                   'kicad_sch', 'lib_symbols', 'symbol', 'sheet', 'sheet_instances', 'symbol_instances'])
+                   'footprint', 'kicad_sch', 'lib_symbols', 'symbol', 'sheet', 'sheet_instances', 'symbol_instances'])
 
 
 def is_symbol(name, sexp):
@@ -343,51 +343,24 @@ class QR_LibOptions(BaseOptions):
 
     def update_footprints(self, known_qrs):
         # Replace known QRs in the PCB
-        updated = False
         pcb = self.load_sexp_file(GS.pcb_file)
-        for iter in [sexp_iter(pcb, 'kicad_pcb/module'), sexp_iter(pcb, 'kicad_pcb/footprint')]:
-            for s in iter:
-                if len(s) < 2:
-                    continue
-                if isinstance(s[1], Symbol):
-                    name = s[1].value().lower()
-                else:
-                    name = s[1].lower()
-                if name in known_qrs:
-                    updated = True
-                    self.update_footprint(name, s, known_qrs[name])
+        for start, end in pcb.sections(('module', 'footprint')):
+            name = self.get_section_name(pcb, start)
+            if not isinstance(name, str) or name.lower() not in known_qrs:
+                continue
+            name = name.lower()
+            sexp = self.parse_section(pcb, start, end)
+            self.update_footprint(name, sexp, known_qrs[name])
+            pcb.replace(start, end, make_separated(sexp))
         # Save the resulting PCB
-        if updated:
-            # Make it readable
-            separated = make_separated(pcb[0])
-            # Save it to a temporal
-            with NamedTemporaryFile(mode='wt', suffix='.kicad_pcb', delete=False) as f:
-                logger.debug('- Saving updated PCB to: '+f.name)
-                f.write(dumps(separated))
-                f.write('\n')
-                tmp_pcb = f.name
-            # Reload it
-            GS.board = None
-            logger.debug('- Loading the temporal PCB')
-            load_board(tmp_pcb)
+        if pcb.patched:
             # Create a back-up and save it in the original place
             logger.debug('- Replacing the old PCB')
-            os.remove(tmp_pcb)
-            bkp = GS.pcb_file+'-bak'
-            if os.path.isfile(bkp):
-                os.remove(bkp)
-            os.rename(GS.pcb_file, bkp)
-            prl = None
-            if GS.ki6():
-                # KiCad 6 is destroying the PRL ...
-                prl_name = GS.pcb_no_ext+'.kicad_prl'
-                if os.path.isfile(prl_name):
-                    with open(prl_name, 'rt') as f:
-                        prl = f.read()
-            GS.board.Save(GS.pcb_file)
-            if prl:
-                with open(prl_name, 'wt') as f:
-                    f.write(prl)
+            self.save_with_backup(pcb)
+            # Reload it
+            GS.board = None
+            logger.debug('- Loading the updated PCB')
+            load_board()
 
     def update_symbol(self, name, c_name, sexp, qr):
         logger.debug('- Updating QR symbol: '+name)
@@ -421,52 +394,60 @@ class QR_LibOptions(BaseOptions):
                     logger.debug('- Updating field `{}` {} -> {}'.format(field, s[2], new_val))
                     s[2] = new_val
 
-    def update_symbols(self, fname, sexp, known_qrs):
+    def update_symbols(self, sch, known_qrs):
         # Replace known QRs in the Schematic
-        updated = False
-        for s in sexp_iter(sexp, 'kicad_sch/lib_symbols/symbol'):
-            if len(s) < 2 or not isinstance(s[1], str):
-                continue
-            name = s[1].lower()
-            c_name = s[1].split(':')[1]
-            if name in known_qrs:
-                updated = True
-                self.update_symbol(name, c_name, s, known_qrs[name])
+        for lib_start, lib_end in sch.sections(('lib_symbols',)):
+            for start, end in sch.sections(('symbol',), lib_start, lib_end):
+                name = self.get_section_name(sch, start)
+                if not isinstance(name, str) or name.lower() not in known_qrs:
+                    continue
+                c_name = name.split(':')[1]
+                name = name.lower()
+                sexp = self.parse_section(sch, start, end)
+                self.update_symbol(name, c_name, sexp, known_qrs[name])
+                sch.replace(start, end, make_separated(sexp))
         # Save the resulting Schematic
-        if updated:
-            # Make it readable
-            separated = make_separated(sexp[0])
+        if sch.patched:
             # Create a back-up and save it in the original place
             logger.debug('- Replacing the old SCH')
-            bkp = fname+'-bak'
-            if os.path.isfile(bkp):
-                os.remove(bkp)
-            os.rename(fname, bkp)
-            with open(fname, 'wt') as f:
-                f.write(dumps(separated))
-                f.write('\n')
+            self.save_with_backup(sch)
+
+    def save_with_backup(self, patcher):
+        fname = patcher.fname
+        bkp = fname+'-bak'
+        if os.path.isfile(bkp):
+            os.remove(bkp)
+        os.rename(fname, bkp)
+        patcher.write()
 
     def load_sexp_file(self, fname):
-        with open(fname, 'rt') as fh:
-            error = None
-            try:
-                ki_file = load(fh)
-            except SExpData as e:
-                error = str(e)
-            if error:
-                raise KiPlotConfigurationError(error)
-        return ki_file
+        try:
+            return SExpPatcher(fname)
+        except UnicodeDecodeError as e:
+            raise KiPlotConfigurationError('Error loading {}: {}'.format(fname, e))
+
+    def parse_section(self, patcher, start, end):
+        try:
+            return patcher.parse(start, end)
+        except SExpData as e:
+            raise KiPlotConfigurationError('Error parsing {}: {}'.format(patcher.fname, e))
+
+    def get_section_name(self, patcher, start):
+        try:
+            return patcher.section_name(start)
+        except SExpData as e:
+            raise KiPlotConfigurationError('Error parsing {}: {}'.format(patcher.fname, e))
 
     def load_k6_sheets(self, fname, sheets={}):
         logger.debug('- Loading '+fname)
         sheet = self.load_sexp_file(fname)
         sheets[fname] = sheet
-        if not is_symbol('kicad_sch', sheet[0]):
+        if sheet.head() != 'kicad_sch':
             raise KiPlotConfigurationError('No kicad_sch signature in '+fname)
         path = os.path.dirname(fname)
-        for s in sexp_iter(sheet, 'kicad_sch/sheet'):
+        for start, end in sheet.sections(('sheet',)):
             sub_name = None
-            for prop in sexp_iter(s, 'property'):
+            for prop in sexp_iter(self.parse_section(sheet, start, end), 'property'):
                 if len(prop) > 2 and isinstance(prop[1], str) and isinstance(prop[2], str) and prop[1] == 'Sheet file':
                     sub_name = prop[2]
             if sub_name is not None:
@@ -515,8 +496,8 @@ class QR_LibOptions(BaseOptions):
                 # KiCad 5 reads the lib, but KiCad 6 is more like the PCB
                 assert GS.sch_file is not None
                 sheets = self.load_k6_sheets(GS.sch_file)
-                for k, v in sheets.items():
-                    self.update_symbols(k, v, known_qrs)
+                for sheet in sheets.values():
+                    self.update_symbols(sheet, known_qrs)
 
 
 @output_class
@@ -535,3 +516,4 @@ class QR_Lib(BaseOutput):  # noqa: F821
             self.options = QR_LibOptions
             """ [dict] Options for the `boardview` output """
         self._both_related = True
+        self._targets_need_pcb = False
@@ -5,8 +5,6 @@
 # Project: KiBot (formerly KiPlot)
 # KiCad 6 bug: https://gitlab.com/kicad/code/kicad/-/issues/9890
 import os
-from glob import glob
-from shutil import rmtree
 from .misc import (CMD_PCBNEW_3D, URL_PCBNEW_3D, RENDER_3D_ERR, PCB_MAT_COLORS, PCB_FINISH_COLORS, SOLDER_COLORS, SILK_COLORS)
 from .gs import (GS)
 from .kiplot import check_script, exec_with_retry, add_extra_options
@@ -158,18 +156,13 @@ class Render3DOptions(Base3DOptions):
             cmd.extend(['--view', self.view])
         # The board
         board_name = self.filter_components(GS.pcb_dir)
-        cmd.extend([board_name, os.path.dirname(output)])
-        cmd, video_remove = add_extra_options(cmd)
-        # Execute it
-        ret = exec_with_retry(cmd)
-        # Remove the temporal PCB
-        if board_name != GS.pcb_file:
-            # KiCad likes to create project files ...
-            for f in glob(board_name.replace('.kicad_pcb', '.*')):
-                os.remove(f)
-        # Remove the downloaded 3D models
-        if self._tmp_dir:
-            rmtree(self._tmp_dir)
+        try:
+            cmd.extend([board_name, os.path.dirname(output)])
+            cmd, video_remove = add_extra_options(cmd)
+            # Execute it
+            ret = exec_with_retry(cmd)
+        finally:
+            self.remove_temporals()
         if ret:
             logger.error(CMD_PCBNEW_3D+' returned %d', ret)
             exit(RENDER_3D_ERR)
@@ -188,3 +181,4 @@ class Render_3D(Base3D):  # noqa: F821
         with document:
             self.options = Render3DOptions
             """ [dict] Options for the `render_3d` output """
+        self._tools = (CMD_PCBNEW_3D,)
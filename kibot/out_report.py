@@ -4,12 +4,13 @@
 # License: GPL-3.0
 # Project: KiBot (formerly KiPlot)
 import os
-import re
 import pcbnew
 
 from .gs import GS
 from .misc import UI_SMD, UI_VIRTUAL, MOD_THROUGH_HOLE, MOD_SMD, MOD_EXCLUDE_FROM_POS_FILES
 from .out_base import BaseOptions
+from .board_data import BoardData, minimum, histogram, histogram_pairs, drill_stats
+from .report_template import load_template
 from .error import KiPlotConfigurationError
 from .macros import macros, document, output_class  # noqa: F401
 from . import log
@@ -119,6 +120,9 @@ class ReportOptions(BaseOptions):
         self._mm_digits = 2
         self._mils_digits = 0
         self._in_digits = 2
+        self._units = {'mm': lambda v: to_mm(v, self._mm_digits),
+                       'in': lambda v: to_inches(v, self._in_digits),
+                       'mils': lambda v: to_mils(v, self._mils_digits)}
 
     def config(self, parent):
         super().config(parent)
@@ -128,56 +132,40 @@ class ReportOptions(BaseOptions):
         if not os.path.isfile(self.template):
             raise KiPlotConfigurationError("Missing report template: `{}`".format(self.template))
 
-    def do_replacements(self, line, defined):
-        """ Replace ${VAR} patterns """
-        for var in re.findall(r'\$\{([^\s\}]+)\}', line):
-            if var[0] == '_':
-                # Prevent access to internal data
+    def expand(self, chunks, defined):
+        """ Expands a compiled line, replacing the ${VAR} patterns """
+        text = []
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                text.append(chunk)
                 continue
-            units = None
-            var_ori = var
-            m = re.match(r'^(%[^,]+),(.*)$', var)
-            pattern = None
-            if m:
-                pattern = m.group(1)
-                var = m.group(2)
-            if var.endswith('_mm'):
-                units = to_mm
-                digits = self._mm_digits
-                var = var[:-3]
-            elif var.endswith('_in'):
-                units = to_inches
-                digits = self._in_digits
-                var = var[:-3]
-            elif var.endswith('_mils'):
-                units = to_mils
-                digits = self._mils_digits
-                var = var[:-5]
-            if var in defined:
-                val = defined[var]
-                if val == INF:
-                    val = 'N/A'
-                elif units is not None and isinstance(val, (int, float)):
-                    val = units(val, digits)
-                if pattern is not None:
-                    clear = False
-                    if 's' in pattern:
-                        val = str(val)
-                    else:
-                        try:
-                            val = float(val)
-                        except ValueError:
-                            val = 0
-                            clear = True
-                    rep = pattern % val
-                    if clear:
-                        rep = ' '*len(rep)
+            var_ori, var, pattern, units = chunk
+            if var not in defined:
+                print('Error: Unable to expand `{}`'.format(var))
+                text.append(var_ori)
+                continue
+            val = defined[var]
+            if val == INF:
+                val = 'N/A'
+            elif units is not None and isinstance(val, (int, float)):
+                val = self._units[units](val)
+            if pattern is not None:
+                clear = False
+                if 's' in pattern:
+                    val = str(val)
                 else:
-                    rep = str(val)
-                line = line.replace('${'+var_ori+'}', rep)
+                    try:
+                        val = float(val)
+                    except ValueError:
+                        val = 0
+                        clear = True
+                rep = pattern % val
+                if clear:
+                    rep = ' '*len(rep)
             else:
-                print('Error: Unable to expand `{}`'.format(var))
-        return line
+                rep = str(val)
+            text.append(rep)
+        return ''.join(text)
 
     def context_defined_tracks(self, line):
         """ Replace iterator for the `defined_tracks` context """
@@ -185,22 +173,22 @@ class ReportOptions(BaseOptions):
         for t in sorted(self._track_sizes):
             if not t:
                 continue  # KiCad 6
-            text += self.do_replacements(line, {'track': t})
+            text += self.expand(line, {'track': t})
         return text
 
     def context_used_tracks(self, line):
         """ Replace iterator for the `used_tracks` context """
         text = ''
         for t in sorted(self._tracks_m.keys()):
-            text += self.do_replacements(line, {'track': t, 'count': self._tracks_m[t],
-                                         'defined': 'yes' if t in self._tracks_defined else 'no'})
+            text += self.expand(line, {'track': t, 'count': self._tracks_m[t],
+                                       'defined': 'yes' if t in self._tracks_defined else 'no'})
         return text
 
     def context_defined_vias(self, line):
         """ Replace iterator for the `defined_vias` context """
         text = ''
         for v in self._via_sizes_sorted:
-            text += self.do_replacements(line, {'pad': v[1], 'drill': v[0]})
+            text += self.expand(line, {'pad': v[1], 'drill': v[0]})
         return text
 
     def context_used_vias(self, line):
@@ -222,14 +210,14 @@ class ReportOptions(BaseOptions):
             defined['aspect'] = aspect
             defined['producibility_level'] = producibility_level
             defined['defined'] = 'yes' if (h, d) in self._vias_defined else 'no'
-            text += self.do_replacements(line, defined)
+            text += self.expand(line, defined)
         return text
 
     def context_hole_sizes_no_vias(self, line):
         """ Replace iterator for the `hole_sizes_no_vias` context """
         text = ''
         for d in sorted(self._drills.keys()):
-            text += self.do_replacements(line, {'drill': d, 'count': self._drills[d]})
+            text += self.expand(line, {'drill': d, 'count': self._drills[d]})
         return text
 
     def context_stackup(self, line):
@@ -241,24 +229,24 @@ class ReportOptions(BaseOptions):
                 val = getattr(s, k)
                 if k[0] != '_' and not callable(val):
                     context[k] = val if val is not None else ''
-            text += self.do_replacements(line, context)
+            text += self.expand(line, context)
         return text
 
     @staticmethod
     def is_pure_smd_5(m):
-        return m.GetAttributes() == UI_SMD
+        return m.attrs == UI_SMD
 
     @staticmethod
     def is_pure_smd_6(m):
-        return m.GetAttributes() & (MOD_THROUGH_HOLE | MOD_SMD) == MOD_SMD
+        return m.attrs & (MOD_THROUGH_HOLE | MOD_SMD) == MOD_SMD
 
     @staticmethod
     def is_not_virtual_5(m):
-        return m.GetAttributes() != UI_VIRTUAL
+        return m.attrs != UI_VIRTUAL
 
     @staticmethod
     def is_not_virtual_6(m):
-        return not (m.GetAttributes() & MOD_EXCLUDE_FROM_POS_FILES)
+        return not (m.attrs & MOD_EXCLUDE_FROM_POS_FILES)
 
     def get_attr_tests(self):
         if GS.ki5():
@@ -326,38 +314,23 @@ class ReportOptions(BaseOptions):
         # Track width (min)
         ###########################################################
         self.track_d = ds.m_TrackMinWidth
-        tracks = board.GetTracks()
-        self.oar_vias = self.track = INF
-        self._vias = {}
-        self._tracks_m = {}
-        track_type = 'TRACK' if GS.ki5() else 'PCB_TRACK'
-        via_type = 'VIA' if GS.ki5() else 'PCB_VIA'
-        for t in tracks:
-            tclass = t.GetClass()
-            if tclass == track_type:
-                w = t.GetWidth()
-                self.track = min(w, self.track)
-                self._tracks_m[w] = self._tracks_m.get(w, 0) + 1
-            elif tclass == via_type:
-                via = t.Cast()
-                via_id = (via.GetDrill(), via.GetWidth())
-                self._vias[via_id] = self._vias.get(via_id, 0) + 1
-                self.oar_vias = min(self.oar_vias, via_id[1] - via_id[0])
+        data = BoardData.get(board)
+        self.track = minimum(data.track_widths)
+        self._tracks_m = histogram(data.track_widths)
+        self._vias = histogram_pairs(data.via_drills, data.via_widths)
+        self.oar_vias = minimum([w - d for d, w in self._vias.keys()])
         self.track_min = min(self.track_d, self.track)
         ###########################################################
         # Drill (min)
         ###########################################################
-        modules = board.GetModules() if GS.ki5() else board.GetFootprints()
-        self._drills = {}
-        self._drills_oval = {}
-        self.oar_pads = self.pad_drill = INF
-        self.slot = INF
+        (self.pad_drill, self._drills, self._drills_oval, self.slot,
+         self.oar_pads) = drill_stats(data.pad_drill_x, data.pad_drill_y, data.pad_size_x, data.pad_size_y)
         self.top_smd = self.top_tht = self.bot_smd = self.bot_tht = 0
         top_layer = board.GetLayerID('F.Cu')
         bottom_layer = board.GetLayerID('B.Cu')
         is_pure_smd, is_not_virtual = self.get_attr_tests()
-        for m in modules:
-            layer = m.GetLayer()
+        for m in data.footprints:
+            layer = m.layer
             if layer == top_layer:
                 if is_pure_smd(m):
                     self.top_smd += 1
@@ -368,29 +341,6 @@ class ReportOptions(BaseOptions):
                     self.bot_smd += 1
                 elif is_not_virtual(m):
                     self.bot_tht += 1
-            pads = m.Pads()
-            for pad in pads:
-                dr = pad.GetDrillSize()
-                if not dr.x:
-                    continue
-                self.pad_drill = min(dr.x, self.pad_drill)
-                self.pad_drill = min(dr.y, self.pad_drill)
-                if dr.x == dr.y:
-                    self._drills[dr.x] = self._drills.get(dr.x, 0) + 1
-                else:
-                    if dr.x < dr.y:
-                        m = (dr.x, dr.y)
-                    else:
-                        m = (dr.y, dr.x)
-                    self._drills_oval[m] = self._drills_oval.get(m, 0) + 1
-                    self.slot = min(self.slot, m[0])
-                    # print('{} @ {}'.format(dr, pad.GetPosition()))
-                pad_sz = pad.GetSize()
-                oar_x = pad_sz.x - dr.x
-                oar_y = pad_sz.y - dr.y
-                oar_t = min(oar_x, oar_y)
-                if oar_t:
-                    self.oar_pads = min(self.oar_pads, oar_t)
         self._vias_m = list(sorted(self._vias.keys()))
         # Via Pad size
         self.via_pad_d = ds.m_ViasMinSize
@@ -464,10 +414,8 @@ class ReportOptions(BaseOptions):
         self._track_sizes = board.GetTrackWidthList()
         self._tracks_defined = set(self._track_sizes)
 
-    def eval_conditional(self, line):
-        context = {k: getattr(self, k) for k in dir(self) if k[0] != '_' and not callable(getattr(self, k))}
+    def eval_conditional(self, text, context):
         res = None
-        text = line[2:].strip()
         logger.debug('- Evaluating `{}`'.format(text))
         try:
             res = eval(text, {}, context)
@@ -477,37 +425,34 @@ class ReportOptions(BaseOptions):
         return res
 
     def do_template(self, template_file, output_file):
-        text = ''
         logger.debug("Report template: `{}`".format(template_file))
-        with open(template_file, "rt") as f:
-            skip_next = False
-            for line in f:
-                if skip_next:
-                    skip_next = False
-                    continue
-                done = False
-                if line[0] == '#':
-                    if line.startswith('#?'):
-                        skip_next = not self.eval_conditional(line)
-                        done = True
-                        line = ''
-                    elif ':' in line:
-                        context = line[1:].split(':')[0]
-                        logger.debug("- Report context: `{}`".format(context))
-                        name = 'context_'+context
-                        if hasattr(self, name):
-                            # Contexts are members called context_*
-                            line = getattr(self, name)(line[len(context)+2:])
-                            done = True
-                        else:
-                            raise KiPlotConfigurationError("Unknown context: `{}`".format(context))
-                if not done:
-                    # Just replace using any data member (_* excluded)
-                    line = self.do_replacements(line, self.__dict__)
-                text += line
+        text = []
+        # Data available for the conditionals, computed when needed
+        context = None
+        skip_next = False
+        for node in load_template(template_file):
+            if skip_next:
+                skip_next = False
+                continue
+            kind = node[0]
+            if kind == 'text':
+                # Just replace using any data member (_* excluded)
+                text.append(self.expand(node[1], self.__dict__))
+            elif kind == 'cond':
+                if context is None:
+                    context = {k: getattr(self, k) for k in dir(self) if k[0] != '_' and not callable(getattr(self, k))}
+                skip_next = not self.eval_conditional(node[1], context)
+            else:  # kind == 'context'
+                name = node[1]
+                logger.debug("- Report context: `{}`".format(name))
+                # Contexts are members called context_*
+                func = getattr(self, 'context_'+name, None)
+                if func is None:
+                    raise KiPlotConfigurationError("Unknown context: `{}`".format(name))
+                text.append(func(node[2]))
         logger.debug("Report output: `{}`".format(output_file))
         with open(output_file, "wt") as f:
-            f.write(text)
+            f.write(''.join(text))
 
     def get_targets(self, out_dir):
         return [self._parent.expand_filename(out_dir, self.output)]
@@ -544,3 +489,4 @@ class Report(BaseOutput):  # noqa: F821
         with document:
             self.options = ReportOptions
             """ [dict] Options for the `report` output """
+        self._targets_need_pcb = False
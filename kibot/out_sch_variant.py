@@ -3,8 +3,11 @@
 # Copyright (c) 2020-2021 Instituto Nacional de Tecnología Industrial
 # License: GPL-3.0
 # Project: KiBot (formerly KiPlot)
+import os
+from shutil import copy2
 from .gs import GS
 from .out_base import VariantOptions
+from .sch_snapshot import SchSnapshots
 from .macros import macros, document, output_class  # noqa: F401
 
 
@@ -17,8 +20,15 @@ class Sch_Variant_Options(VariantOptions):
 
     def run(self, output_dir):
         super().run(output_dir)
-        # Create the schematic
-        GS.sch.save_variant(output_dir)
+        if self._comps:
+            # Copy the schematic we share with other outputs using the same variant
+            snap = SchSnapshots.acquire(self)
+            for f in snap.files:
+                copy2(f, os.path.join(output_dir, os.path.basename(f)))
+            SchSnapshots.release(snap)
+        else:
+            # Create the schematic
+            GS.sch.save_variant(output_dir)
 
 
 @output_class
@@ -5,10 +5,7 @@
 # Project: KiBot (formerly KiPlot)
 # KiCad 6 bug: https://gitlab.com/kicad/code/kicad/-/issues/10075
 import re
-import os
-from glob import glob
 from subprocess import (check_output, STDOUT, CalledProcessError)
-from shutil import rmtree
 from .error import KiPlotConfigurationError
 from .misc import KICAD2STEP, KICAD2STEP_ERR, URL_PCBNEW_RUN_DRC
 from .gs import (GS)
@@ -90,14 +87,7 @@ class STEPOptions(Base3DOptions):
                 logger.debug('Output from command: '+e.output.decode())
             exit(KICAD2STEP_ERR)
         finally:
-            # Remove the temporal PCB
-            if board_name != GS.pcb_file:
-                # KiCad likes to create project files ...
-                for f in glob(board_name.replace('.kicad_pcb', '.*')):
-                    os.remove(f)
-            # Remove the downloaded 3D models
-            if self._tmp_dir:
-                rmtree(self._tmp_dir)
+            self.remove_temporals()
         logger.debug('Output from command:\n'+cmd_output.decode())
 
 
@@ -112,3 +102,4 @@ class STEP(Base3D):  # noqa: F821
         with document:
             self.options = STEPOptions
             """ [dict] Options for the `step` output """
+        self._tools = (KICAD2STEP,)
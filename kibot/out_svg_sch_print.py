@@ -5,12 +5,11 @@
 # License: GPL-3.0
 # Project: KiBot (formerly KiPlot)
 import os
-from tempfile import mkdtemp
-from shutil import rmtree
 from .gs import (GS)
 from .kiplot import check_eeschema_do, exec_with_retry, add_extra_options
 from .misc import (CMD_EESCHEMA_DO, SVG_SCH_PRINT)
 from .out_base import VariantOptions
+from .sch_snapshot import SchSnapshots
 from .macros import macros, document, output_class  # noqa: F401
 from . import log
 
@@ -37,16 +36,17 @@ class SVG_Sch_PrintOptions(VariantOptions):
         output_dir = os.path.dirname(name)
         check_eeschema_do()
         if self._comps:
-            # Save it to a temporal dir
-            sch_dir = mkdtemp(prefix='tmp-kibot-svg_sch_print-')
-            fname = GS.sch.save_variant(sch_dir)
-            sch_file = os.path.join(sch_dir, fname)
+            # Use a copy with the variant applied
+            snap = SchSnapshots.acquire(self)
+            sch_file = snap.file
         else:
-            sch_dir = None
+            snap = None
             sch_file = GS.sch_file
         cmd = [CMD_EESCHEMA_DO, 'export', '--all_pages', '--file_format', 'svg', sch_file, output_dir]
         cmd, video_remove = add_extra_options(cmd)
         ret = exec_with_retry(cmd)
+        if snap:
+            SchSnapshots.release(snap)
         if ret:
             logger.error(CMD_EESCHEMA_DO+' returned %d', ret)
             exit(SVG_SCH_PRINT)
@@ -54,10 +54,6 @@ class SVG_Sch_PrintOptions(VariantOptions):
             cur = self._parent.expand_filename(output_dir, '%f.%x')
             logger.debug('Moving '+cur+' -> '+name)
             os.rename(cur, name)
-        # Remove the temporal dir if needed
-        if sch_dir:
-            logger.debug('Removing temporal variant dir `{}`'.format(sch_dir))
-            rmtree(sch_dir)
         if video_remove:
             video_name = os.path.join(output_dir, 'export_eeschema_screencast.ogv')
             if os.path.isfile(video_name):
@@ -75,3 +71,4 @@ class SVG_Sch_Print(BaseOutput):  # noqa: F821
             self.options = SVG_Sch_PrintOptions
             """ [dict] Options for the `svg_sch_print` output """
         self._sch_related = True
+        self._tools = (CMD_EESCHEMA_DO,)
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2022 Salvador E. Tropea
+# Copyright (c) 2022 Instituto Nacional de Tecnología Industrial
+# License: GPL-3.0
+# Project: KiBot (formerly KiPlot)
+"""
+Modified PCBs shared by the outputs.
+The STEP, 3D render and PDF PCB print outputs need a copy of the PCB with the variant applied (and other changes).
+Saving a big PCB is slow, so we save each different PCB once and share it during the run.
+The outputs provide a key describing all the applied changes and a function to create the PCB.
+"""
+import os
+from glob import glob
+from shutil import rmtree
+from .snapshot_base import Snapshot, SnapshotRegistry
+from . import log
+
+logger = log.get_logger()
+
+
+class PcbSnapshot(Snapshot):
+    """ A modified PCB stored in a temporal file """
+    def __init__(self, key, create):
+        super().__init__(key)
+        # The function returns the name of the PCB and a list of temporal files and dirs (glob patterns)
+        self.file, self._temporals = create()
+
+    def remove(self):
+        for pattern in self._temporals:
+            # KiCad tools could create project files, so we use patterns
+            for f in glob(pattern):
+                logger.debug('Removing temporal `{}`'.format(f))
+                if os.path.isdir(f):
+                    rmtree(f)
+                else:
+                    os.remove(f)
+
+
+class PcbSnapshots(SnapshotRegistry):
+    """ The modified PCBs created during this run.
+        Indexed by a key provided by the output, must contain everything affecting the PCB. """
+    _snapshots = {}
+    _what = 'modified PCB'
+
+    @classmethod
+    def acquire(cls, key, create):
+        """ Returns the snapshot for this key, calling `create` if we don't have it.
+            `create` must return the name of the PCB and a list of temporal files and dirs (glob patterns).
+            Call `release` when you finished using it. """
+        return super().acquire(key, lambda: PcbSnapshot(key, create))
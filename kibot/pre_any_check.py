@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2022 Salvador E. Tropea
+# Copyright (c) 2022 Instituto Nacional de Tecnología Industrial
+# License: GPL-3.0
+# Project: KiBot (formerly KiPlot)
+import os
+from sys import exit
+from .gs import GS
+from .error import KiPlotConfigurationError
+from .kiplot import exec_with_retry, add_extra_options, get_version
+from .pre_base import BasePreFlight
+from .cache import hash_data, get_file, store_file
+from . import log
+
+logger = log.get_logger()
+
+
+class Base_Check(BasePreFlight):
+    """ Base class for the ERC/DRC.
+        They run a KiAuto tool, can be executed in parallel and a clean result is cached """
+    def __init__(self, name, value):
+        super().__init__(name, value)
+        if not isinstance(value, bool):
+            raise KiPlotConfigurationError('must be boolean')
+        self._enabled = value
+        self._parallel = True
+        self._expand_ext = 'txt'
+        # Must be defined by the derived class
+        self._what = ''
+        self._error = 0
+        self._video = ''
+
+    def check_tool(self):
+        """ Ensures the KiAuto tool is installed """
+        pass
+
+    def get_command(self, output):
+        """ The KiAuto command line """
+        return []
+
+    def get_cache_files(self):
+        """ Files affecting the result """
+        return []
+
+    def get_cache_options(self):
+        """ Options affecting the result """
+        content = ''
+        if GS.filter_file and os.path.isfile(GS.filter_file):
+            with open(GS.filter_file, 'rt') as f:
+                content = f.read()
+        # A new KiAuto could do a different check
+        versions = [get_version(tool)[0] for tool in self._tools]
+        return [self._what, GS.kicad_version, content]+versions
+
+    def run_error(self, ret):
+        """ Called when the tool returned an error """
+        pass
+
+    def prepare(self):
+        self.check_tool()
+        output = self.get_targets()[0]
+        logger.debug(self._what+' report: '+output)
+        key = hash_data(self.get_cache_files(), self.get_cache_options())
+        if get_file(self._expand_id, key, output):
+            logger.info('- Skipping the {}, the design passed it in a previous run'.format(self._what))
+            return None
+        cmd = self.get_command(output)
+        # If we are in verbose mode enable debug in the child
+        cmd, video_remove = add_extra_options(cmd)
+        logger.info('- Running the '+self._what)
+        return (cmd, output, key, video_remove)
+
+    def execute(self, job):
+        return exec_with_retry(job[0], get_stderr=True)
+
+    def finish(self, job, result):
+        cmd, output, key, video_remove = job
+        ret, stderr = result
+        if video_remove:
+            video_name = os.path.join(self.expand_dirname(GS.out_dir), self._video)
+            if os.path.isfile(video_name):
+                os.remove(video_name)
+        if ret:
+            if ret > 127:
+                ret = -(256-ret)
+            if ret < 0:
+                logger.error(self._what+' errors: %d', -ret)
+            else:
+                logger.error(self._what+' returned %d', ret)
+                self.run_error(ret)
+            exit(self._error)
+        if 'WARNING:' not in stderr and 'ERROR:' not in stderr:
+            # A clean result, no need to run it again for the same design
+            store_file(self._expand_id, key, output)
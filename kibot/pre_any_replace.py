@@ -6,6 +6,7 @@
 import os
 import re
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from subprocess import run, PIPE
 from .error import KiPlotConfigurationError
 from .misc import FAILED_EXECUTE, W_EMPTREP, W_BADCHARS
@@ -15,6 +16,28 @@ from .macros import macros, document, pre_class  # noqa: F401
 from . import log
 
 logger = log.get_logger()
+# Numeric and named back-references
+BACK_REF = re.compile(r'\\[1-9]|\(\?P=')
+
+
+def compile_tags(tags):
+    """ Joins the tags in one regex. Each tag is a named group (t0, t1, etc.).
+        Joining the tags renumbers their groups, so tags using back-references get their own regex.
+        Returns a list of (regex, tag index), the index is None for the joined regex """
+    joined = []
+    regexes = []
+    for n, t in enumerate(tags):
+        if BACK_REF.search(t.tag):
+            regexes.append((re.compile(t.tag, re.MULTILINE), n))
+        else:
+            joined.append('(?P<t{}>{})'.format(n, t.tag))
+    if joined:
+        regexes.insert(0, (re.compile('|'.join(joined), re.MULTILINE), None))
+    return regexes
+
+
+def run_command(command, env):
+    return run(['/bin/bash', '-c', command], stdout=PIPE, stderr=PIPE, universal_newlines=True, env=env)
 
 
 class TagReplaceBase(Optionable):
@@ -85,33 +108,64 @@ class Base_Replace(BasePreFlight):  # noqa: F821
                 "\n        before: 'Git hash: <'"
                 "\n        after: '>'\n".format(cls._context, cls._context))
 
-    def replace(self, file):
-        logger.debug('Applying replacements to `{}`'.format(file))
+    def get_texts(self, files):
+        """ Computes the text for each tag and file. None for the tags we must skip.
+            The commands for all the files are executed concurrently """
+        tags = self._value.replace_tags
+        var = 'KIBOT_' + type(self)._context + '_NAME'
+        with ThreadPoolExecutor() as executor:
+            jobs = [[executor.submit(run_command, r.command, dict(os.environ, **{var: file})) if not r.text else None
+                     for r in tags] for file in files]
+        texts = []
+        for file, file_jobs in zip(files, jobs):
+            logger.debug('Replacements for `{}`'.format(file))
+            file_texts = []
+            for r, job in zip(tags, file_jobs):
+                text = r.text
+                if job is not None:
+                    result = job.result()
+                    if result.returncode:
+                        logger.error('Failed to execute:\n{}\nreturn code {}'.format(r.command, result.returncode))
+                        sys.exit(FAILED_EXECUTE)
+                    if not result.stdout:
+                        logger.warning(W_EMPTREP+"Empty value from `{}` skipping it".format(r.command))
+                        file_texts.append(None)
+                        continue
+                    text = result.stdout.strip()
+                text = r.before + text + r.after
+                if not r._relax_check:
+                    new_text = re.sub(r'["\\\\\s]', '_', text)
+                    if new_text != text:
+                        logger.warning(W_BADCHARS+"Replace text can't contain double quotes, backslashes or white spaces ({})".
+                                       format(text))
+                        text = new_text
+                logger.debug('- ' + r.tag + ' -> ' + text)
+                file_texts.append(text)
+            texts.append(file_texts)
+        return texts
+
+    @staticmethod
+    def replace(file, regexes, texts):
+        """ Replaces all the tags in one pass (plus one for each tag using back-references).
+            The texts are inserted literally and aren't scanned for other tags """
         with open(file, 'rt') as f:
             content = f.read()
-        os.environ['KIBOT_' + type(self)._context + '_NAME'] = file
-        o = self._value
-        for r in o.replace_tags:
-            text = r.text
-            if not text:
-                cmd = ['/bin/bash', '-c', r.command]
-                result = run(cmd, stdout=PIPE, stderr=PIPE, universal_newlines=True)
-                if result.returncode:
-                    logger.error('Failed to execute:\n{}\nreturn code {}'.format(r.command, result.returncode))
-                    sys.exit(FAILED_EXECUTE)
-                if not result.stdout:
-                    logger.warning(W_EMPTREP+"Empty value from `{}` skipping it".format(r.command))
-                    continue
-                text = result.stdout.strip()
-            text = r.before + text + r.after
-            if not r._relax_check:
-                new_text = re.sub(r'["\\\\\s]', '_', text)
-                if new_text != text:
-                    logger.warning(W_BADCHARS+"Replace text can't contain double quotes, backslashes or white spaces ({})".
-                                   format(text))
-                    text = new_text
-            logger.debug('- ' + r.tag + ' -> ' + text)
-            content = re.sub(r.tag, text, content, flags=re.MULTILINE)
+        for regex, n in regexes:
+            if n is None:
+                content = regex.sub(lambda m: texts[int(m.lastgroup[1:])] or m.group(0), content)
+            elif texts[n]:
+                content = regex.sub(lambda m: texts[n], content)
         os.rename(file, file + '-bak')
         with open(file, 'wt') as f:
             f.write(content)
+
+    def replace_files(self, files):
+        """ Applies the replacements to all the files, in parallel """
+        logger.debug('Applying replacements to {}'.format(', '.join('`{}`'.format(f) for f in files)))
+        tags = self._value.replace_tags
+        texts = self.get_texts(files)
+        regexes = compile_tags(tags)
+        with ThreadPoolExecutor() as executor:
+            jobs = [executor.submit(self.replace, file, regexes, file_texts) for file, file_texts in zip(files, texts)]
+        for job in jobs:
+            job.result()
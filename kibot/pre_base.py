@@ -3,6 +3,7 @@
 # Copyright (c) 2020-2021 Instituto Nacional de Tecnología Industrial
 # License: GPL-3.0
 # Project: KiBot (formerly KiPlot)
+from concurrent.futures import ThreadPoolExecutor
 from .gs import GS
 from .registrable import Registrable
 from .optionable import Optionable
@@ -23,6 +24,10 @@ class BasePreFlight(Registrable):
         self._sch_related = False
         self._pcb_related = False
         self._enabled = True
+        # Preflights that implement prepare/execute/finish can run in parallel with others
+        self._parallel = False
+        # External tools used, their versions are computed in parallel before running the preflights
+        self._tools = ()
         self._expand_id = ''
         self._expand_ext = ''
 
@@ -56,10 +61,45 @@ class BasePreFlight(Registrable):
                     GS.check_pcb()
                 logger.debug('Preflight apply '+k)
                 v.apply()
+        # Keep the config order, only consecutive preflights are executed in parallel
+        parallel = []
         for k, v in BasePreFlight._in_use.items():
             if v._enabled:
-                logger.debug('Preflight run '+k)
-                v.run()
+                if v._parallel:
+                    parallel.append(v)
+                else:
+                    BasePreFlight.run_group(parallel)
+                    parallel = []
+                    logger.debug('Preflight run '+k)
+                    v.run()
+        BasePreFlight.run_group(parallel)
+
+    @staticmethod
+    def run_group(pres):
+        """ Runs a group of consecutive preflights that can be executed in parallel """
+        if len(pres) > 1:
+            BasePreFlight.run_parallel(pres)
+        elif pres:
+            logger.debug('Preflight run '+pres[0]._name)
+            pres[0].run()
+
+    @staticmethod
+    def run_parallel(pres):
+        """ Runs the slow part (`execute`) of the preflights concurrently.
+            The `prepare` and `finish` stages are executed in the main thread """
+        jobs = []
+        for v in pres:
+            logger.debug('Preflight prepare '+v._name)
+            job = v.prepare()
+            if job is not None:
+                jobs.append((v, job))
+        if not jobs:
+            return
+        logger.debug('Preflight run in parallel: '+', '.join(v._name for v, _ in jobs))
+        with ThreadPoolExecutor(max_workers=len(jobs)) as executor:
+            results = [executor.submit(v.execute, job) for v, job in jobs]
+        for (v, job), res in zip(jobs, results):
+            v.finish(job, res.result())
 
     def disable(self):
         self._enabled = False
@@ -87,11 +127,26 @@ class BasePreFlight(Registrable):
         return cls.__doc__, None
 
     def run(self):
-        pass
+        if self._parallel:
+            job = self.prepare()
+            if job is not None:
+                self.finish(job, self.execute(job))
 
     def apply(self):
         pass
 
+    def prepare(self):
+        """ Parallel preflights: returns the job to execute, None if nothing to do """
+        return None
+
+    def execute(self, job):
+        """ Parallel preflights: runs the job. Executed in a worker thread, so don't touch GS.board/GS.sch """
+        return None
+
+    def finish(self, job, result):
+        """ Parallel preflights: processes the result of `execute` """
+        pass
+
     def get_dependencies(self):
         """ Returns a list of files needed to run this preflight """
         files = []
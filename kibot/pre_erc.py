@@ -1,33 +1,32 @@
 # -*- coding: utf-8 -*-
-# Copyright (c) 2020-2021 Salvador E. Tropea
-# Copyright (c) 2020-2021 Instituto Nacional de Tecnología Industrial
+# Copyright (c) 2020-2022 Salvador E. Tropea
+# Copyright (c) 2020-2022 Instituto Nacional de Tecnología Industrial
 # License: GPL-3.0
 # Project: KiBot (formerly KiPlot)
 import os
-from sys import (exit)
 from .macros import macros, pre_class  # noqa: F401
 from .gs import (GS)
 from .optionable import Optionable
-from .kiplot import check_eeschema_do, exec_with_retry, load_sch, add_extra_options
-from .error import (KiPlotConfigurationError)
+from .kiplot import check_eeschema_do, load_sch
 from .misc import (CMD_EESCHEMA_DO, ERC_ERROR)
+from .pre_any_check import Base_Check
 from .log import (get_logger)
 
 logger = get_logger(__name__)
 
 
 @pre_class
-class Run_ERC(BasePreFlight):  # noqa: F821
+class Run_ERC(Base_Check):  # noqa: F821
     """ [boolean=false] Runs the ERC (Electrical Rules Check). To ensure the schematic is electrically correct.
         The report file name is controlled by the global output pattern (%i=erc %x=txt) """
     def __init__(self, name, value):
         super().__init__(name, value)
-        if not isinstance(value, bool):
-            raise KiPlotConfigurationError('must be boolean')
-        self._enabled = value
         self._sch_related = True
+        self._tools = (CMD_EESCHEMA_DO,)
         self._expand_id = 'erc'
-        self._expand_ext = 'txt'
+        self._what = 'ERC'
+        self._error = ERC_ERROR
+        self._video = 'run_erc_eeschema_screencast.ogv'
 
     def get_targets(self):
         """ Returns a list of targets generated by this preflight """
@@ -36,33 +35,29 @@ class Run_ERC(BasePreFlight):  # noqa: F821
         name = Optionable.expand_filename_sch(self, out_pattern)
         return [os.path.abspath(os.path.join(self.expand_dirname(GS.out_dir), name))]
 
-    def run(self):
+    def check_tool(self):
         check_eeschema_do()
-        # The schematic is loaded only before executing an output related to it.
-        # But here we need data from it.
-        output = self.get_targets()[0]
-        logger.debug('ERC report: '+output)
+
+    def get_command(self, output):
         cmd = [CMD_EESCHEMA_DO, 'run_erc', '-o', output]
         if BasePreFlight.get_option('erc_warnings'):  # noqa: F821
             cmd.append('-w')
         if GS.filter_file:
             cmd.extend(['-f', GS.filter_file])
         cmd.extend([GS.sch_file, self.expand_dirname(GS.out_dir)])
-        # If we are in verbose mode enable debug in the child
-        cmd, video_remove = add_extra_options(cmd)
-        logger.info('- Running the ERC')
-        ret = exec_with_retry(cmd)
-        if video_remove:
-            video_name = os.path.join(self.expand_dirname(GS.out_dir), 'run_erc_eeschema_screencast.ogv')
-            if os.path.isfile(video_name):
-                os.remove(video_name)
-        if ret:
-            if ret > 127:
-                ret = -(256-ret)
-            if ret < 0:
-                logger.error('ERC errors: %d', -ret)
-            else:
-                logger.error('ERC returned %d', ret)
-                if GS.sch.annotation_error:
-                    logger.error('Make sure your schematic is fully annotated')
-            exit(ERC_ERROR)
+        return cmd
+
+    def get_cache_files(self):
+        # The schematic is loaded by get_targets
+        files = GS.sch.get_files()
+        # The libs used by KiCad 5
+        files.extend(sorted(v for v in GS.sch.libs.values() if v))
+        files.append(GS.sch_no_ext+GS.pro_ext)
+        return files
+
+    def get_cache_options(self):
+        return super().get_cache_options()+[BasePreFlight.get_option('erc_warnings')]  # noqa: F821
+
+    def run_error(self, ret):
+        if GS.sch.annotation_error:
+            logger.error('Make sure your schematic is fully annotated')
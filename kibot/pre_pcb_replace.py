@@ -52,6 +52,6 @@ class PCB_Replace(Base_Replace):  # noqa: F821
             t.after = '")'
             t._relax_check = True
             o.replace_tags.append(t)
-        self.replace(GS.pcb_file)
+        self.replace_files([GS.pcb_file])
         # Force the schematic reload
         GS.board = None
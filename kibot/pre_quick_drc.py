@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2022 Salvador E. Tropea
+# Copyright (c) 2022 Instituto Nacional de Tecnología Industrial
+# License: GPL-3.0
+# Project: KiBot (formerly KiPlot)
+import os
+from sys import exit
+import pcbnew
+from .macros import macros, pre_class  # noqa: F401
+from .error import KiPlotConfigurationError
+from .gs import GS
+from .optionable import Optionable
+from .kiplot import load_board
+from .misc import DRC_ERROR
+from .quick_drc import DRCItem, rotated_rect, rotated_segment, check_spacing
+from .log import get_logger
+
+logger = get_logger(__name__)
+
+
+def to_mm(iu):
+    return '{:.4f}'.format(iu/pcbnew.IU_PER_MM)
+
+
+def pos_mm(p):
+    return '({}, {})'.format(to_mm(p[0]), to_mm(p[1]))
+
+
+@pre_class
+class Quick_DRC(BasePreFlight):  # noqa: F821
+    """ [boolean=false] Runs a simplified DRC using the loaded PCB, no need for KiAuto.
+        Checks the minimum track width, clearance, via annular ring and hole to hole distance using the board rules.
+        Is much faster than the `run_drc` preflight, but doesn't check zones, net classes and custom rules.
+        The report file name is controlled by the global output pattern (%i=quick_drc %x=txt) """
+    def __init__(self, name, value):
+        super().__init__(name, value)
+        if not isinstance(value, bool):
+            raise KiPlotConfigurationError('must be boolean')
+        self._enabled = value
+        self._pcb_related = True
+        self._expand_id = 'quick_drc'
+        self._expand_ext = 'txt'
+
+    def get_targets(self):
+        """ Returns a list of targets generated by this preflight """
+        load_board()
+        out_pattern = GS.global_output if GS.global_output is not None else GS.def_global_output
+        name = Optionable.expand_filename_pcb(self, out_pattern)
+        return [os.path.abspath(os.path.join(self.expand_dirname(GS.out_dir), name))]
+
+    @staticmethod
+    def get_net(o):
+        return o.GetNet() if GS.ki5() else o.GetNetCode()
+
+    def collect_tracks(self, board, layers, copper, errors, min_width):
+        track_type = 'TRACK' if GS.ki5() else 'PCB_TRACK'
+        via_type = 'VIA' if GS.ki5() else 'PCB_VIA'
+        holes = []
+        vias = []
+        for t in board.GetTracks():
+            tclass = t.GetClass()
+            if tclass == via_type:
+                via = t.Cast()
+                pos = via.GetPosition()
+                pos = (pos.x, pos.y)
+                v_layers = [la for la in layers if via.IsOnLayer(la)]
+                desc = 'Via at '+pos_mm(pos)
+                net = self.get_net(via)
+                copper.append(DRCItem(desc, net, v_layers, [pos], via.GetWidth()/2))
+                holes.append(DRCItem(desc, net, [0], [pos], via.GetDrill()/2))
+                vias.append((desc, via.GetWidth(), via.GetDrill()))
+                continue
+            layer = t.GetLayer()
+            if layer not in layers:
+                continue
+            start = t.GetStart()
+            end = t.GetEnd()
+            start = (start.x, start.y)
+            end = (end.x, end.y)
+            w = t.GetWidth()
+            desc = 'Track {}-{} on {}'.format(pos_mm(start), pos_mm(end), board.GetLayerName(layer))
+            if min_width and w < min_width-1:
+                errors.append('{} width {} mm < {} mm'.format(desc, to_mm(w), to_mm(min_width)))
+            net = self.get_net(t)
+            if tclass == track_type:
+                copper.append(DRCItem(desc, net, [layer], [start, end], w/2))
+            elif tclass == 'PCB_ARC':
+                # Approximated using two chords
+                mid = t.Cast().GetMid()
+                mid = (mid.x, mid.y)
+                copper.append(DRCItem(desc, net, [layer], [start, mid], w/2))
+                copper.append(DRCItem(desc, net, [layer], [mid, end], w/2))
+        return holes, vias
+
+    def collect_pads(self, board, layers, copper, holes):
+        npth = pcbnew.PAD_ATTRIB_HOLE_NOT_PLATED if GS.ki5() else pcbnew.PAD_ATTRIB_NPTH
+        for m in GS.get_modules_board(board):
+            ref = m.GetReference()
+            for pad in m.Pads():
+                pos = pad.ShapePos()
+                cx, cy = pos.x, pos.y
+                ang = pad.GetOrientationDegrees()
+                desc = 'Pad {} of {} at {}'.format(pad.GetName(), ref, pos_mm((cx, cy)))
+                net = pad.GetNetCode()
+                dr = pad.GetDrillSize()
+                if dr.x:
+                    dpos = pad.GetPosition()
+                    if dr.x == dr.y:
+                        pts = [(dpos.x, dpos.y)]
+                    elif dr.x > dr.y:
+                        pts = rotated_segment(dpos.x, dpos.y, dr.x-dr.y, ang)
+                    else:
+                        pts = rotated_segment(dpos.x, dpos.y, dr.y-dr.x, ang+90)
+                    holes.append(DRCItem(desc, net, [0], pts, min(dr.x, dr.y)/2))
+                if pad.GetAttribute() == npth:
+                    continue
+                p_layers = [la for la in layers if pad.IsOnLayer(la)]
+                if not p_layers:
+                    continue
+                size = pad.GetSize()
+                w, h = size.x, size.y
+                shape = pad.GetShape()
+                if shape == pcbnew.PAD_SHAPE_CIRCLE:
+                    item = DRCItem(desc, net, p_layers, [(cx, cy)], w/2)
+                elif shape == pcbnew.PAD_SHAPE_OVAL:
+                    if w > h:
+                        pts = rotated_segment(cx, cy, w-h, ang)
+                    else:
+                        pts = rotated_segment(cx, cy, h-w, ang+90)
+                    item = DRCItem(desc, net, p_layers, pts, min(w, h)/2)
+                elif shape == pcbnew.PAD_SHAPE_ROUNDRECT:
+                    r = pad.GetRoundRectCornerRadius()
+                    item = DRCItem(desc, net, p_layers, rotated_rect(cx, cy, w-2*r, h-2*r, ang), r)
+                else:
+                    # Rectangles, trapezoids and custom pads use the pad size
+                    item = DRCItem(desc, net, p_layers, rotated_rect(cx, cy, w, h, ang), 0)
+                copper.append(item)
+
+    def run(self):
+        output = self.get_targets()[0]
+        logger.debug('Quick DRC report: '+output)
+        logger.info('- Running the quick DRC')
+        board = GS.board
+        ds = board.GetDesignSettings()
+        layers = [board.GetLayerID('F.Cu')]
+        layers.extend(board.GetLayerID('In{}.Cu'.format(i)) for i in range(1, ds.GetCopperLayerCount()-1))
+        layers.append(board.GetLayerID('B.Cu'))
+        min_width = ds.m_TrackMinWidth
+        clearance = ds.GetSmallestClearanceValue()
+        h2h = ds.m_HoleToHoleMin
+        min_ring = getattr(ds, 'm_ViasMinAnnularWidth', getattr(ds, 'm_ViasMinAnnulus', 0))
+        errors = []
+        copper = []
+        holes, vias = self.collect_tracks(board, layers, copper, errors, min_width)
+        self.collect_pads(board, layers, copper, holes)
+        logger.debug('Quick DRC: {} copper objects and {} holes'.format(len(copper), len(holes)))
+        # Via annular ring
+        if min_ring:
+            for desc, w, drill in vias:
+                ring = (w-drill)/2
+                if ring < min_ring-1:
+                    errors.append('{} annular ring {} mm < {} mm'.format(desc, to_mm(ring), to_mm(min_ring)))
+        # Clearance
+        for a, b, d in check_spacing(copper, clearance):
+            errors.append('{} and {} clearance {} mm < {} mm'.format(a.desc, b.desc, to_mm(d), to_mm(clearance)))
+        # Hole to hole
+        for a, b, d in check_spacing(holes, h2h, skip_same_net=False):
+            errors.append('{} and {} hole to hole {} mm < {} mm'.format(a.desc, b.desc, to_mm(d), to_mm(h2h)))
+        with open(output, 'wt') as f:
+            f.write('** Quick DRC report for {} **\n'.format(GS.pcb_file))
+            f.write('Minimum track width: {} mm\n'.format(to_mm(min_width)))
+            f.write('Minimum clearance: {} mm\n'.format(to_mm(clearance)))
+            f.write('Minimum via annular ring: {} mm\n'.format(to_mm(min_ring)))
+            f.write('Minimum hole to hole: {} mm\n'.format(to_mm(h2h)))
+            f.write('\n** Found {} DRC violations **\n'.format(len(errors)))
+            for e in errors:
+                f.write('- {}\n'.format(e))
+        if errors:
+            for e in errors:
+                logger.error(e)
+            logger.error('Quick DRC errors: %d', len(errors))
+            exit(DRC_ERROR)
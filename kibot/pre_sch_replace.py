@@ -63,7 +63,6 @@ class SCH_Replace(Base_Replace):  # noqa: F821
             o.replace_tags.append(t)
         load_sch()
         os.environ['KIBOT_TOP_SCH_NAME'] = GS.sch_file
-        for file in GS.sch.get_files():
-            self.replace(file)
+        self.replace_files(GS.sch.get_files())
         # Force the schematic reload
         GS.sch = None
@@ -8,7 +8,8 @@ from sys import (exit)
 from .macros import macros, pre_class  # noqa: F401
 from .error import (KiPlotConfigurationError)
 from .gs import (GS)
-from .kiplot import check_eeschema_do, exec_with_retry, add_extra_options
+from .kiplot import check_eeschema_do, exec_with_retry, add_extra_options, load_sch
+from .netlist_snapshot import save_netlist
 from .misc import (CMD_EESCHEMA_DO, BOM_ERROR)
 from .log import (get_logger)
 
@@ -26,12 +27,23 @@ class Update_XML(BasePreFlight):  # noqa: F821
             raise KiPlotConfigurationError('must be boolean')
         self._enabled = value
         self._sch_related = True
+        self._tools = (CMD_EESCHEMA_DO,)
 
     def get_targets(self):
         """ Returns a list of targets generated by this preflight """
         return [GS.sch_no_ext+'.xml']
 
+    def run_native(self):
+        """ Use our own netlist writer """
+        load_sch()
+        logger.info('- Updating BoM in XML format (native)')
+        # All the components, like eeschema does
+        save_netlist(self.get_targets()[0], GS.sch.get_components(), excluded=True, fitted=False)
+
     def run(self):
+        if BasePreFlight.get_option('update_xml_native'):  # noqa: F821
+            self.run_native()
+            return
         check_eeschema_do()
         out_dir = self.expand_dirname(GS.out_dir)
         cmd = [CMD_EESCHEMA_DO, 'bom_xml', GS.sch_file, out_dir]
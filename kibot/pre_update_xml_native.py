@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2022 Salvador E. Tropea
+# Copyright (c) 2022 Instituto Nacional de Tecnología Industrial
+# License: GPL-3.0
+# Project: KiBot (formerly KiPlot)
+from .macros import macros, pre_class  # noqa: F401
+from .error import (KiPlotConfigurationError)
+
+
+@pre_class
+class Update_XML_Native(BasePreFlight):  # noqa: F821
+    """ [boolean=false] Option for `update_xml`. Generates the XML using KiBot's own netlist writer, no need to run eeschema.
+        Much faster, but the netlist only contains the information needed for BoMs (no nets) """
+    def __init__(self, name, value):
+        super().__init__(name, value)
+        if not isinstance(value, bool):
+            raise KiPlotConfigurationError('must be boolean')
+        self._enabled = value
+
+    def get_example():
+        """ Returns a YAML value for the example config """
+        return 'false'
+
+    def apply(self):
+        BasePreFlight._set_option('update_xml_native', self._enabled)  # noqa: F821
@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2022 Salvador E. Tropea
+# Copyright (c) 2022 Instituto Nacional de Tecnología Industrial
+# License: GPL-3.0
+# Project: KiBot (formerly KiPlot)
+"""
+Geometry for the quick DRC.
+Each copper object is a convex core (1 to 4 points) inflated by a radius:
+- Via/round pad: a point + radius
+- Track/oval pad: a segment + radius
+- Rectangular pad: a polygon (+ radius for round rectangles)
+The candidates to check are found using a uniform grid.
+Coordinates are in KiCad internal units (nm), so we use 1 unit as tolerance.
+Doesn't need KiCad, the `pre_quick_drc` preflight extracts the objects from the board.
+"""
+from math import hypot, sin, cos, radians
+
+
+class DRCItem(object):
+    """ A copper object or a hole """
+    __slots__ = ('desc', 'net', 'layers', 'pts', 'r', 'bbox')
+
+    def __init__(self, desc, net, layers, pts, r):
+        super().__init__()
+        self.desc = desc
+        self.net = net
+        self.layers = layers
+        self.pts = pts
+        self.r = r
+        xs = [p[0] for p in pts]
+        ys = [p[1] for p in pts]
+        self.bbox = (min(xs)-r, min(ys)-r, max(xs)+r, max(ys)+r)
+
+
+def rotated_rect(cx, cy, w, h, ang):
+    """ Corners of a w x h rectangle centered at cx,cy rotated `ang` degrees (KiCad orientation) """
+    w /= 2
+    h /= 2
+    s = sin(radians(ang))
+    c = cos(radians(ang))
+    return [(cx+x*c+y*s, cy-x*s+y*c) for x, y in ((-w, -h), (w, -h), (w, h), (-w, h))]
+
+
+def rotated_segment(cx, cy, length, ang):
+    """ Horizontal segment of length centered at cx,cy rotated `ang` degrees (KiCad orientation) """
+    length /= 2
+    dx = length*cos(radians(ang))
+    dy = -length*sin(radians(ang))
+    return [(cx-dx, cy-dy), (cx+dx, cy+dy)]
+
+
+def _point_seg_dist(p, a, b):
+    dx = b[0]-a[0]
+    dy = b[1]-a[1]
+    den = dx*dx+dy*dy
+    if den:
+        t = max(0.0, min(1.0, ((p[0]-a[0])*dx+(p[1]-a[1])*dy)/den))
+        return hypot(p[0]-a[0]-t*dx, p[1]-a[1]-t*dy)
+    return hypot(p[0]-a[0], p[1]-a[1])
+
+
+def _orient(a, b, c):
+    return (b[0]-a[0])*(c[1]-a[1])-(b[1]-a[1])*(c[0]-a[0])
+
+
+def _segs_cross(a, b, c, d):
+    """ True if segment a-b crosses c-d """
+    d1 = _orient(c, d, a)
+    d2 = _orient(c, d, b)
+    d3 = _orient(a, b, c)
+    d4 = _orient(a, b, d)
+    if ((d1 > 0 and d2 < 0) or (d1 < 0 and d2 > 0)) and ((d3 > 0 and d4 < 0) or (d3 < 0 and d4 > 0)):
+        return True
+    # Touching and colinear cases are solved by the distance computation
+    return False
+
+
+def _point_in_poly(p, poly):
+    """ True if p is inside the convex polygon (any orientation) """
+    if len(poly) < 3:
+        return False
+    sign = 0
+    n = len(poly)
+    for i in range(n):
+        o = _orient(poly[i], poly[(i+1) % n], p)
+        if o:
+            if sign and (o > 0) != (sign > 0):
+                return False
+            sign = o
+    return True
+
+
+def _edges(pts):
+    n = len(pts)
+    if n == 1:
+        return [(pts[0], pts[0])]
+    if n == 2:
+        return [(pts[0], pts[1])]
+    return [(pts[i], pts[(i+1) % n]) for i in range(n)]
+
+
+def core_distance(a, b):
+    """ Distance between two convex cores (list of points) """
+    ea = _edges(a)
+    eb = _edges(b)
+    for s1 in ea:
+        for s2 in eb:
+            if _segs_cross(s1[0], s1[1], s2[0], s2[1]):
+                return 0.0
+    if _point_in_poly(a[0], b) or _point_in_poly(b[0], a):
+        return 0.0
+    dist = min(_point_seg_dist(p, s[0], s[1]) for p in a for s in eb)
+    return min(dist, min(_point_seg_dist(p, s[0], s[1]) for p in b for s in ea))
+
+
+def item_distance(a, b):
+    """ Distance between the borders of two items, 0 if they overlap """
+    return max(0.0, core_distance(a.pts, b.pts)-a.r-b.r)
+
+
+class Grid(object):
+    """ Uniform grid used to find the objects that could be too close """
+    def __init__(self, cell):
+        super().__init__()
+        self.cell = cell
+        self.cells = {}
+
+    def add(self, index, bbox, margin):
+        cell = self.cell
+        x1 = int((bbox[0]-margin)//cell)
+        y1 = int((bbox[1]-margin)//cell)
+        x2 = int((bbox[2]+margin)//cell)
+        y2 = int((bbox[3]+margin)//cell)
+        cells = self.cells
+        for x in range(x1, x2+1):
+            for y in range(y1, y2+1):
+                cells.setdefault((x, y), []).append(index)
+
+    def pairs(self):
+        """ Pairs of objects sharing at least one cell, each pair is reported once """
+        seen = set()
+        for members in self.cells.values():
+            n = len(members)
+            for i in range(n):
+                a = members[i]
+                for j in range(i+1, n):
+                    b = members[j]
+                    pair = (a, b) if a < b else (b, a)
+                    if pair not in seen:
+                        seen.add(pair)
+                        yield pair
+
+
+def _cell_size(items, margin):
+    """ Use the average object size, but not less than 4 times the margin """
+    if not items:
+        return 1
+    total = sum(max(i.bbox[2]-i.bbox[0], i.bbox[3]-i.bbox[1]) for i in items)
+    return max(total/len(items), 4*margin, 1)
+
+
+def check_spacing(items, min_dist, skip_same_net=True):
+    """ Returns a list of (item1, item2, distance) for items closer than `min_dist`.
+        Only items sharing a layer are checked. Items in the same net are skipped if `skip_same_net` """
+    violations = []
+    if min_dist <= 0:
+        return violations
+    by_layer = {}
+    for n, i in enumerate(items):
+        for la in i.layers:
+            by_layer.setdefault(la, []).append(n)
+    margin = min_dist/2
+    checked = set()
+    for la in sorted(by_layer.keys()):
+        members = by_layer[la]
+        grid = Grid(_cell_size([items[n] for n in members], margin))
+        for n in members:
+            grid.add(n, items[n].bbox, margin)
+        for pair in grid.pairs():
+            if pair in checked:
+                continue
+            checked.add(pair)
+            a = items[pair[0]]
+            b = items[pair[1]]
+            if skip_same_net and a.net and a.net == b.net:
+                continue
+            # Quick reject using the boxes
+            if (a.bbox[0]-b.bbox[2] >= min_dist or b.bbox[0]-a.bbox[2] >= min_dist or
+               a.bbox[1]-b.bbox[3] >= min_dist or b.bbox[1]-a.bbox[3] >= min_dist):
+                continue
+            d = item_distance(a, b)
+            if d < min_dist-1:
+                violations.append((a, b, d))
+    return violations
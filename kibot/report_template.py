@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2022 Salvador E. Tropea
+# Copyright (c) 2022 Instituto Nacional de Tecnología Industrial
+# License: GPL-3.0
+# Project: KiBot (formerly KiPlot)
+"""
+Compiler for the `report` templates.
+A template is parsed once into a list of nodes, one for each line of the template:
+- ['text', chunks]: Text with ${VAR} expansions
+- ['cond', expression]: A `#?` conditional, when false the next node is skipped
+- ['context', name, chunks]: A `#name:` context, the chunks are expanded by `context_name`
+The chunks are literal strings or [original_text, name, pattern, units] lists for the variables.
+The compiled templates are stored in the cache as JSON, indexed by the template hash.
+"""
+import re
+import json
+from .cache import hash_data, get_data, store_data
+from . import log
+
+logger = log.get_logger()
+VAR_RE = re.compile(r'\$\{([^\s\}]+)\}')
+PATTERN_RE = re.compile(r'^(%[^,]+),(.*)$')
+UNITS = (('_mm', 'mm'), ('_in', 'in'), ('_mils', 'mils'))
+# Templates compiled during this run
+_compiled = {}
+
+
+def compile_var(var):
+    """ Splits ${[PATTERN,]VAR[_UNITS]} """
+    var_ori = var
+    pattern = None
+    m = PATTERN_RE.match(var)
+    if m:
+        pattern = m.group(1)
+        var = m.group(2)
+    units = None
+    for suffix, name in UNITS:
+        if var.endswith(suffix):
+            units = name
+            var = var[:-len(suffix)]
+            break
+    return ['${'+var_ori+'}', var, pattern, units]
+
+
+def compile_line(line):
+    """ Splits a line in literal text and variables """
+    chunks = []
+    pos = 0
+    for m in VAR_RE.finditer(line):
+        if m.start() > pos:
+            chunks.append(line[pos:m.start()])
+        var = m.group(1)
+        if var[0] == '_':
+            # Prevent access to internal data
+            chunks.append(m.group(0))
+        else:
+            chunks.append(compile_var(var))
+        pos = m.end()
+    if pos < len(line):
+        chunks.append(line[pos:])
+    return chunks
+
+
+def compile_template(lines):
+    """ Parses the template lines """
+    nodes = []
+    for line in lines:
+        if line[0] == '#':
+            if line.startswith('#?'):
+                nodes.append(['cond', line[2:].strip()])
+                continue
+            if ':' in line:
+                context = line[1:].split(':')[0]
+                nodes.append(['context', context, compile_line(line[len(context)+2:])])
+                continue
+        nodes.append(['text', compile_line(line)])
+    return nodes
+
+
+def load_template(template_file):
+    """ Returns the compiled template, from memory, the cache or compiling it """
+    key = hash_data([template_file], ['report_template'])
+    nodes = _compiled.get(key)
+    if nodes is not None:
+        return nodes
+    data = get_data('report_templates', key)
+    if data is not None:
+        nodes = json.loads(data.decode())
+    else:
+        logger.debug('Compiling report template `{}`'.format(template_file))
+        with open(template_file, "rt") as f:
+            nodes = compile_template(f)
+        store_data('report_templates', key, json.dumps(nodes).encode())
+    _compiled[key] = nodes
+    return nodes
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2022 Salvador E. Tropea
+# Copyright (c) 2022 Instituto Nacional de Tecnología Industrial
+# License: GPL-3.0
+# Project: KiBot (formerly KiPlot)
+"""
+Variant schematics shared by the outputs.
+The PDF/SVG schematic prints and the `sch_variant` output need a copy of the schematic with the variant applied.
+Here we create it once for each variant/filter combination and share it during the run.
+"""
+import os
+from tempfile import mkdtemp
+from shutil import rmtree, copy2
+from .gs import GS
+from .snapshot_base import Snapshot, SnapshotRegistry
+from . import log
+
+logger = log.get_logger()
+
+
+def copy_project(sch_dir):
+    """ Copy the project file to the temporal dir """
+    ext = GS.pro_ext
+    source = GS.sch_no_ext+ext
+    prj_file = os.path.join(sch_dir, GS.sch_basename+ext)
+    if os.path.isfile(source):
+        copy2(source, prj_file)
+    else:
+        # Create a dummy project file to avoid warnings
+        f = open(prj_file, 'wt')
+        f.close()
+
+
+class SchSnapshot(Snapshot):
+    """ A variant schematic stored in a temporal dir """
+    def __init__(self, key):
+        super().__init__(key)
+        self.dir = mkdtemp(prefix='tmp-kibot-sch_variant-')
+        self.file = os.path.join(self.dir, GS.sch.save_variant(self.dir))
+        # The files for the schematic, the project file isn't included
+        self.files = [os.path.join(self.dir, f) for f in sorted(os.listdir(self.dir))]
+        copy_project(self.dir)
+
+    def remove(self):
+        logger.debug('Removing temporal variant dir `{}`'.format(self.dir))
+        rmtree(self.dir)
+
+
+class SchSnapshots(SnapshotRegistry):
+    """ The variant schematics created during this run.
+        Indexed by variant and DNF filter names. """
+    _snapshots = {}
+    _what = 'variant schematic'
+
+    @classmethod
+    def acquire(cls, options):
+        """ Returns the snapshot for the variant/filter of this output options.
+            Must be called after `VariantOptions.run`, so the variant is applied to the schematic.
+            Call `release` when you finished using it. """
+        key = cls.get_key(options)
+        return super().acquire(key, lambda: SchSnapshot(key))
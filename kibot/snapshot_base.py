@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2022 Salvador E. Tropea
+# Copyright (c) 2022 Instituto Nacional de Tecnología Industrial
+# License: GPL-3.0
+# Project: KiBot (formerly KiPlot)
+"""
+Base classes for the temporal files shared by the outputs (variant schematics, modified PCBs, netlists, etc.).
+Each kind of file has its own registry, indexed by a key describing everything affecting the file.
+"""
+from . import log
+
+logger = log.get_logger()
+
+
+class Snapshot(object):
+    """ A temporal file created for one or more outputs """
+    def __init__(self, key):
+        super().__init__()
+        self.key = key
+        # The name of the file shared by the outputs
+        self.file = None
+        self.ref_count = 0
+
+    def remove(self):
+        """ Removes the temporal files """
+        raise NotImplementedError
+
+
+class SnapshotRegistry(object):
+    """ Reference counted registry for the snapshots created during this run.
+        Each subclass must define its own `_snapshots` dict. """
+    _snapshots = None
+    # Used for the debug messages
+    _what = 'snapshot'
+
+    @staticmethod
+    def get_key(options, *args):
+        """ A key using the variant and DNF filter names, plus any extra data """
+        return (options.variant.name if options.variant else '',
+                options.dnf_filter.name if options.dnf_filter else '')+args
+
+    @classmethod
+    def acquire(cls, key, create):
+        """ Returns the snapshot for this key, calling `create` to get a new one if we don't have it.
+            Call `release` when you finished using it. """
+        snap = cls._snapshots.get(key)
+        if snap is None:
+            logger.debug('Creating {} for {}'.format(cls._what, key))
+            snap = cls._snapshots[key] = create()
+        else:
+            logger.debug('Reusing {} for {} (`{}`)'.format(cls._what, key, snap.file))
+        snap.ref_count += 1
+        return snap
+
+    @staticmethod
+    def release(snap):
+        snap.ref_count -= 1
+
+    @classmethod
+    def clean_up(cls, force=False):
+        """ Removes the snapshots not in use.
+            Use `force` at the end of the run, to remove them even when an output failed to release them. """
+        for key, snap in list(cls._snapshots.items()):
+            if force or not snap.ref_count:
+                snap.remove()
+                del cls._snapshots[key]
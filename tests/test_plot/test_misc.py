@@ -807,6 +807,21 @@ def test_makefile_2(test_dir):
     ctx.clean_up()
 
 
+def test_makefile_no_pcb(test_dir):
+    """ The targets of these outputs are known without loading the PCB """
+    prj = 'bom'
+    ctx = context.TestContext(test_dir, 'test_makefile_no_pcb', prj, 'makefile_no_pcb', '')
+    mkfile = ctx.get_out_path('Makefile')
+    ctx.run(extra=['-m', mkfile])
+    ctx.expect_out_file('Makefile')
+    targets = ctx.read_mk_targets(mkfile)
+    for target in ['position', 'interactive_bom', 'boardview', 'archive']:
+        assert target in targets['all']
+    assert targets['boardview'].endswith(prj+'-boardview.brd')
+    ctx.search_err('Board loaded', invert=True)
+    ctx.clean_up()
+
+
 def test_empty_zip(test_dir):
     prj = 'test_v5'
     ctx = context.TestContext(test_dir, 'test_empty_zip', prj, 'empty_zip', '')
@@ -1,6 +1,7 @@
 import os
 import sys
 import re
+import json
 import pytest
 import coverage
 import logging
@@ -14,19 +15,27 @@ from utils import context
 prev_dir = os.path.dirname(prev_dir)
 if prev_dir not in sys.path:
     sys.path.insert(0, prev_dir)
+from kibot.mcpyrate import activate  # noqa: F401
 from kibot.layer import Layer
 from kibot.pre_base import BasePreFlight
 from kibot.out_base import BaseOutput
 from kibot.gs import GS
-from kibot.kiplot import load_actions, _import, load_board, search_as_plugin, generate_makefile
+from kibot.kiplot import load_actions, _import, load_board, search_as_plugin, generate_makefile, prewarm_tools
 from kibot.registrable import RegOutput, RegFilter
 from kibot.misc import (MISSING_TOOL, WRONG_INSTALL, BOM_ERROR, DRC_ERROR, ERC_ERROR, PDF_PCB_PRINT, CMD_PCBNEW_PRINT_LAYERS,
-                        KICAD2STEP_ERR)
+                        KICAD2STEP_ERR, PCBDRAW_ERR)
 from kibot.bom.columnlist import ColumnList
 from kibot.bom.units import get_prefix
 from kibot.__main__ import detect_kicad
 from kibot.kicad.config import KiConf
 from kibot.globals import Globals
+from kibot.kicad import v6_sch, sheet_writer
+from kibot.kicad.v5_sch import Schematic
+from kibot.kicad.v6_sch import SchematicV6
+from kibot.kicad.sexpdata import dumps
+from kibot.config_reader import CfgYamlReader
+from kibot.cache import early_cache, store_data
+from kibot.out_pcbdraw import _run_pipe
 
 cov = coverage.Coverage()
 mocked_check_output_FNF = True
@@ -51,11 +60,12 @@ def mocked_check_output(cmd, stderr=None):
         raise e
 
 
-def mocked_call(cmd):
+def mocked_call(cmd, get_stderr=False):
     if mocked_call_enabled:
         logging.debug('Forcing fail on '+str(cmd))
-        return 5
-    return subprocess.call(cmd)
+        return (5, '') if get_stderr else 5
+    ret = subprocess.call(cmd)
+    return (ret, '') if get_stderr else ret
 
 
 def patch_functions(m):
@@ -63,6 +73,22 @@ def patch_functions(m):
     m.setattr('kibot.kiplot.exec_with_retry', mocked_call)
 
 
+class DumpsWriter(object):
+    """ The old way to save the KiCad 6 schematics: collect everything and use dumps """
+    def __init__(self, f):
+        self.f = f
+        self.data = []
+
+    def append(self, obj):
+        self.data.append(obj)
+
+    def extend(self, objs):
+        self.data.extend(objs)
+
+    def close(self):
+        self.f.write(dumps(self.data))
+
+
 def init_globals():
     glb = Globals()
     glb.set_tree({})
@@ -338,3 +364,401 @@ def test_makefile_kibot_sys(test_dir):
         generate_makefile(ctx.get_out_path('Makefile'), 'pp', [], kibot_sys=True)
     ctx.search_in_file('Makefile', [r'KIBOT\?=kibot'])
     ctx.clean_up()
+
+
+def set_date_formats(monkeypatch):
+    monkeypatch.setattr(GS, 'global_date_time_format', '%Y-%m-%d_%H-%M-%S')
+    monkeypatch.setattr(GS, 'global_date_format', '%Y-%m-%d')
+
+
+def load_v6_sch(monkeypatch, fname):
+    monkeypatch.setattr(GS, 'kicad_version_n', context.KICAD_VERSION_6_0_0)
+    set_date_formats(monkeypatch)
+    sch = SchematicV6()
+    sch.load(fname, os.path.splitext(os.path.basename(fname))[0])
+    return sch
+
+
+def save_v6_sheets(sch, dest_dir):
+    """ Saves all the sheets, returns a dict with the content of each sheet """
+    os.makedirs(dest_dir, exist_ok=True)
+    sheets = []
+    sch.collect_sheets(os.path.basename(sch.fname), dest_dir, sheets)
+    res = {}
+    for s, fname, dest in sheets:
+        s.save_sheet(fname, dest)
+        with open(os.path.join(dest, fname), 'rt') as f:
+            res[fname] = f.read()
+    return sheets, res
+
+
+def check_v6_streamed(ctx, monkeypatch, sch, name):
+    """ Compare the streamed sheets against the ones created using dumps """
+    sheets, streamed = save_v6_sheets(sch, ctx.get_out_path(name+'_streamed'))
+    with monkeypatch.context() as m:
+        m.setattr(v6_sch, 'SExpWriter', DumpsWriter)
+        # Force the generation of all the sheets
+        for s, _, _ in sheets:
+            m.setattr(s, 'unchanged_text', None)
+            m.setattr(s, 'is_unchanged', lambda: False)
+        _, old = save_v6_sheets(sch, ctx.get_out_path(name+'_dumps'))
+    assert streamed == old
+    return sheets, streamed
+
+
+def test_v6_sch_save_unchanged(test_dir, monkeypatch):
+    """ Sheets not modified by the variant are generated once, the result must be the same """
+    ctx = context.TestContext(test_dir, 'test_v6_sch_save_unchanged', 'test_v5', 'empty_zip', '')
+    fname = os.path.join(ctx.get_board_dir(), '..', 'kicad_6', 'test_v5.kicad_sch')
+    with context.cover_it(cov):
+        sch = load_v6_sch(monkeypatch, fname)
+        sheets, streamed = check_v6_streamed(ctx, monkeypatch, sch, 'unchanged')
+        unchanged = {os.path.basename(s.fname) for s, _, _ in sheets if s.is_unchanged()}
+        # Only the leaf sheets can be reused
+        assert unchanged == {'deeper.kicad_sch'}
+        # The cached text is the one we wrote
+        for s, name, _ in sheets:
+            if s.is_unchanged():
+                assert s.unchanged_text == streamed[name]
+        # Now cross a component in one of the leafs
+        deeper = next(s for s, _, _ in sheets if s.is_unchanged())
+        comp = deeper.symbols[0]
+        monkeypatch.setattr(comp, 'fitted', False)
+        assert not deeper.is_unchanged()
+        _, streamed_crossed = check_v6_streamed(ctx, monkeypatch, sch, 'changed')
+        assert 'kibot_crossed' in ''.join(streamed_crossed.values())
+    ctx.clean_up()
+
+
+def test_v6_sch_save_extra_spaces(test_dir, monkeypatch):
+    """ A field with extra spaces is normalized (W037), so the sheet must be generated again """
+    ctx = context.TestContext(test_dir, 'test_v6_sch_save_extra_spaces', 'test_v5', 'empty_zip', '')
+    src_dir = os.path.join(ctx.get_board_dir(), '..', 'kicad_6')
+    dest_dir = ctx.get_out_path('project')
+    os.makedirs(dest_dir, exist_ok=True)
+    for name in ('test_v5.kicad_sch', 'sub-sheet.kicad_sch', 'deeper.kicad_sch'):
+        with open(os.path.join(src_dir, name), 'rt') as f:
+            text = f.read()
+        if name == 'deeper.kicad_sch':
+            # Only the placed symbols, not the lib_symbols
+            text = re.sub(r'^    \(property "Value" "([^"]+)"', r'    (property "Value" "\1 "', text, flags=re.M)
+        with open(os.path.join(dest_dir, name), 'wt') as f:
+            f.write(text)
+    with context.cover_it(cov):
+        sch = load_v6_sch(monkeypatch, os.path.join(dest_dir, 'test_v5.kicad_sch'))
+        sheets, streamed = check_v6_streamed(ctx, monkeypatch, sch, 'spaces')
+        assert not any(s.is_unchanged() for s, _, _ in sheets)
+        for s, name, _ in sheets:
+            if os.path.basename(s.fname) == 'deeper.kicad_sch':
+                assert re.search(r'^    \(property "Value" "[^"]+ "', streamed[name], re.M) is None
+    ctx.clean_up()
+
+
+def test_v5_gen_lib_cache(test_dir, monkeypatch):
+    """ The y.lib/n.lib are generated once """
+    ctx = context.TestContext(test_dir, 'test_v5_gen_lib_cache', 'test_v5', 'empty_zip', '')
+    fname = os.path.join(ctx.get_board_dir(), '..', 'kicad_5', 'test_v5.sch')
+    monkeypatch.setattr(GS, 'kicad_version_n', context.KICAD_VERSION_5_1_7)
+    set_date_formats(monkeypatch)
+    with context.cover_it(cov):
+        sch = Schematic()
+        sch.load(fname, 'test_v5')
+        sch.load_libs(fname)
+        for cross in (False, True):
+            name_1 = ctx.get_out_path('lib_{}_1.lib'.format(cross))
+            sch.gen_lib(name_1, cross=cross)
+            assert cross in sch.gen_lib_cache
+            # Changes to the components don't affect the cached result
+            comps_data = sch.comps_data
+            monkeypatch.setattr(sch, 'comps_data', {})
+            name_2 = ctx.get_out_path('lib_{}_2.lib'.format(cross))
+            sch.gen_lib(name_2, cross=cross)
+            monkeypatch.setattr(sch, 'comps_data', comps_data)
+            with open(name_1, 'rt') as f1, open(name_2, 'rt') as f2:
+                text = f1.read()
+                assert text == f2.read()
+            assert 'ENDDEF' in text
+        assert sch.gen_lib_cache[False] != sch.gen_lib_cache[True]
+    ctx.clean_up()
+
+
+def test_check_cache_tool_version(monkeypatch):
+    """ The ERC/DRC cache key must change when KiAuto changes """
+    from kibot import pre_any_check
+    chk = pre_any_check.Base_Check('run_erc', True)
+    chk._tools = ('eeschema_do',)
+    chk._what = 'ERC'
+    with context.cover_it(cov):
+        monkeypatch.setattr(pre_any_check, 'get_version', lambda cmd: ('1.6.0', ''))
+        old = chk.get_cache_options()
+        assert '1.6.0' in old
+        monkeypatch.setattr(pre_any_check, 'get_version', lambda cmd: ('1.6.1', ''))
+        assert chk.get_cache_options() != old
+
+
+def test_quick_drc_geometry():
+    """ The quick DRC must find a known clearance violation and accept a clean design """
+    from kibot.quick_drc import DRCItem, rotated_rect, rotated_segment, check_spacing
+    mm = 1000000
+    with context.cover_it(cov):
+        # A 2x1 mm rectangle rotated 90 degrees
+        corners = {(round(x), round(y)) for x, y in rotated_rect(0, 0, 2*mm, 1*mm, 90)}
+        assert corners == {(-mm//2, -mm), (-mm//2, mm), (mm//2, -mm), (mm//2, mm)}
+        seg = [(round(x), round(y)) for x, y in rotated_segment(0, 0, 2*mm, 90)]
+        assert seg == [(0, mm), (0, -mm)]
+        # Two 0.2 mm tracks, 0.3 mm between axes (0.1 mm gap)
+        t1 = DRCItem('T1', 1, ['F.Cu'], [(0, 0), (10*mm, 0)], 0.1*mm)
+        t2 = DRCItem('T2', 2, ['F.Cu'], [(0, 0.3*mm), (10*mm, 0.3*mm)], 0.1*mm)
+        res = check_spacing([t1, t2], 0.2*mm)
+        assert len(res) == 1
+        assert {res[0][0].desc, res[0][1].desc} == {'T1', 'T2'}
+        assert abs(res[0][2]-0.1*mm) < 1
+        # Same net isn't a violation
+        t2.net = 1
+        assert check_spacing([t1, t2], 0.2*mm) == []
+        t2.net = 2
+        # Different layers
+        t2.layers = ['B.Cu']
+        assert check_spacing([t1, t2], 0.2*mm) == []
+        # A clean case: 0.25 mm gap
+        t3 = DRCItem('T3', 3, ['F.Cu'], [(0, 0.45*mm), (10*mm, 0.45*mm)], 0.1*mm)
+        assert check_spacing([t1, t3], 0.2*mm) == []
+        # A 1x2 mm pad rotated 45 degrees and a via near its corner
+        pad = DRCItem('P1', 4, ['F.Cu'], rotated_rect(0, 0, 1*mm, 2*mm, 45), 0)
+        corner = max(pad.pts, key=lambda p: p[0])
+        via = DRCItem('V1', 5, ['F.Cu'], [(corner[0]+0.4*mm, corner[1])], 0.3*mm)
+        res = check_spacing([pad, via], 0.2*mm)
+        assert len(res) == 1 and abs(res[0][2]-0.1*mm) < 1
+        via.pts = [(corner[0]+0.6*mm, corner[1])]
+        via.bbox = (via.pts[0][0]-via.r, via.pts[0][1]-via.r, via.pts[0][0]+via.r, via.pts[0][1]+via.r)
+        assert check_spacing([pad, via], 0.2*mm) == []
+
+
+def test_snapshots_clean_up():
+    """ Snapshots still in use are removed at the end of the run """
+    from kibot.snapshot_base import Snapshot, SnapshotRegistry
+
+    class DummySnapshot(Snapshot):
+        def remove(self):
+            removed.append(self.key)
+
+    class DummySnapshots(SnapshotRegistry):
+        _snapshots = {}
+
+    removed = []
+    with context.cover_it(cov):
+        a = DummySnapshots.acquire('a', lambda: DummySnapshot('a'))
+        DummySnapshots.acquire('b', lambda: DummySnapshot('b'))
+        assert DummySnapshots.acquire('a', lambda: DummySnapshot('a')) is a
+        DummySnapshots.release(a)
+        DummySnapshots.release(a)
+        # `b` wasn't released (i.e. the output failed)
+        DummySnapshots.clean_up()
+        assert removed == ['a']
+        DummySnapshots.clean_up(force=True)
+        assert removed == ['a', 'b']
+        assert DummySnapshots._snapshots == {}
+
+
+def test_pcbdraw_pipe(test_dir, caplog):
+    """ A lot of stderr from the first command must not block the pipe """
+    caplog.set_level(logging.DEBUG)
+    with context.cover_it(cov):
+        noisy = ['sh', '-c', 'head -c 1000000 /dev/zero | tr "\\0" "x" >&2; echo THE_DATA']
+        _run_pipe(noisy, ['cat'])
+        assert 'THE_DATA' in caplog.text
+        # The second command doesn't exist
+        with pytest.raises(FileNotFoundError):
+            _run_pipe(noisy, ['this_command_does_not_exist'])
+        # The first command fails
+        with pytest.raises(SystemExit) as e:
+            _run_pipe(['sh', '-c', 'echo THE_ERROR >&2; exit 3'], ['cat'])
+        assert e.value.code == PCBDRAW_ERR
+        assert 'THE_ERROR' in caplog.text
+
+
+def test_config_cache(test_dir, monkeypatch):
+    """ The parsed YAML is cached as JSON, the command line can disable it """
+    ctx = context.TestContext(test_dir, 'test_config_cache', 'test_v5', 'empty_zip', '')
+    cache_dir = ctx.get_out_path('cache')
+    cfg = ctx.get_out_path('config.kibot.yaml')
+    with open(cfg, 'wt') as f:
+        f.write('kibot:\n  version: 1\n')
+    cfg_date = ctx.get_out_path('date.kibot.yaml')
+    with open(cfg_date, 'wt') as f:
+        f.write('kibot:\n  version: 1\n  date: 2022-01-01\n')
+    monkeypatch.setattr(GS, 'global_from_cli', {'cache_dir': cache_dir})
+    with context.cover_it(cov):
+        reader = CfgYamlReader()
+        with open(cfg) as f:
+            assert reader.load_yaml(f) == {'kibot': {'version': 1}}
+        assert len(reader.to_cache) == 1
+        key, data = reader.to_cache[0]
+        with early_cache(True, cache_dir):
+            store_data('config', key, data)
+        entry = os.path.join(cache_dir, 'config', key)
+        with open(entry, 'rt') as f:
+            assert json.load(f) == {'kibot': {'version': 1}}
+        # The cached entry is used
+        with open(entry, 'wt') as f:
+            f.write('{"cached": true}')
+        with open(cfg) as f:
+            assert CfgYamlReader().load_yaml(f) == {'cached': True}
+        # Unless disabled from the command line
+        GS.global_from_cli['use_cache'] = 'False'
+        with open(cfg) as f:
+            assert CfgYamlReader().load_yaml(f) == {'kibot': {'version': 1}}
+        # Data that JSON can't represent isn't cached
+        reader = CfgYamlReader()
+        with open(cfg_date) as f:
+            assert 'date' in reader.load_yaml(f)['kibot']
+        assert reader.to_cache == []
+    ctx.clean_up()
+
+
+def test_globals_early_cache_options(monkeypatch):
+    """ The cache options are used before the globals are validated """
+    monkeypatch.setattr(GS, 'global_use_cache', None)
+    monkeypatch.setattr(GS, 'global_cache_dir', None)
+    with context.cover_it(cov):
+        glb = Globals()
+        for tree, res in (({}, (True, None)),
+                          ({'use_cache': False, 'cache_dir': 'dir'}, (False, 'dir')),
+                          ({'use_cache': 'no'}, (False, None)),
+                          ({'cache_dir': ['a', 'b']}, (False, None))):
+            glb.set_tree(tree)
+            assert glb.early_cache_options() == res
+        # The command line has priority
+        monkeypatch.setattr(GS, 'global_use_cache', True)
+        monkeypatch.setattr(GS, 'global_cache_dir', 'cli_dir')
+        glb.set_tree({'use_cache': False, 'cache_dir': 5})
+        assert glb.early_cache_options() == (True, 'cli_dir')
+
+
+def test_prewarm_tools_skip(monkeypatch):
+    """ The tools used by the skipped preflights aren't checked """
+    class FakePre(object):
+        def __init__(self, name, tool):
+            self._name = name
+            self._enabled = True
+            self._tools = [tool]
+
+    checked = []
+    monkeypatch.setattr(BasePreFlight, '_in_use', {'run_erc': FakePre('run_erc', 'erc_tool'),
+                                                   'run_drc': FakePre('run_drc', 'drc_tool')})
+    monkeypatch.setattr(RegOutput, 'get_outputs', lambda: [])
+    monkeypatch.setattr('kibot.kiplot.prewarm_versions', lambda tools: checked.append(sorted(tools)))
+    with context.cover_it(cov):
+        for skip, res in ((None, ['drc_tool', 'erc_tool']), ('run_erc', ['drc_tool']), ('run_erc,run_drc', []),
+                          ('all', [])):
+            prewarm_tools([], False, skip, False)
+            assert checked.pop() == res
+
+
+def test_sch_save_sheets_pool(test_dir, caplog, monkeypatch):
+    """ The sheets saved by the pool of processes must be the same we get saving them one by one """
+    ctx = context.TestContext(test_dir, 'test_sch_save_sheets_pool', 'test_v5', 'empty_zip', '')
+    fname = os.path.join(ctx.get_board_dir(), '..', 'kicad_6', 'test_v5.kicad_sch')
+    caplog.set_level(logging.DEBUG)
+    with context.cover_it(cov):
+        sch = load_v6_sch(monkeypatch, fname)
+        sheets, serial = save_v6_sheets(sch, ctx.get_out_path('serial'))
+        # Force the use of the pool
+        monkeypatch.setattr(sheet_writer, 'MIN_SHEETS', 1)
+        monkeypatch.setattr(sheet_writer.os, 'cpu_count', lambda: 4)
+        dest_dir = ctx.get_out_path('pool')
+        os.makedirs(dest_dir)
+        sheets = []
+        sch.collect_sheets(os.path.basename(sch.fname), dest_dir, sheets)
+        assert len(sheets) > 1
+        # Forget the texts generated by the serial writer
+        unchanged = [s for s, _, _ in sheets if s.is_unchanged()]
+        assert unchanged
+        for s in unchanged:
+            monkeypatch.setattr(s, 'unchanged_text', None)
+        sheet_writer.save_sheets(sheets)
+        assert 'Saving {} sheets using'.format(len(serial)) in caplog.text
+        for name, text in serial.items():
+            with open(os.path.join(dest_dir, name), 'rt') as f:
+                assert f.read() == text, name
+        # The workers sent us the text of the unchanged sheets, the next variant reuses it
+        for s in unchanged:
+            assert s.unchanged_text is not None
+            monkeypatch.setattr(s, 'write_sheet', lambda f: sys.exit(8))
+        dest_dir = ctx.get_out_path('pool_2')
+        os.makedirs(dest_dir)
+        sheets = []
+        sch.collect_sheets(os.path.basename(sch.fname), dest_dir, sheets)
+        sheet_writer.save_sheets(sheets)
+        for name, text in serial.items():
+            with open(os.path.join(dest_dir, name), 'rt') as f:
+                assert f.read() == text, name
+        # A worker calling exit() must be reported, not hang the pool
+        monkeypatch.setattr(sheets[-1][0], 'save_sheet', lambda fname, dest_dir: sys.exit(7))
+        with pytest.raises(SystemExit) as e:
+            sheet_writer.save_sheets(sheets)
+        assert e.value.code == 7
+    ctx.clean_up()
+
+
+def test_pre_parallel_order(monkeypatch):
+    """ The preflights run in the config order, only consecutive ones run in parallel """
+    class FakePre(object):
+        def __init__(self, name, parallel):
+            self._name = name
+            self._enabled = True
+            self._parallel = parallel
+
+        def is_sch(self):
+            return False
+
+        def is_pcb(self):
+            return False
+
+        def apply(self):
+            pass
+
+        def run(self):
+            events.append('run '+self._name)
+
+        def prepare(self):
+            events.append('prepare '+self._name)
+            return self._name
+
+        def execute(self, job):
+            return job
+
+        def finish(self, job, result):
+            events.append('finish '+result)
+
+    events = []
+    pres = [FakePre('run_erc', True), FakePre('sch_replace', False), FakePre('run_drc', True),
+            FakePre('other_check', True), FakePre('update_xml', False), FakePre('last_check', True)]
+    monkeypatch.setattr(BasePreFlight, '_in_use', {p._name: p for p in pres})
+    with context.cover_it(cov):
+        BasePreFlight.run_enabled()
+    assert events == ['run run_erc', 'run sch_replace', 'prepare run_drc', 'prepare other_check', 'finish run_drc',
+                      'finish other_check', 'run update_xml', 'run last_check']
+
+
+def test_replace_tags_back_ref(test_dir):
+    """ Tags using back-references can't be joined with the rest, their groups are renumbered """
+    from kibot.pre_any_replace import compile_tags, Base_Replace
+
+    class FakeTag(object):
+        def __init__(self, tag):
+            self.tag = tag
+
+    ctx = context.TestContext(test_dir, 'test_replace_tags_back_ref', 'test_v5', 'empty_zip', '')
+    fname = ctx.get_out_path('tags.txt')
+    with open(fname, 'wt') as f:
+        f.write('@a@ xxrev @b@\nDate "2020-08-12"\n')
+    with context.cover_it(cov):
+        tags = [FakeTag('@a@'), FakeTag(r'(\w)\1rev'), FakeTag('@b@'), FakeTag(r'^Date ("(?:[^"]|\\")*")$')]
+        regexes = compile_tags(tags)
+        assert [n for _, n in regexes] == [None, 1]
+        # The texts are literal, the inserted text isn't scanned for tags and None skips the tag
+        Base_Replace.replace(fname, regexes, ['@b@', 'BACK_REF', None, r'Date "\1"'])
+    with open(fname, 'rt') as f:
+        assert f.read() == '@b@ BACK_REF @b@\nDate "\\1"\n'
+    ctx.clean_up()
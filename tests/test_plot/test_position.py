@@ -98,6 +98,19 @@ def test_3Rs_position_neg_x(test_dir):
     ctx.clean_up()
 
 
+def test_3Rs_position_origin(test_dir):
+    """ R2 is exactly on the auxiliar origin, we must get 0.0000, not -0.0000 """
+    ctx = context.TestContext(test_dir, '3Rs_position_origin', '3Rs_origin', 'simple_position_origin', POS_DIR)
+    ctx.run()
+    pos_both = ctx.get_pos_both_filename()
+    ctx.expect_out_file(pos_both)
+    m = ctx.search_in_file(pos_both, [ASCII_EXPR % 'R1', ASCII_EXPR % 'R2'])
+    assert m[0][:2] == ('-5.0000', '0.0000')
+    assert m[1][:2] == ('0.0000', '0.0000')
+    ctx.search_not_in_file(pos_both, [r'-0\.0000\s'])
+    ctx.clean_up()
+
+
 def test_3Rs_position_unified(test_dir):
     ctx = context.TestContext(test_dir, '3Rs_position_unified', '3Rs', 'simple_position_unified', POS_DIR)
     ctx.run()
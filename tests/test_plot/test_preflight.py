@@ -37,6 +37,21 @@ def test_erc_1(test_dir):
     ctx.clean_up()
 
 
+def test_erc_cache(test_dir):
+    """ A clean ERC is cached and skipped in the next run """
+    prj = 'bom'
+    ctx = context.TestContext(test_dir, 'test_erc_cache', prj, 'erc', '')
+    extra = ['-g', 'cache_dir='+ctx.get_out_path('cache')]
+    ctx.run(extra=extra)
+    ctx.expect_out_file(prj+'-erc.txt')
+    ctx.search_err('Running the ERC')
+    os.remove(ctx.get_out_path(prj+'-erc.txt'))
+    ctx.run(extra=extra)
+    ctx.expect_out_file(prj+'-erc.txt')
+    ctx.search_err('Skipping the ERC')
+    ctx.clean_up()
+
+
 def test_erc_fail_1(test_dir):
     """ Using an SCH with ERC errors """
     prj = 'fail-erc'
@@ -86,6 +101,16 @@ def test_drc_1(test_dir):
     ctx.clean_up()
 
 
+def test_quick_drc(test_dir):
+    """ The in-process DRC """
+    prj = 'bom'
+    ctx = context.TestContext(test_dir, 'QuickDRC', prj, 'quick_drc', '')
+    ctx.run()
+    ctx.expect_out_file(prj+'-quick_drc.txt')
+    ctx.search_err('Running the quick DRC')
+    ctx.clean_up()
+
+
 def test_drc_filter(test_dir):
     prj = 'fail-project'
     ctx = context.TestContext(test_dir, 'DRC_Filter', prj, 'drc_filter', '')
@@ -155,6 +180,25 @@ def test_update_xml_1(test_dir):
     ctx.clean_up()
 
 
+def test_update_xml_native(test_dir):
+    """ Using our own netlist writer """
+    prj = 'bom'
+    ctx = context.TestContext(test_dir, 'Update_XML_Native', prj, 'update_xml_native', '')
+    # The XML should be created where the schematic is located
+    xml = os.path.abspath(os.path.join(ctx.get_board_dir(), prj+'.xml'))
+    os.rename(xml, xml+'-bak')
+    try:
+        ctx.run()
+        assert os.path.isfile(xml)
+        assert os.path.getsize(xml) > 0
+        assert ctx.search_err('Updating BoM in XML format \\(native\\)')
+        logging.debug(os.path.basename(xml)+' OK')
+    finally:
+        os.remove(xml)
+        os.rename(xml+'-bak', xml)
+    ctx.clean_up()
+
+
 def test_update_xml_fail(test_dir):
     """ Using a dummy SCH """
     prj = '3Rs'
@@ -204,6 +248,42 @@ def test_sch_replace_1(test_dir):
             os.rename(v, k)
 
 
+def test_sch_replace_2(test_dir):
+    """ Various tags in each sheet, a command using the name of the sheet and the literal text """
+    prj = 'test_v5'
+    ctx = context.TestContext(test_dir, 'test_sch_replace_2', prj, 'sch_replace_2', '')
+    # Work on a copy of the hierarchy, with tags in all the sheets
+    sheets = []
+    for name in ('test_v5', 'sub-sheet', 'deeper'):
+        src = ctx.sch_file.replace('test_v5', name)
+        dest = ctx.get_out_path(os.path.basename(src))
+        with open(src, 'rt') as f:
+            c = f.read()
+        if context.ki5():
+            c = re.sub(r'^Comment1 ".*"$', 'Comment1 "@sheet@ @fixed@ @again@"', c, flags=re.MULTILINE)
+        else:
+            c = re.sub(r'\(comment 1 ".*"\)', '(comment 1 "@sheet@ @fixed@ @again@")', c)
+        with open(dest, 'wt') as f:
+            f.write(c)
+        sheets.append(dest)
+    ctx.run(extra=['-e', sheets[0]], no_board_file=True)
+    for file in sheets:
+        assert os.path.isfile(file + '-bak'), file
+        with open(file, 'rt') as f:
+            c = f.read()
+        if context.ki5():
+            m = re.search(r'^Comment1 "(.*)"$', c, re.MULTILINE)
+            d = re.search(r'^Date "((?:[^"]|\\")*)"$', c, re.MULTILINE)
+        else:
+            m = re.search(r'\(comment 1 "(.*)"\)', c)
+            d = re.search(r'\(date "((?:[^"]|\\")*)"\)', c)
+        assert m is not None
+        assert m.group(1) == os.path.basename(file) + ' FIXED @fixed@'
+        assert d is not None
+        assert d.group(1) == '\\1'
+    ctx.clean_up()
+
+
 def test_pcb_replace_1(test_dir):
     """ Tags replacements in a PCB """
     prj = 'light_control'
@@ -10,7 +10,9 @@ pytest-3 --log-cli-level debug
 """
 
 import os
+import re
 import sys
+import json
 import logging
 import coverage
 # Look for the 'utils' module from where the script is running
@@ -139,6 +141,19 @@ def test_print_sch_variant_ni_2(test_dir):
     ctx.clean_up()
 
 
+def test_print_sch_variant_shared(test_dir):
+    """ PDF, SVG and sch_variant using the same variant share the schematic """
+    prj = 'test_v5'
+    ctx = context.TestContextSCH(test_dir, 'test_print_sch_variant_shared', prj, 'print_sch_variant_shared', PDF_DIR)
+    ctx.run()
+    ctx.expect_out_file(os.path.join(NI_DIR, 'test_v5-schematic_(no_L).pdf'))
+    ctx.expect_out_file(os.path.join(NI_DIR, 'test_v5-schematic_(no_L).svg'))
+    ctx.expect_out_file(os.path.join(NI_DIR, 'test_v5'+context.KICAD_SCH_EXT))
+    ctx.search_err(r"Creating variant schematic for \('no_inductor', ''\)")
+    ctx.search_err(r"Reusing variant schematic for \('no_inductor', ''\)")
+    ctx.clean_up()
+
+
 def test_sch_missing_1(test_dir):
     """ R1 exists in l1.lib, but the lib isn't specified.
         R2 is bogus, completely missing """
@@ -171,6 +186,24 @@ def test_sch_missing_filtered(test_dir):
     ctx.clean_up()
 
 
+def test_sch_missing_json_log(test_dir):
+    """ Same as test_sch_missing_filtered, but also logging to a JSON lines file """
+    prj = 'missing'
+    ctx = context.TestContextSCH(test_dir, 'test_sch_missing_json_log', prj, 'sch_no_inductors_1_filtered', PDF_DIR)
+    log_file = ctx.get_out_path('warnings.jsonl')
+    ctx.run(extra=['-L', log_file])
+    ctx.expect_out_file('warnings.jsonl')
+    with open(log_file) as f:
+        entries = [json.loads(line) for line in f]
+    warnings = [e for e in entries if e['level'] == 'WARNING']
+    assert len(warnings) == 3
+    assert all(e['code'] == 'W{:03d}'.format(e['number']) for e in warnings)
+    assert any(re.search("Component .?Resistor.? doesn't specify its library", e['text']) for e in warnings)
+    # Filtered
+    assert not any('FooBar' in e['message'] for e in warnings)
+    ctx.clean_up()
+
+
 def test_sch_bizarre_cases(test_dir):
     """ Poligon without points.
         Pin with unknown direction. """
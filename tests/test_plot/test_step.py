@@ -66,6 +66,19 @@ def test_step_variant_1(test_dir):
     ctx.clean_up(keep_project=True)
 
 
+def test_step_variant_shared(test_dir):
+    """ Two STEP outputs using the same variant share the modified PCB """
+    prj = 'kibom-variant_3'
+    ctx = context.TestContext(test_dir, 'test_step_variant_shared', prj, 'step_variant_shared', '')
+    ctx.run(extra_debug=True)
+    ctx.expect_out_file(prj+'-3D.step')
+    ctx.expect_out_file(prj+'-3D_in.step')
+    ctx.search_err(['Creating modified PCB', 'Reusing modified PCB'])
+    tmps = glob(os.path.join(ctx.get_board_dir(), 'tmp*pro'))
+    assert len(tmps) == 0, tmps
+    ctx.clean_up(keep_project=True)
+
+
 def test_render_3d_variant_1(test_dir):
     prj = 'kibom-variant_3'
     ctx = context.TestContext(test_dir, 'test_render_3d_variant_1', prj, 'render_3d_variant_1', '')